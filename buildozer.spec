@@ -5,7 +5,7 @@ package.domain = org.eth
 version = 5.1
 source.dir = .
 source.main = main.py
-requirements = python3,kivy==2.2.1,requests,numpy
+requirements = python3,kivy==2.2.1,requests,numpy,websockets
 orientation = portrait
 android.permissions = INTERNET
 android.api = 31
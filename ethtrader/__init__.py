@@ -0,0 +1,6 @@
+"""
+ETH交易助手核心模块
+不依赖Kivy，可在安卓应用和Linux服务器上共用
+"""
+
+__version__ = "5.1"
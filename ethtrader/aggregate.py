@@ -0,0 +1,109 @@
+"""
+时间框架合成
+由1分钟K线合成高周期K线：批量合成用于回测，增量合成用于实时刷新
+"""
+
+import numpy as np
+
+
+def resample(rows, seconds):
+    """
+    批量把 (N, 6) 的K线按周期合成，rows需按时间升序
+    返回 (M, 6)，时间戳为周期起点
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    if not len(rows):
+        return np.empty((0, 6))
+
+    buckets = (rows[:, 0] // seconds) * seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+
+    out = np.empty((len(starts), 6))
+    out[:, 0] = buckets[starts]
+    out[:, 1] = rows[starts, 1]
+    out[:, 2] = np.maximum.reduceat(rows[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(rows[:, 3], starts)
+    out[:, 4] = rows[ends, 4]
+    out[:, 5] = np.add.reduceat(rows[:, 5], starts)
+    return out
+
+
+def _combine(bucket, closed, minute):
+    """把已收盘部分与当前1分钟K线合并为一根高周期K线"""
+    if closed is None:
+        return (bucket, minute[1], minute[2], minute[3], minute[4], minute[5])
+    return (bucket, closed[1], max(closed[2], minute[2]), min(closed[3], minute[3]),
+            minute[4], closed[5] + minute[5])
+
+
+class TimeframeAggregator:
+    """
+    从1分钟K线增量合成单个高周期的当前K线
+    分别保存本周期内已收盘1分钟K线的合计和仍在变化的1分钟K线，每次更新为O(1)
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.reset()
+
+    def reset(self):
+        self.bucket = None
+        self._closed = None
+        self._minute = None
+
+    @property
+    def ready(self):
+        return self.bucket is not None
+
+    def seed(self, rows):
+        """
+        用1分钟K线初始化当前周期，rows需覆盖当前周期起点
+        覆盖不足时返回False，此时该周期应继续直接从交易所获取
+        """
+        self.reset()
+        rows = np.asarray(rows, dtype=np.float64)
+        if not len(rows):
+            return False
+
+        bucket = int(rows[-1, 0]) // self.seconds * self.seconds
+        if rows[0, 0] > bucket:
+            return False
+
+        inside = rows[rows[:, 0] >= bucket]
+        self.bucket = bucket
+        if len(inside) > 1:
+            self._closed = tuple(resample(inside[:-1], self.seconds)[0])
+        self._minute = tuple(float(value) for value in inside[-1])
+        return True
+
+    def current(self):
+        """当前周期的K线 (时间戳, 开, 高, 低, 收, 成交量)"""
+        if self._minute is None:
+            return None
+        return _combine(self.bucket, self._closed, self._minute)
+
+    def update(self, row):
+        """
+        输入一根1分钟K线（新K线或未收盘K线的更新）
+        返回 (当前高周期K线, 刚收盘的高周期时间戳或None)，过期数据返回 (None, None)
+        """
+        timestamp = int(row[0])
+        minute = tuple(float(value) for value in row[:6])
+
+        if self._minute is not None:
+            if timestamp < self._minute[0]:
+                return None, None
+            if timestamp > self._minute[0]:
+                # 上一根1分钟K线已收盘，计入本周期合计
+                self._closed = _combine(self.bucket, self._closed, self._minute)
+
+        closed_bucket = None
+        bucket = timestamp // self.seconds * self.seconds
+        if self.bucket is not None and bucket > self.bucket:
+            closed_bucket = self.bucket
+            self._closed = None
+
+        self.bucket = bucket
+        self._minute = minute
+        return self.current(), closed_bucket
@@ -0,0 +1,235 @@
+"""
+提醒规则引擎
+规则在设置变化时编译一次：同类规则的参数合并为数组，每次价格或分析更新时
+对全部监控交易对一次性向量化求值；条件由假变真时触发（边沿触发），
+同一规则同一交易对在冷却时间内不重复触发
+
+规则为字典，kind 取值：
+    confidence   置信度 ≥ threshold 且方向不为观望（自动计划阈值）
+    price_cross  价格穿越 level，direction 为 up / down / any
+    rsi_extreme  至少 count 个时间框架的RSI ≥ overbought（或 ≤ oversold）
+action 取值：plan（生成交易计划）、notify（通知）
+pair 为空时对所有交易对生效
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from .engine import DIRECTIONS, RSI_OVERBOUGHT, RSI_OVERSOLD, TIMEFRAMES
+
+# 同一规则同一交易对再次触发的最短间隔（秒）
+ALERT_COOLDOWN = 300
+
+RSI_EXTREME_COUNT = 3
+
+ACTIONS = ("plan", "notify")
+
+
+def confidence_rule(threshold, action="plan", pair=None):
+    return {"kind": "confidence", "threshold": float(threshold), "action": action, "pair": pair}
+
+
+def price_cross_rule(level, direction="any", action="notify", pair=None):
+    return {"kind": "price_cross", "level": float(level), "direction": direction, "action": action, "pair": pair}
+
+
+def rsi_extreme_rule(count=RSI_EXTREME_COUNT, overbought=RSI_OVERBOUGHT, oversold=RSI_OVERSOLD,
+                     action="notify", pair=None):
+    return {"kind": "rsi_extreme", "count": int(count), "overbought": float(overbought),
+            "oversold": float(oversold), "action": action, "pair": pair}
+
+
+def make_frame(pairs, price, confidence=None, level=None, rsi=None, info=None):
+    """
+    组装一批交易对的求值数据
+    rsi为 (交易对数, 时间框架数) 矩阵，列顺序同 TIMEFRAMES，缺失为NaN；info为每个交易对附带的信息
+    """
+    n = len(pairs)
+    return {
+        "pairs": list(pairs),
+        "price": np.asarray(price, dtype=np.float64),
+        "confidence": np.zeros(n) if confidence is None else np.asarray(confidence, dtype=np.float64),
+        "level": np.zeros(n, dtype=np.int8) if level is None else np.asarray(level, dtype=np.int8),
+        "rsi": np.full((n, len(TIMEFRAMES)), np.nan) if rsi is None else np.asarray(rsi, dtype=np.float64),
+        "info": info or [{} for _ in range(n)]
+    }
+
+
+def snapshot_frame(pair, snapshot):
+    """单个交易对的分析快照，价格缺失时返回None"""
+    price_data = snapshot.get("price")
+    if not price_data:
+        return None
+    overall = snapshot.get("overall") or {}
+    rsi = [[snapshot["timeframes"].get(tf_key, {}).get("rsi", np.nan) for tf_key in TIMEFRAMES]]
+    return make_frame([pair], [price_data["price"]], [overall.get("confidence", 0)], [overall.get("level", 0)],
+                      rsi, [{"direction": overall.get("direction"), "snapshot": snapshot}])
+
+
+def scan_frame(results):
+    """市场扫描结果"""
+    rsi = [[result.get("rsi", {}).get(tf_key, np.nan) for tf_key in TIMEFRAMES] for result in results]
+    return make_frame([r["pair"] for r in results], [r["price"] for r in results],
+                      [r["confidence"] for r in results], [r["level"] for r in results],
+                      rsi if results else None, [{"direction": r["direction"]} for r in results])
+
+
+class _Program:
+    """编译后的规则：同类规则的参数为数组，触发状态按 (交易对, 规则) 保存"""
+
+    def __init__(self, rules):
+        self.rules = [dict(rule) for rule in rules]
+        for rule in self.rules:
+            if rule["kind"] not in ("confidence", "price_cross", "rsi_extreme"):
+                raise ValueError(f"未知的规则类型: {rule['kind']}")
+            if rule.get("action", "notify") not in ACTIONS:
+                raise ValueError(f"未知的动作: {rule['action']}")
+
+        def group(kind, *fields):
+            indexes = [i for i, rule in enumerate(self.rules) if rule["kind"] == kind]
+            arrays = {field: np.array([self.rules[i][field] for i in indexes]) for field in fields}
+            return np.array(indexes, dtype=np.intp), arrays
+
+        self.confidence = group("confidence", "threshold")
+        self.price_cross = group("price_cross", "level")
+        directions = [self.rules[i]["direction"] for i in self.price_cross[0]]
+        self.cross_up = np.array([d in ("up", "any") for d in directions], dtype=bool)
+        self.cross_down = np.array([d in ("down", "any") for d in directions], dtype=bool)
+        self.rsi_extreme = group("rsi_extreme", "count", "overbought", "oversold")
+
+        # 限定交易对的规则
+        self.scoped = [(i, rule["pair"]) for i, rule in enumerate(self.rules) if rule.get("pair")]
+
+        self.pair_index = {}
+        self.active = np.zeros((0, len(self.rules)), dtype=bool)
+        self.fired_at = np.full((0, len(self.rules)), -np.inf)
+        self.last_price = np.full(0, np.nan)
+
+    def rows(self, pairs):
+        """交易对在状态矩阵中的行号，新交易对追加新行"""
+        new = [pair for pair in pairs if pair not in self.pair_index]
+        if new:
+            for pair in new:
+                self.pair_index[pair] = len(self.pair_index)
+            grow = len(self.pair_index) - len(self.active)
+            self.active = np.vstack([self.active, np.zeros((grow, len(self.rules)), dtype=bool)])
+            self.fired_at = np.vstack([self.fired_at, np.full((grow, len(self.rules)), -np.inf)])
+            self.last_price = np.concatenate([self.last_price, np.full(grow, np.nan)])
+        return np.fromiter((self.pair_index[pair] for pair in pairs), dtype=np.intp, count=len(pairs))
+
+    def conditions(self, frame, prev_price):
+        """全部规则在这批交易对上的条件矩阵 (交易对数, 规则数) 及RSI极值方向"""
+        n = len(frame["pairs"])
+        matrix = np.zeros((n, len(self.rules)), dtype=bool)
+        rsi_side = np.zeros((n, len(self.rules)), dtype=np.int8)
+        price = frame["price"][:, None]
+
+        indexes, params = self.confidence
+        if len(indexes):
+            matrix[:, indexes] = (frame["confidence"][:, None] >= params["threshold"]) & \
+                                 (frame["level"][:, None] != 0)
+
+        indexes, params = self.price_cross
+        if len(indexes):
+            level = params["level"]
+            prev = prev_price[:, None]
+            up = (prev < level) & (price >= level) & self.cross_up
+            down = (prev > level) & (price <= level) & self.cross_down
+            matrix[:, indexes] = up | down
+
+        indexes, params = self.rsi_extreme
+        if len(indexes):
+            rsi = frame["rsi"][:, :, None]
+            with np.errstate(invalid="ignore"):
+                high = (rsi >= params["overbought"]).sum(axis=1) >= params["count"]
+                low = (rsi <= params["oversold"]).sum(axis=1) >= params["count"]
+            matrix[:, indexes] = high | low
+            rsi_side[:, indexes] = np.where(high, 1, np.where(low, -1, 0))
+
+        for index, pair in self.scoped:
+            matrix[:, index] &= np.array([p == pair for p in frame["pairs"]], dtype=bool)
+        return matrix, rsi_side
+
+
+class AlertEngine:
+    """
+    规则求值与触发状态
+    evaluate可在任意线程调用；compile替换整套规则（触发状态随之清空），不会与进行中的求值冲突
+    """
+
+    def __init__(self, rules=(), cooldown=ALERT_COOLDOWN, clock=time.time):
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._program = _Program(rules)
+
+    @property
+    def rules(self):
+        return self._program.rules
+
+    def compile(self, rules):
+        """编译新的规则集"""
+        program = _Program(rules)
+        with self._lock:
+            self._program = program
+
+    def evaluate(self, frame, dry_run=False):
+        """
+        对一批交易对求值，返回本次触发的提醒列表
+        dry_run时返回当前满足条件的全部提醒，不更新触发状态（用于测试）
+        """
+        if frame is None or not len(frame["pairs"]):
+            return []
+        with self._lock:
+            program = self._program
+            if not program.rules:
+                return []
+            rows = program.rows(frame["pairs"])
+            prev_price = program.last_price[rows]
+            matrix, rsi_side = program.conditions(frame, prev_price)
+
+            if dry_run:
+                fired = matrix
+            else:
+                now = self.clock()
+                fired = matrix & ~program.active[rows] & (now - program.fired_at[rows] >= self.cooldown)
+                program.active[rows] = matrix
+                program.fired_at[rows] = np.where(fired, now, program.fired_at[rows])
+                program.last_price[rows] = frame["price"]
+
+        alerts = []
+        for row, index in zip(*np.nonzero(fired)):
+            rule = program.rules[index]
+            alerts.append({
+                "rule": rule,
+                "action": rule.get("action", "notify"),
+                "pair": frame["pairs"][row],
+                "price": float(frame["price"][row]),
+                "confidence": float(frame["confidence"][row]),
+                "direction": frame["info"][row].get("direction") or DIRECTIONS[int(frame["level"][row])][0],
+                "info": frame["info"][row],
+                "message": describe(rule, frame, row, rsi_side[row, index])
+            })
+        return alerts
+
+
+def describe(rule, frame, row, rsi_side=0):
+    """提醒文本"""
+    pair = frame["pairs"][row]
+    price = frame["price"][row]
+    kind = rule["kind"]
+    if kind == "confidence":
+        direction = frame["info"][row].get("direction") or DIRECTIONS[int(frame["level"][row])][0]
+        return f"🔔 {pair} {direction} 置信度{frame['confidence'][row]:.0f}% ≥ {rule['threshold']:.0f}%"
+    if kind == "price_cross":
+        return f"🔔 {pair} 价格穿越 {rule['level']:g}，现价 {price:.6g}"
+    side = "超买" if rsi_side > 0 else "超卖"
+    values = [f"{tf}:{value:.0f}" for tf, value in zip(TIMEFRAMES, frame["rsi"][row]) if not np.isnan(value)]
+    return f"🔔 {pair} RSI{side}（{' '.join(values)}），现价 {price:.6g}"
+
+
+def format_alerts(alerts):
+    """多条提醒合并为一段文本"""
+    return "\n".join(alert["message"] for alert in alerts)
@@ -0,0 +1,187 @@
+"""
+历史K线回补
+把时间范围切成每页 MAX_CANDLES_PER_REQUEST 根的窗口，在客户端限频内并行请求，
+每页直接解码为数组，去重后批量写入本地K线缓存；已完整缓存或曾经下载过的页跳过
+（交易所维护、下架等造成的缺口不会每次重新下载）
+
+用法:
+    python -m ethtrader.backfill --db candles.sqlite --pair ETH_USDT --interval 1m --days 90
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from .candles import INTERVAL_SECONDS, decode_candles
+from .gateio import MAX_CANDLES_PER_REQUEST, GateAPIError, GateClient
+
+BACKFILL_WORKERS = 8
+
+# 累计多少页写入一次缓存
+SAVE_EVERY = 20
+
+
+def plan_pages(start, end, interval, page_size=MAX_CANDLES_PER_REQUEST):
+    """把 [start, end) 切成页，返回 [(from_ts, to_ts)]（均含，按周期对齐）"""
+    seconds = INTERVAL_SECONDS[interval]
+    first = int(start) // seconds * seconds
+    pages = []
+    for page_start in range(first, int(end), page_size * seconds):
+        page_end = min(page_start + (page_size - 1) * seconds, (int(end) - 1) // seconds * seconds)
+        pages.append((page_start, page_end))
+    return pages
+
+
+def dedup_rows(rows):
+    """按时间戳去重（保留后出现的）并升序排列"""
+    if not len(rows):
+        return rows
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    keep = np.r_[rows[1:, 0] != rows[:-1, 0], True]
+    return rows[keep]
+
+
+def covered(ranges, start, end, seconds):
+    """按起始时间升序的已下载范围是否连续覆盖 [start, end]"""
+    reached = start - seconds
+    for range_start, range_end in ranges:
+        if range_start > reached + seconds:
+            break
+        reached = max(reached, range_end)
+        if reached >= end:
+            return True
+    return reached >= end
+
+
+class Backfiller:
+    """按页并行下载历史K线并写入 CandleCache"""
+
+    def __init__(self, cache, client=None, workers=BACKFILL_WORKERS, log=None):
+        self.cache = cache
+        self.client = client or GateClient(pool_size=workers, log=log)
+        self.workers = workers
+        self.log = log
+
+    def log_message(self, message):
+        if self.log:
+            self.log(message)
+
+    def missing_pages(self, pair, interval, pages):
+        """缓存中不完整且未下载过的页"""
+        seconds = INTERVAL_SECONDS[interval]
+        missing = []
+        for page_start, page_end in pages:
+            expected = (page_end - page_start) // seconds + 1
+            if self.cache.count(pair, interval, page_start, page_end + seconds) >= expected:
+                continue
+            ranges = self.cache.fetched_ranges(pair, interval, page_start, page_end)
+            if covered(ranges, page_start, page_end, seconds):
+                continue
+            missing.append((page_start, page_end))
+        return missing
+
+    def _fetch_page(self, pair, interval, page):
+        page_start, page_end = page
+        return decode_candles(self.client.candlesticks(pair, interval, from_ts=page_start, to_ts=page_end))
+
+    def run(self, pair, interval, start, end=None, force=False):
+        """
+        回补 [start, end) 的K线，end默认为当前
+        未收盘的最后一根不写入；返回写入的K线数
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        now = time.time()
+        # 只保留已收盘的K线
+        end = min(now // seconds * seconds, end or now)
+        pages = plan_pages(start, end, interval)
+        todo = pages if force else self.missing_pages(pair, interval, pages)
+        self.log_message(f"📥 {pair} {interval}: 共{len(pages)}页，需下载{len(todo)}页")
+        if not todo:
+            return 0
+
+        began = time.perf_counter()
+        saved = failed = 0
+        buffered = []
+        fetched = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ethtrader-backfill") as pool:
+            futures = {pool.submit(self._fetch_page, pair, interval, page): page for page in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    rows = future.result()
+                except GateAPIError as e:
+                    failed += 1
+                    # 超出交易所可查询范围等参数错误
+                    self.log_message(f"❌ {futures[future][0]}页下载失败: {str(e)}")
+                    continue
+                except Exception as e:
+                    failed += 1
+                    self.log_message(f"❌ {futures[future][0]}页下载错误: {str(e)}")
+                    continue
+
+                if len(rows):
+                    buffered.append(rows[rows[:, 0] < end])
+                fetched.append(futures[future])
+                if len(fetched) >= SAVE_EVERY or done == len(todo):
+                    saved += self._save(pair, interval, buffered, fetched)
+                    buffered = []
+                    fetched = []
+                    elapsed = time.perf_counter() - began
+                    self.log_message(f"⏳ {done}/{len(todo)}页，已写入{saved}根，耗时{elapsed:.1f}秒")
+
+        saved += self._save(pair, interval, buffered, fetched)
+        message = f"✅ {pair} {interval}回补完成: {saved}根，耗时{time.perf_counter() - began:.1f}秒"
+        if failed:
+            message += f"，{failed}页失败"
+        self.log_message(message)
+        return saved
+
+    def _save(self, pair, interval, buffered, fetched):
+        """写入K线，再记录这些页已下载（包括没有K线的页）"""
+        saved = 0
+        if buffered:
+            rows = dedup_rows(np.concatenate(buffered))
+            self.cache.save(pair, interval, rows)
+            saved = len(rows)
+        self.cache.mark_fetched(pair, interval, fetched)
+        return saved
+
+    def close(self):
+        self.client.close()
+
+
+def main(argv=None):
+    from .cache import CandleCache
+
+    parser = argparse.ArgumentParser(description="历史K线回补")
+    parser.add_argument("--db", required=True, help="K线缓存SQLite文件")
+    parser.add_argument("--pair", default="ETH_USDT", help="交易对，可用逗号分隔多个")
+    parser.add_argument("--interval", default="1m", help="周期，可用逗号分隔多个")
+    parser.add_argument("--days", type=float, default=30, help="回补最近N天")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--force", action="store_true", help="忽略已缓存的数据重新下载")
+    args = parser.parse_args(argv)
+
+    for interval in args.interval.split(","):
+        if interval not in INTERVAL_SECONDS:
+            parser.error(f"不支持的周期: {interval}")
+
+    cache = CandleCache(args.db)
+    backfiller = Backfiller(cache, workers=args.workers, log=print)
+    start = time.time() - args.days * 86400
+    try:
+        for pair in args.pair.split(","):
+            for interval in args.interval.split(","):
+                backfiller.run(pair, interval, start, force=args.force)
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        backfiller.close()
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
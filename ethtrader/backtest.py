@@ -0,0 +1,319 @@
+"""
+多时间框架评分回测
+用历史K线逐根重放实时系统的评分：高周期使用"未收盘K线"（上一根已收盘状态 + 当前价格），
+与实时引擎的增量指标完全一致；信号和指标全部向量化计算，只有逐笔交易的出场查找是循环
+
+用法:
+    python -m ethtrader.backtest --db candles.sqlite --pair ETH_USDT --days 90
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .aggregate import resample
+from .batch import (direction_confidences, direction_levels, ema_batch, rsi_averages,
+                    rsi_from_averages)
+from .candles import INTERVAL_SECONDS
+from .engine import (CONFIDENCE_SLOPE, CONFIDENCE_STRONG, CONFIDENCE_WEAK, DIRECTION_STRONG,
+                     DIRECTION_WEAK, EMA_SCORE, MIN_CANDLES, RSI_OVERBOUGHT, RSI_OVERSOLD,
+                     RSI_SCORE, TIMEFRAMES, plan_levels)
+from .indicators import EMA_FAST, EMA_SLOW, RSI_PERIOD
+
+# 与"生成交易计划"一致：观望或置信度低于50%不交易
+DEFAULT_MIN_CONFIDENCE = 50
+# 建议持仓 2-4小时，超时按收盘价平仓
+DEFAULT_MAX_HOLD = 4 * 3600
+
+DEFAULT_TRADE_PARAMS = {
+    'capital': '5000',
+    'risk_percent': '1',
+    'stop_distance': '2.0',
+    'risk_reward': '1.5'
+}
+
+# 出场原因
+EXIT_STOP, EXIT_TARGET, EXIT_TIMEOUT = 0, 1, 2
+
+
+class SignalCache:
+    """
+    同一段K线上的指标中间结果缓存
+    高周期合成结果和各周期的"未收盘K线"EMA/RSI按周期参数缓存，参数不同的多次回测共用
+    """
+
+    def __init__(self, rows, base="1m", timeframes=None):
+        self.rows = np.asarray(rows, dtype=np.float64)
+        self.base = base
+        base_seconds = INTERVAL_SECONDS[base]
+        self.timeframes = [tf for tf in (timeframes or TIMEFRAMES) if INTERVAL_SECONDS[tf] >= base_seconds]
+
+        self.base_ts = self.rows[:, 0]
+        self.price = np.ascontiguousarray(self.rows[:, 4])
+        self._frames = {}
+        self._memo = {}
+
+    def _frame(self, tf_key):
+        """高周期收盘价、每根基础K线所在的高周期序号及其前一根"""
+        if tf_key not in self._frames:
+            tf_rows = self.rows if tf_key == self.base else resample(self.rows, INTERVAL_SECONDS[tf_key])
+            current = np.searchsorted(tf_rows[:, 0], self.base_ts, side="right") - 1
+            self._frames[tf_key] = (np.ascontiguousarray(tf_rows[:, 4]), current, np.maximum(current - 1, 0))
+        return self._frames[tf_key]
+
+    def _cached(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def ema(self, tf_key, period):
+        """未收盘K线的EMA = 上一根已收盘K线的EMA按当前价格推进一步"""
+        def compute():
+            tf_close, _, prev = self._frame(tf_key)
+            closed = ema_batch(tf_close, period)[0][prev]
+            return closed + 2 / (period + 1) * (self.price - closed)
+        return self._cached(("ema", tf_key, period), compute)
+
+    def rsi(self, tf_key, period):
+        """未收盘K线的RSI，Wilder平均值按当前价格推进一步"""
+        def compute():
+            tf_close, _, prev = self._frame(tf_key)
+            avg_gain, avg_loss = (a[0][prev] for a in rsi_averages(tf_close, period))
+            delta = self.price - tf_close[prev]
+            avg_gain = (avg_gain * (period - 1) + np.clip(delta, 0, None)) / period
+            avg_loss = (avg_loss * (period - 1) + np.clip(-delta, 0, None)) / period
+            return rsi_from_averages(avg_gain, avg_loss)
+        return self._cached(("rsi", tf_key, period), compute)
+
+    def valid(self, tf_key, fast, slow, rsi_period):
+        """前一根已收盘K线足够计算全部指标，且K线数达到MIN_CANDLES（0/1）"""
+        minimum = max(MIN_CANDLES - 1, fast, slow, rsi_period + 1)
+
+        def compute():
+            _, current, _ = self._frame(tf_key)
+            return (current >= minimum).astype(np.int8)
+        return self._cached(("valid", tf_key, minimum), compute)
+
+    # 分数按 score_batch 的规则拆成EMA排列和RSI区间两部分（-1/0/1），分别按各自的参数缓存
+
+    def ema_trend(self, tf_key, fast, slow):
+        """价格 > 快线 > 慢线为1，价格 < 快线 < 慢线为-1"""
+        def compute():
+            ema_fast, ema_slow = self.ema(tf_key, fast), self.ema(tf_key, slow)
+            up = (self.price > ema_fast) & (ema_fast > ema_slow)
+            down = (self.price < ema_fast) & (ema_fast < ema_slow)
+            return up.astype(np.int8) - down.astype(np.int8)
+        return self._cached(("trend", tf_key, fast, slow), compute)
+
+    def rsi_zone(self, tf_key, period, overbought, oversold):
+        """超卖为1，超买为-1"""
+        def compute():
+            rsi = self.rsi(tf_key, period)
+            return (rsi < oversold).astype(np.int8) - (rsi > overbought).astype(np.int8)
+        return self._cached(("zone", tf_key, period, overbought, oversold), compute)
+
+    def signals(self, fast=EMA_FAST, slow=EMA_SLOW, rsi_period=RSI_PERIOD,
+                overbought=RSI_OVERBOUGHT, oversold=RSI_OVERSOLD,
+                strong=DIRECTION_STRONG, weak=DIRECTION_WEAK,
+                strong_base=CONFIDENCE_STRONG[0], weak_base=CONFIDENCE_WEAK[0], slope=CONFIDENCE_SLOPE):
+        """对基础周期的每根K线计算总体建议"""
+        counts = np.zeros(len(self.rows), dtype=np.int16)
+        trends = np.zeros(len(self.rows), dtype=np.int16)
+        zones = np.zeros(len(self.rows), dtype=np.int16)
+
+        for tf_key in self.timeframes:
+            valid = self.valid(tf_key, fast, slow, rsi_period)
+            counts += valid
+            trends += valid * self.ema_trend(tf_key, fast, slow)
+            zones += valid * self.rsi_zone(tf_key, rsi_period, overbought, oversold)
+
+        # 各周期分数之和 = EMA_SCORE × 排列之和 + RSI_SCORE × 区间之和（半整数相加，结果精确）
+        totals = EMA_SCORE * trends + RSI_SCORE * zones
+        avg_score = np.where(counts > 0, totals / np.maximum(counts, 1), 0.0)
+        levels = np.where(counts > 0, direction_levels(avg_score, strong, weak), 0).astype(np.int8)
+
+        return {
+            "timeframes": self.timeframes,
+            "count": counts,
+            "avg_score": avg_score,
+            "level": levels,
+            "confidence": direction_confidences(levels, avg_score, strong_base, weak_base, slope)
+        }
+
+
+def compute_signals(rows, base="1m", timeframes=None, fast=EMA_FAST, slow=EMA_SLOW, rsi_period=RSI_PERIOD):
+    """
+    对基础周期的每根K线计算总体建议
+    rows为基础周期 decode_candles 格式数组，高周期由其合成
+    """
+    return SignalCache(rows, base, timeframes).signals(fast, slow, rsi_period)
+
+
+def _find_exit(start, end, is_long, stop_loss, take_profit, highs, lows):
+    """在 [start, end) 内查找首次触及止损/止盈的位置，同一根K线都触及时按止损处理"""
+    if is_long:
+        stop_hit = lows[start:end] <= stop_loss
+        target_hit = highs[start:end] >= take_profit
+    else:
+        stop_hit = highs[start:end] >= stop_loss
+        target_hit = lows[start:end] <= take_profit
+
+    hit = stop_hit | target_hit
+    if not hit.any():
+        return None, None
+    offset = int(np.argmax(hit))
+    return start + offset, EXIT_STOP if stop_hit[offset] else EXIT_TARGET
+
+
+def simulate(rows, signals, trade_params=None, min_confidence=DEFAULT_MIN_CONFIDENCE,
+             max_hold=DEFAULT_MAX_HOLD, fee_rate=0.0, base="1m"):
+    """
+    按信号开仓，同一时间只持有一个仓位
+    在信号K线收盘价入场，止损/止盈使用 create_trade_plan 的计算方式
+    返回成交记录结构化数组
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    params = dict(DEFAULT_TRADE_PARAMS, **(trade_params or {}))
+    highs, lows, closes = rows[:, 2], rows[:, 3], rows[:, 4]
+    hold_bars = max(1, int(max_hold // INTERVAL_SECONDS[base]))
+
+    levels = signals["level"]
+    entries = np.flatnonzero((levels != 0) & (signals["confidence"] >= min_confidence))
+
+    trades = []
+    cursor = 0
+    while True:
+        position = np.searchsorted(entries, cursor)
+        if position >= len(entries):
+            break
+        entry = int(entries[position])
+        if entry + 1 >= len(rows):
+            break
+
+        is_long = levels[entry] > 0
+        price = closes[entry]
+        plan = plan_levels(is_long, price, params)
+        end = min(entry + 1 + hold_bars, len(rows))
+
+        exit_index, reason = _find_exit(entry + 1, end, is_long, plan["stop_loss"],
+                                        plan["take_profit"], highs, lows)
+        if exit_index is None:
+            exit_index, reason = end - 1, EXIT_TIMEOUT
+            exit_price = closes[exit_index]
+        else:
+            exit_price = plan["stop_loss"] if reason == EXIT_STOP else plan["take_profit"]
+
+        quantity = plan["contract_amount"]
+        direction = 1 if is_long else -1
+        fees = fee_rate * quantity * (price + exit_price)
+        pnl = direction * quantity * (exit_price - price) - fees
+
+        trades.append((entry, exit_index, direction, price, exit_price, quantity, pnl, reason))
+        cursor = exit_index + 1
+
+    return np.array(trades, dtype=[
+        ("entry", np.int64), ("exit", np.int64), ("direction", np.int8),
+        ("entry_price", np.float64), ("exit_price", np.float64),
+        ("quantity", np.float64), ("pnl", np.float64), ("reason", np.int8)
+    ])
+
+
+def summarize_trades(trades, capital, bar_seconds=60):
+    """统计收益、胜率、最大回撤等指标"""
+    pnl = trades["pnl"]
+    equity = capital + np.cumsum(pnl)
+    peaks = np.maximum.accumulate(np.r_[capital, equity])[1:]
+    drawdown = peaks - equity
+
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    count = len(pnl)
+
+    return {
+        "trades": count,
+        "total_pnl": float(pnl.sum()),
+        "return_percent": float(pnl.sum() / capital * 100),
+        "win_rate": float(len(wins) / count * 100) if count else 0.0,
+        "profit_factor": float(wins.sum() / -losses.sum()) if len(losses) else float("inf") if len(wins) else 0.0,
+        "avg_pnl": float(pnl.mean()) if count else 0.0,
+        "max_drawdown": float(drawdown.max()) if count else 0.0,
+        "max_drawdown_percent": float((drawdown / peaks).max() * 100) if count else 0.0,
+        "long_trades": int((trades["direction"] > 0).sum()),
+        "short_trades": int((trades["direction"] < 0).sum()),
+        "stops": int((trades["reason"] == EXIT_STOP).sum()),
+        "targets": int((trades["reason"] == EXIT_TARGET).sum()),
+        "timeouts": int((trades["reason"] == EXIT_TIMEOUT).sum()),
+        "avg_hold_minutes": float((trades["exit"] - trades["entry"]).mean() * bar_seconds / 60) if count else 0.0
+    }
+
+
+def run_backtest(rows, trade_params=None, base="1m", timeframes=None, min_confidence=DEFAULT_MIN_CONFIDENCE,
+                 max_hold=DEFAULT_MAX_HOLD, fee_rate=0.0):
+    """完整回测：计算信号、模拟交易、统计结果"""
+    params = dict(DEFAULT_TRADE_PARAMS, **(trade_params or {}))
+    signals = compute_signals(rows, base, timeframes)
+    trades = simulate(rows, signals, params, min_confidence, max_hold, fee_rate, base)
+    report = summarize_trades(trades, float(params['capital']), INTERVAL_SECONDS[base])
+    return report, trades
+
+
+def format_report(report, rows):
+    """回测结果文本"""
+    start = datetime.fromtimestamp(rows[0, 0], timezone.utc).strftime("%Y-%m-%d %H:%M")
+    end = datetime.fromtimestamp(rows[-1, 0], timezone.utc).strftime("%Y-%m-%d %H:%M")
+    return f"""【📊 回测结果】
+区间: {start} ~ {end} (UTC), {len(rows)}根K线
+交易次数: {report['trades']} (多 {report['long_trades']} / 空 {report['short_trades']})
+总收益: ${report['total_pnl']:.2f} ({report['return_percent']:+.2f}%)
+胜率: {report['win_rate']:.1f}%
+盈亏因子: {report['profit_factor']:.2f}
+平均每笔: ${report['avg_pnl']:.2f}
+最大回撤: ${report['max_drawdown']:.2f} ({report['max_drawdown_percent']:.2f}%)
+出场: 止损 {report['stops']} / 止盈 {report['targets']} / 超时 {report['timeouts']}
+平均持仓: {report['avg_hold_minutes']:.0f}分钟"""
+
+
+def main(argv=None):
+    from .cache import CandleCache
+
+    parser = argparse.ArgumentParser(description="多时间框架评分回测")
+    parser.add_argument("--db", required=True, help="K线缓存SQLite文件")
+    parser.add_argument("--pair", default="ETH_USDT")
+    parser.add_argument("--base", default="1m", choices=list(TIMEFRAMES), help="基础周期，高周期由其合成")
+    parser.add_argument("--days", type=float, help="只回测最近N天")
+    parser.add_argument("--capital", default="5000")
+    parser.add_argument("--risk-percent", default="1")
+    parser.add_argument("--stop-distance", default="2.0")
+    parser.add_argument("--risk-reward", default="1.5")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--max-hold", type=float, default=DEFAULT_MAX_HOLD / 3600, help="最长持仓（小时）")
+    parser.add_argument("--fee-rate", type=float, default=0.0, help="单边手续费率，如0.001")
+    args = parser.parse_args(argv)
+
+    cache = CandleCache(args.db)
+    start = time.time() - args.days * 86400 if args.days else None
+    rows = cache.load(args.pair, args.base, start=start)
+    cache.close()
+    if len(rows) < MIN_CANDLES:
+        print(f"❌ 缓存中{args.pair} {args.base}数据不足: {len(rows)}条")
+        return 1
+
+    trade_params = {
+        'capital': args.capital,
+        'risk_percent': args.risk_percent,
+        'stop_distance': args.stop_distance,
+        'risk_reward': args.risk_reward
+    }
+    began = time.perf_counter()
+    report, _ = run_backtest(rows, trade_params, args.base, min_confidence=args.min_confidence,
+                             max_hold=args.max_hold * 3600, fee_rate=args.fee_rate)
+    print(format_report(report, rows))
+    print(f"耗时: {time.perf_counter() - began:.2f}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
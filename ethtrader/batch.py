@@ -0,0 +1,204 @@
+"""
+批量向量化指标计算
+输入为二维收盘价数组（序列 × K线），一次计算所有行的EMA/RSI/分数和信号等级，
+结果与 indicators 中的增量计算逐点一致
+"""
+
+import numpy as np
+
+from .engine import (CONFIDENCE_NEUTRAL, CONFIDENCE_SLOPE, CONFIDENCE_STRONG,
+                     CONFIDENCE_WEAK, DIRECTION_STRONG, DIRECTION_WEAK, EMA_SCORE,
+                     MIN_CANDLES, RSI_OVERBOUGHT, RSI_OVERSOLD, RSI_SCORE,
+                     SIGNAL_STRONG, SIGNAL_WEAK)
+from .indicators import EMA_FAST, EMA_SLOW, RSI_PERIOD
+
+# 分块递推的块长度，块内用矩阵乘法，块间只递推一次
+_BLOCK = 64
+
+
+def _as_2d(values):
+    """转为二维float64数组"""
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim == 1:
+        array = array[np.newaxis, :]
+    return array
+
+
+def ewm(values, alpha, initial):
+    """
+    批量指数加权递推: out[t] = (1 - alpha) * out[t-1] + alpha * values[t]
+    out[-1] = initial，values形状为(行, 列)，initial形状为(行,)
+    """
+    values = _as_2d(values)
+    rows, length = values.shape
+    if length == 0:
+        return np.empty((rows, 0))
+
+    decay = 1.0 - alpha
+    block = min(_BLOCK, length)
+    n_blocks = -(-length // block)
+
+    padded = np.zeros((rows, n_blocks * block))
+    padded[:, :length] = values
+    blocks = padded.reshape(rows, n_blocks, block)
+
+    # 块内权重矩阵 W[t, i] = decay^(t-i)，i <= t
+    powers = decay ** np.arange(block + 1)
+    index = np.arange(block)
+    lag = index[:, np.newaxis] - index[np.newaxis, :]
+    weights = np.where(lag >= 0, powers[np.clip(lag, 0, block)], 0.0)
+
+    # 假设块起点状态为0时的块内结果
+    local = alpha * (blocks @ weights.T)
+
+    # 块间递推起点状态
+    carry = np.empty((rows, n_blocks))
+    state = np.broadcast_to(np.asarray(initial, dtype=np.float64), (rows,)).copy()
+    block_decay = powers[block]
+    for j in range(n_blocks):
+        carry[:, j] = state
+        state = block_decay * state + local[:, j, -1]
+
+    out = local + carry[:, :, np.newaxis] * powers[1:]
+    return out.reshape(rows, n_blocks * block)[:, :length]
+
+
+def ema_batch(closes, period):
+    """批量EMA，前period根用SMA作种子，种子之前取当根价格"""
+    closes = _as_2d(closes)
+    out = closes.copy()
+    if closes.shape[1] < period:
+        return out
+
+    seed = closes[:, :period].mean(axis=1)
+    out[:, period - 1] = seed
+    out[:, period:] = ewm(closes[:, period:], 2 / (period + 1), seed)
+    return out
+
+
+def rsi_averages(closes, period=RSI_PERIOD):
+    """
+    批量Wilder平均涨幅/跌幅，与收盘价逐点对齐
+    第period根收盘价处为前period个差值的简单平均，之前为NaN
+    """
+    closes = _as_2d(closes)
+    rows, length = closes.shape
+    avg_gain = np.full((rows, length), np.nan)
+    avg_loss = np.full((rows, length), np.nan)
+    if length < period + 1:
+        return avg_gain, avg_loss
+
+    deltas = np.diff(closes, axis=1)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+
+    alpha = 1 / period
+    avg_gain[:, period] = gains[:, :period].mean(axis=1)
+    avg_loss[:, period] = losses[:, :period].mean(axis=1)
+    avg_gain[:, period + 1:] = ewm(gains[:, period:], alpha, avg_gain[:, period])
+    avg_loss[:, period + 1:] = ewm(losses[:, period:], alpha, avg_loss[:, period])
+    return avg_gain, avg_loss
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """由平均涨跌幅计算RSI，平均跌幅为0时为100，数据不足（NaN）时为50"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss == 0, 100.0, rsi)
+    return np.where(np.isnan(avg_loss), 50.0, rsi)
+
+
+def rsi_batch(closes, period=RSI_PERIOD):
+    """批量RSI（Wilder平滑），数据不足时为50"""
+    return rsi_from_averages(*rsi_averages(closes, period))
+
+
+def score_batch(price, ema_fast, ema_slow, rsi, overbought=RSI_OVERBOUGHT, oversold=RSI_OVERSOLD):
+    """批量计算信号分数，参数为同形状数组"""
+    score = np.zeros(np.shape(price))
+    score += np.where((price > ema_fast) & (ema_fast > ema_slow), EMA_SCORE, 0.0)
+    score -= np.where((price < ema_fast) & (ema_fast < ema_slow), EMA_SCORE, 0.0)
+    score -= np.where(rsi > overbought, RSI_SCORE, 0.0)
+    score += np.where(rsi < oversold, RSI_SCORE, 0.0)
+    return score
+
+
+def signal_levels(score):
+    """批量信号等级（-2 ~ 2），对应 engine.SIGNALS"""
+    return np.select(
+        [score >= SIGNAL_STRONG, score >= SIGNAL_WEAK,
+         score <= -SIGNAL_STRONG, score <= -SIGNAL_WEAK],
+        [2, 1, -2, -1], 0).astype(np.int8)
+
+
+def direction_levels(avg_score, strong=DIRECTION_STRONG, weak=DIRECTION_WEAK):
+    """批量总体建议等级（-2 ~ 2），对应 engine.DIRECTIONS"""
+    return np.select(
+        [avg_score > strong, avg_score > weak,
+         avg_score < -strong, avg_score < -weak],
+        [2, 1, -2, -1], 0).astype(np.int8)
+
+
+def direction_confidences(levels, avg_score, strong_base=CONFIDENCE_STRONG[0],
+                          weak_base=CONFIDENCE_WEAK[0], slope=CONFIDENCE_SLOPE):
+    """批量置信度，基础值和斜率可调（上限不变）"""
+    strength = np.abs(avg_score) * slope
+    return np.select(
+        [np.abs(levels) == 2, np.abs(levels) == 1],
+        [np.minimum(CONFIDENCE_STRONG[1], strong_base + strength),
+         np.minimum(CONFIDENCE_WEAK[1], weak_base + strength)],
+        float(CONFIDENCE_NEUTRAL))
+
+
+def analyze_batch(closes, fast=EMA_FAST, slow=EMA_SLOW, rsi_period=RSI_PERIOD, full=False):
+    """
+    一次分析所有行
+    默认只返回最后一根K线的结果（每行一个值），full=True 时返回整段序列
+    """
+    closes = _as_2d(closes)
+
+    ema_fast = ema_batch(closes, fast)
+    ema_slow = ema_batch(closes, slow)
+    rsi = rsi_batch(closes, rsi_period)
+
+    # 数据不足MIN_CANDLES的位置标记为无效（对应"等待"，分数为0）
+    valid = np.arange(1, closes.shape[1] + 1) >= MIN_CANDLES
+    valid = np.broadcast_to(valid, closes.shape)
+
+    if not full:
+        closes, ema_fast, ema_slow, rsi, valid = (
+            a[:, -1] for a in (closes, ema_fast, ema_slow, rsi, valid))
+
+    score = np.where(valid, score_batch(closes, ema_fast, ema_slow, rsi), 0.0)
+
+    return {
+        "price": closes,
+        "ema_fast": ema_fast,
+        "ema_slow": ema_slow,
+        "rsi": rsi,
+        "score": score,
+        "level": signal_levels(score),
+        "valid": valid
+    }
+
+
+def summarize_batch(scores, valid=None):
+    """
+    汇总多个时间框架的分数
+    scores形状为(交易对, 时间框架)，返回每个交易对的平均分、建议等级和置信度
+    """
+    scores = _as_2d(scores)
+    if valid is None:
+        valid = np.ones(scores.shape, dtype=bool)
+
+    counts = valid.sum(axis=1)
+    totals = np.where(valid, scores, 0.0).sum(axis=1)
+    avg_score = np.where(counts > 0, totals / np.maximum(counts, 1), 0.0)
+
+    levels = direction_levels(avg_score)
+    return {
+        "avg_score": avg_score,
+        "level": levels,
+        "confidence": direction_confidences(levels, avg_score),
+        "count": counts
+    }
@@ -0,0 +1,282 @@
+"""
+离线基准测试
+指标计算、单时间框架分析、交易计划、模拟交易匹配、订单簿增量和完整分析周期（经本地模拟Gate.io REST服务，可设置网络延迟），
+行情来自录制的1分钟K线或固定种子的模拟行情；结果追加保存，并与上一次（或指定基线）比较，
+中位耗时变慢超过容差时返回非零；共享的CI机器波动大，--repeat 可在发现退化时重跑，只报告每次都退化的项
+
+用法:
+    python -m ethtrader.bench --record eth_1m.json --minutes 24000      # 从交易所录制K线
+    python -m ethtrader.bench --fixture eth_1m.json --latency 0.02 --save bench_results.jsonl
+    python -m ethtrader.bench --baseline bench_baseline.json --repeat 3     # 与固定基线比较
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from .engine import (HISTORY_LIMIT, TIMEFRAMES, AnalysisEngine, calculate_ema, calculate_rsi,
+                     create_trade_plan)
+from .fakegate import FakeExchange, FakeGateHTTP, FakeOrderBook, load_fixture, record_fixture
+from .gateio import GateClient
+from .orderbook import OrderBook
+from .paper import PaperAccount
+
+# 每项测试的计时预算（秒）与最少样本数
+BENCH_TIME = 1.0
+MIN_SAMPLES = 5
+
+# 单个样本至少持续的时间，过短的函数在一个样本内循环多次
+SAMPLE_TIME = 0.001
+
+# 默认模拟网络延迟（秒）
+BENCH_LATENCY = 0.02
+
+# 中位耗时超过基线的比例视为退化
+REGRESSION_TOLERANCE = 1.0
+
+# 模拟交易匹配测试的持仓数和交易对数
+PAPER_POSITIONS = 5000
+PAPER_PAIRS = 50
+
+# 订单簿增量测试预先生成的增量数（用完后重新加载快照循环重放）
+ORDER_BOOK_UPDATES = 2000
+
+TRADE_PARAMS = {"capital": "5000", "leverage": "10", "risk_percent": "1",
+                "stop_distance": "2.0", "risk_reward": "1.5"}
+
+
+def measure(func, budget=BENCH_TIME, min_samples=MIN_SAMPLES):
+    """重复调用func，返回每次调用耗时（秒）的统计"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= SAMPLE_TIME:
+            break
+        loops *= 10
+
+    samples = [elapsed / loops]
+    deadline = time.perf_counter() + budget
+    while len(samples) < min_samples or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "samples": len(samples),
+        "loops": loops,
+        "mean": statistics.fmean(samples),
+        "median": median,
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "ops": 1 / median if median > 0 else 0.0
+    }
+
+
+def run_benchmarks(exchange, latency=BENCH_LATENCY, budget=BENCH_TIME, log=None):
+    """运行全部基准测试，返回 {名称: 统计}"""
+    log = log or (lambda message: None)
+    results = {}
+
+    def bench(name, func, **options):
+        results[name] = measure(func, **options)
+        r = results[name]
+        log(f"  {name:<22} 中位 {format_seconds(r['median']):>10}  P95 {format_seconds(r['p95']):>10}  "
+            f"{r['ops']:>10.1f}/秒")
+
+    with FakeGateHTTP(exchange, latency=latency) as server:
+        # 关闭响应缓存，每轮都走完整的请求路径
+        client = GateClient(base_url=server.base_url, cache_ttl={})
+        engine = AnalysisEngine(client=client, log=lambda message: None)
+        try:
+            # 首轮全量下载只计一次
+            started = time.perf_counter()
+            engine.perform_analysis()
+            elapsed = time.perf_counter() - started
+            results["cold_start"] = {"samples": 1, "loops": 1, "mean": elapsed, "median": elapsed,
+                                     "p95": elapsed, "ops": 1 / elapsed}
+            log(f"  {'cold_start':<22} {format_seconds(elapsed):>15}")
+
+            closes = engine.candles["1m"].closes[-HISTORY_LIMIT:].tolist()
+            bench("calculate_ema", lambda: calculate_ema(closes, 25), budget=budget)
+            bench("calculate_rsi", lambda: calculate_rsi(closes, 14), budget=budget)
+            price = engine.last_price["price"]
+            for tf_key in TIMEFRAMES:
+                bench(f"analyze_timeframe[{tf_key}]", lambda tf_key=tf_key: engine.analyze_timeframe(tf_key),
+                      budget=budget)
+            # 每次价格变动：更新未收盘K线后重新分析
+            for tf_key in TIMEFRAMES:
+                bench(f"tick[{tf_key}]", lambda tf_key=tf_key: (engine.update_last_candle(tf_key, price),
+                                                              engine.analyze_timeframe(tf_key)), budget=budget)
+            bench("create_trade_plan", lambda: create_trade_plan("强烈建议做多", 90, price, TRADE_PARAMS),
+                  budget=budget)
+
+            # 模拟交易：大量持仓时每个价格tick的止损/止盈匹配
+            account = PaperAccount(max_hold=None)
+            paper_params = dict(TRADE_PARAMS, risk_percent="0.001")
+            for i in range(PAPER_POSITIONS):
+                account.open(f"PAIR{i % PAPER_PAIRS}", "做多" if i % 2 else "做空", price, paper_params)
+            bench("paper_tick", lambda: account.on_tick("PAIR0", price), budget=budget)
+
+            # 订单簿：每条推送增量的应用，以及之后的买卖失衡与滑点估算
+            fake_book = FakeOrderBook(price)
+            book_snapshot = fake_book.snapshot()
+            # 价格每50条在两个位置间摆动，使部分档位穿价被移除
+            book_updates = [fake_book.update(price * (1 + 0.0005 * ((i // 50) % 2)))
+                            for i in range(ORDER_BOOK_UPDATES)]
+            book = OrderBook()
+            position = [0]
+
+            def book_update():
+                if position[0] % ORDER_BOOK_UPDATES == 0:
+                    book.load_snapshot(book_snapshot)
+                book.apply(book_updates[position[0] % ORDER_BOOK_UPDATES])
+                position[0] += 1
+                book.imbalance()
+                book.estimate_fill(True, 5.0)
+
+            bench("order_book_update", book_update, budget=budget)
+
+            # 完整周期：行情 + 全部周期增量同步 + 分析；价格周期：只请求行情
+            bench("cycle_full", engine.perform_analysis, budget=budget * 3)
+            bench("cycle_price", lambda: engine.perform_analysis([]), budget=budget * 3)
+        finally:
+            engine.close()
+
+    return results
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_baseline(path):
+    """读取基线：单次结果的JSON文件，或结果历史（JSON Lines）中的最后一条"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f.read().splitlines() if line.strip()]
+    except FileNotFoundError:
+        return None
+    if not lines:
+        return None
+    try:
+        return json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return json.loads("\n".join(lines))
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    与基线比较中位耗时，返回 [(名称, 基线, 当前, 比例)] 中的退化项
+    只有一个样本的项（cold_start）不是中位数，波动太大，不参与比较
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if current["samples"] < 2 or not previous or previous["samples"] < 2 or not previous["median"]:
+            continue
+        ratio = current["median"] / previous["median"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, previous["median"], current["median"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("--fixture", help="录制的1分钟K线JSON，不指定时使用固定种子的模拟行情")
+    parser.add_argument("--record", help="从交易所录制K线到该文件后退出")
+    parser.add_argument("--pair", default="ETH_USDT")
+    parser.add_argument("--minutes", type=int, default=24000, help="录制/模拟的1分钟K线数量")
+    parser.add_argument("--latency", type=float, default=BENCH_LATENCY, help="模拟网络延迟（秒）")
+    parser.add_argument("--budget", type=float, default=BENCH_TIME, help="每项测试的计时预算（秒）")
+    parser.add_argument("--save", help="把本次结果追加到该文件（JSON Lines）")
+    parser.add_argument("--baseline", help="基线文件，默认为 --save 文件中的上一次结果")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="允许变慢的比例")
+    parser.add_argument("--repeat", type=int, default=1, help="发现退化时最多运行的总次数，只报告每次都退化的项")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        client = GateClient()
+        try:
+            count = record_fixture(client, args.pair, args.minutes, args.record)
+        finally:
+            client.close()
+        print(f"✅ 已录制{args.pair} {count}根1分钟K线: {args.record}")
+        return 0
+
+    if args.fixture:
+        pair, minutes = load_fixture(args.fixture)
+        exchange = FakeExchange(minutes=minutes)
+        source = f"{args.fixture} ({pair} {len(minutes)}根)"
+    else:
+        exchange = FakeExchange(history_minutes=args.minutes, seed=0)
+        source = f"模拟行情 ({args.minutes}根)"
+    # 引擎请求的交易对使用该行情
+    exchange.market(args.pair)
+
+    print(f"⏱️ 基准测试: {source}，模拟延迟{args.latency * 1000:.0f}ms")
+    results = run_benchmarks(exchange, args.latency, args.budget, log=print)
+
+    record = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "fixture": args.fixture,
+        "latency": args.latency,
+        "results": results
+    }
+
+    status = 0
+    baseline_path = args.baseline or args.save
+    baseline = load_baseline(baseline_path) if baseline_path else None
+    if baseline and (baseline.get("latency"), baseline.get("fixture")) != (args.latency, args.fixture):
+        print("⚠️ 基线的模拟延迟或行情数据不同，跳过比较")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for attempt in range(2, args.repeat + 1):
+            if not regressions:
+                break
+            print(f"🔁 {len(regressions)}项变慢，第{attempt}次运行确认")
+            rerun = run_benchmarks(exchange, args.latency, args.budget)
+            # 每项保留中位耗时最短的一次
+            for name, current in rerun.items():
+                if current["median"] < results[name]["median"]:
+                    results[name] = current
+            regressions = compare(results, baseline, args.tolerance)
+        for name, previous, current, ratio in regressions:
+            print(f"❌ {name}: {format_seconds(previous)} -> {format_seconds(current)} (x{ratio:.2f})")
+        if regressions:
+            status = 1
+        else:
+            print(f"✅ 与基线 {baseline.get('commit') or baseline.get('time')} 相比无明显退化")
+
+    if args.save:
+        with open(args.save, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
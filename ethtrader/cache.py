@@ -0,0 +1,120 @@
+"""
+K线本地缓存
+按交易对和周期保存到SQLite，启动时先加载缓存，再从交易所补齐缺失的尾部
+"""
+
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class CandleCache:
+    """SQLite K线缓存，可在多个线程中共用"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS candles (
+                    pair TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL NOT NULL,
+                    high REAL NOT NULL,
+                    low REAL NOT NULL,
+                    close REAL NOT NULL,
+                    volume REAL NOT NULL,
+                    PRIMARY KEY (pair, interval, ts)
+                ) WITHOUT ROWID
+            """)
+            # 回补已下载的时间范围（交易所本身缺失K线的范围也记为已下载，不再重复请求）
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_pages (
+                    pair TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    from_ts INTEGER NOT NULL,
+                    to_ts INTEGER NOT NULL,
+                    PRIMARY KEY (pair, interval, from_ts, to_ts)
+                ) WITHOUT ROWID
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def load(self, pair, interval, limit=None, start=None, end=None):
+        """
+        读取K线，返回 decode_candles 格式的 (N, 6) 数组（按时间升序）
+        指定limit时只取最近的limit根
+        """
+        query = "SELECT ts, open, high, low, close, volume FROM candles WHERE pair = ? AND interval = ?"
+        params = [pair, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(int(start))
+        if end is not None:
+            query += " AND ts < ?"
+            params.append(int(end))
+        query += " ORDER BY ts DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        if not rows:
+            return np.empty((0, 6))
+        return np.array(rows[::-1], dtype=np.float64)
+
+    def save(self, pair, interval, rows):
+        """写入或覆盖K线，rows为 decode_candles 格式"""
+        if not len(rows):
+            return
+        records = [(pair, interval, int(ts), o, h, l, c, v)
+                   for ts, o, h, l, c, v in np.asarray(rows, dtype=np.float64).tolist()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+
+    def last_timestamp(self, pair, interval):
+        """缓存中最后一根K线的时间戳"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(ts) FROM candles WHERE pair = ? AND interval = ?",
+                (pair, interval)).fetchone()
+        return row[0] if row else None
+
+    def mark_fetched(self, pair, interval, ranges):
+        """记录已下载并写入的时间范围 [(from_ts, to_ts)]（均含）"""
+        records = [(pair, interval, int(start), int(end)) for start, end in ranges]
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO backfill_pages VALUES (?, ?, ?, ?)", records)
+
+    def fetched_ranges(self, pair, interval, start, end):
+        """与 [start, end] 重叠的已下载范围，按起始时间升序"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT from_ts, to_ts FROM backfill_pages WHERE pair = ? AND interval = ? "
+                "AND to_ts >= ? AND from_ts <= ? ORDER BY from_ts",
+                (pair, interval, int(start), int(end))).fetchall()
+
+    def count(self, pair, interval, start=None, end=None):
+        """K线数量，可限定 [start, end) 时间范围"""
+        query = "SELECT COUNT(*) FROM candles WHERE pair = ? AND interval = ?"
+        params = [pair, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(int(start))
+        if end is not None:
+            query += " AND ts < ?"
+            params.append(int(end))
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
@@ -0,0 +1,213 @@
+"""
+K线存储
+每个时间框架一个预分配的NumPy OHLCV数组，按时间戳增量合并新数据，
+指标计算直接读取连续内存视图，不产生拷贝
+"""
+
+import numpy as np
+
+from .metrics import metrics
+
+# 各周期对应秒数
+INTERVAL_SECONDS = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "4h": 14400
+}
+
+HISTORY_CAPACITY = 500
+
+# 价格与成交量列
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+def decode_candles(raw):
+    """
+    将Gate.io K线批量解码为按时间排序的 (N, 6) float64 数组
+    列为 时间戳, 开, 高, 低, 收, 成交量（基础币种）
+    """
+    with metrics.span("decode"):
+        return _decode_rows(raw)
+
+
+def _decode_rows(raw):
+    if not raw:
+        return np.empty((0, 6))
+
+    width = min(len(candle) for candle in raw)
+    table = np.array([candle[:7] for candle in raw], dtype=np.float64) if width >= 7 else \
+        np.array([candle[:6] for candle in raw], dtype=np.float64)
+
+    rows = np.empty((len(table), 6))
+    rows[:, 0] = table[:, 0]
+    rows[:, 1] = table[:, 5]
+    rows[:, 2] = table[:, 3]
+    rows[:, 3] = table[:, 4]
+    rows[:, 4] = table[:, 2]
+    if width >= 7:
+        rows[:, 5] = table[:, 6]
+    else:
+        # 旧格式只有计价币种成交量，按收盘价折算
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rows[:, 5] = np.where(table[:, 2] > 0, table[:, 1] / table[:, 2], 0.0)
+
+    return rows[np.argsort(rows[:, 0], kind="stable")]
+
+
+class CandleStore:
+    """
+    单个时间框架的有界OHLCV存储
+    底层数组长度为容量的两倍，写满时把最近的数据整体搬到开头，
+    因此追加为均摊O(1)，且有效数据始终是一段连续内存
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity * 2, dtype=np.int64)
+        self._values = np.zeros((5, capacity * 2), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+        # 已丢弃的K线数量，用于换算绝对序号
+        self.dropped = 0
+        # 每次修改递增，供缓存判断是否失效
+        self.version = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def nbytes(self):
+        """占用内存字节数（固定）"""
+        return self._timestamps.nbytes + self._values.nbytes
+
+    @property
+    def last_timestamp(self):
+        """最后一根K线的时间戳，为空时返回None"""
+        return int(self._timestamps[self._end - 1]) if len(self) else None
+
+    @property
+    def last_close(self):
+        return float(self._values[CLOSE, self._end - 1]) if len(self) else None
+
+    def _view(self, array):
+        view = array[..., self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamps(self):
+        """时间戳视图（只读，存储变化后需重新获取）"""
+        return self._view(self._timestamps)
+
+    @property
+    def opens(self):
+        return self._view(self._values[OPEN])
+
+    @property
+    def highs(self):
+        return self._view(self._values[HIGH])
+
+    @property
+    def lows(self):
+        return self._view(self._values[LOW])
+
+    @property
+    def closes(self):
+        return self._view(self._values[CLOSE])
+
+    @property
+    def volumes(self):
+        return self._view(self._values[VOLUME])
+
+    def ohlcv(self):
+        """(5, N) 的OHLCV视图"""
+        return self._view(self._values)
+
+    def index_of(self, timestamp):
+        """时间戳对应的位置，不存在时返回-1"""
+        timestamps = self.timestamps
+        index = int(np.searchsorted(timestamps, timestamp))
+        if index < len(timestamps) and timestamps[index] == timestamp:
+            return index
+        return -1
+
+    def between(self, start, end=None):
+        """[start, end) 时间范围内的位置区间"""
+        timestamps = self.timestamps
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return slice(lo, hi)
+
+    def clear(self):
+        self.dropped += len(self)
+        self._start = self._end = 0
+        self.version += 1
+
+    def reset(self, rows):
+        """用完整数据替换存储内容，rows为 decode_candles 格式"""
+        self.clear()
+        rows = np.asarray(rows, dtype=np.float64)[-self.capacity:]
+        count = len(rows)
+        self._timestamps[:count] = rows[:, 0]
+        self._values[:, :count] = rows[:, 1:6].T
+        self._end = count
+
+    def append(self, timestamp, open_, high, low, close, volume):
+        """追加一根新K线"""
+        if self._end == len(self._timestamps):
+            # 把最近 capacity-1 根搬到开头，为新K线腾出空间
+            keep = self.capacity - 1
+            begin = self._end - keep
+            self._timestamps[:keep] = self._timestamps[begin:self._end]
+            self._values[:, :keep] = self._values[:, begin:self._end]
+            self.dropped += begin - self._start
+            self._start, self._end = 0, keep
+
+        self._timestamps[self._end] = timestamp
+        self._values[:, self._end] = (open_, high, low, close, volume)
+        self._end += 1
+
+        if len(self) > self.capacity:
+            self._start += 1
+            self.dropped += 1
+        self.version += 1
+
+    def update_last(self, open_, high, low, close, volume):
+        """覆盖最后一根K线"""
+        self._values[:, self._end - 1] = (open_, high, low, close, volume)
+        self.version += 1
+
+    def set_row(self, index, open_, high, low, close, volume):
+        """覆盖指定位置的K线（用于校正历史K线）"""
+        self._values[:, self._start + index] = (open_, high, low, close, volume)
+        self.version += 1
+
+    def update_last_close(self, price):
+        """用最新成交价更新最后一根K线的收盘价及高低点"""
+        index = self._end - 1
+        self._values[HIGH, index] = max(self._values[HIGH, index], price)
+        self._values[LOW, index] = min(self._values[LOW, index], price)
+        self._values[CLOSE, index] = price
+        self.version += 1
+
+    def merge(self, rows):
+        """
+        合并增量数据，返回实际发生的变更列表 [(时间戳, (开, 高, 低, 收, 量), 是否新K线)]
+        早于最后一根的数据忽略，同一时间戳视为未收盘K线的更新
+        """
+        changes = []
+        for row in rows:
+            timestamp = int(row[0])
+            values = tuple(float(value) for value in row[1:6])
+            last_timestamp = self.last_timestamp
+            if last_timestamp is None or timestamp > last_timestamp:
+                self.append(timestamp, *values)
+                changes.append((timestamp, values, True))
+            elif timestamp == last_timestamp:
+                if values != tuple(self._values[:, self._end - 1]):
+                    self.update_last(*values)
+                    changes.append((timestamp, values, False))
+        return changes
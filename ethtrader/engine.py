@@ -0,0 +1,769 @@
+"""
+ETH多时间框架分析引擎
+不依赖Kivy，界面和服务器模式共用同一套信号逻辑
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .aggregate import TimeframeAggregator
+from .candles import HISTORY_CAPACITY, INTERVAL_SECONDS, CandleStore, decode_candles
+from .gateio import MAX_CANDLES_PER_REQUEST, GateAPIError, GateClient
+from .indicators import EMA, RSI, TimeframeIndicators
+from .metrics import metrics
+from .orderbook import DEPTH_LEVELS, OrderBookSync
+
+# 时间框架及显示名称
+TIMEFRAMES = {
+    "1m": "1分钟",
+    "5m": "5分钟",
+    "15m": "15分钟",
+    "1h": "1小时",
+    "4h": "4小时"
+}
+
+HISTORY_LIMIT = 100
+MIN_CANDLES = 25
+
+# 高周期由1分钟K线合成；1分钟需保留足够数据覆盖一整根4小时K线
+AGGREGATE_SOURCE = "1m"
+SOURCE_CAPACITY = 2000
+
+# 合成K线与交易所K线比对的容差（价格为相对误差，成交量允许少量成交归属差异）
+VERIFY_PRICE_TOLERANCE = 1e-9
+VERIFY_VOLUME_TOLERANCE = 1e-3
+
+NEUTRAL_COLOR = (0.8, 0.8, 0.8, 1)
+
+# 评分规则
+EMA_SCORE = 2
+RSI_SCORE = 1.5
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+
+# 单个时间框架信号阈值及等级
+SIGNAL_STRONG = 1.5
+SIGNAL_WEAK = 0.5
+SIGNALS = {
+    2: ("强烈看多", (0, 1, 0, 1)),  # 绿色
+    1: ("看多", (0.5, 1, 0.5, 1)),  # 浅绿色
+    0: ("中性", NEUTRAL_COLOR),  # 灰色
+    -1: ("看空", (1, 0.5, 0.5, 1)),  # 浅红色
+    -2: ("强烈看空", (1, 0, 0, 1))  # 红色
+}
+
+# 总体建议阈值及等级
+DIRECTION_STRONG = 1.5
+DIRECTION_WEAK = 0.8
+DIRECTIONS = {
+    2: ("强烈建议做多", "强", (0, 1, 0, 1)),
+    1: ("建议做多", "中", (0.5, 1, 0.5, 1)),
+    0: ("建议观望", "弱", NEUTRAL_COLOR),
+    -1: ("建议做空", "中", (1, 0.5, 0.5, 1)),
+    -2: ("强烈建议做空", "强", (1, 0, 0, 1))
+}
+
+# 置信度 = 基础值 + |平均分| × 斜率，(基础值, 上限)
+CONFIDENCE_STRONG = (75, 95)
+CONFIDENCE_WEAK = (65, 85)
+CONFIDENCE_NEUTRAL = 40
+CONFIDENCE_SLOPE = 10
+
+# 按ATR设置止损时使用的时间框架
+ATR_TIMEFRAME = "1h"
+
+
+def calculate_ema(prices, period):
+    """计算指数移动平均线（完整重算，实时路径使用增量状态）"""
+    ema = EMA(period)
+    ema.seed(prices)
+    return float(ema.value)
+
+
+def calculate_rsi(prices, period=14):
+    """计算RSI指标（Wilder平滑，完整重算）"""
+    rsi = RSI(period)
+    rsi.seed(prices)
+    return float(rsi.value)
+
+
+def score_signal(price, ema7, ema25, rsi):
+    """计算单个时间框架的信号分数"""
+    score = 0
+
+    # EMA排列
+    if price > ema7 > ema25:
+        score += EMA_SCORE
+    elif price < ema7 < ema25:
+        score -= EMA_SCORE
+
+    # RSI信号
+    if rsi > RSI_OVERBOUGHT:
+        score -= RSI_SCORE
+    elif rsi < RSI_OVERSOLD:
+        score += RSI_SCORE
+
+    return score
+
+
+def signal_level(score):
+    """分数对应的信号等级（-2 ~ 2）"""
+    if score >= SIGNAL_STRONG:
+        return 2
+    elif score >= SIGNAL_WEAK:
+        return 1
+    elif score <= -SIGNAL_STRONG:
+        return -2
+    elif score <= -SIGNAL_WEAK:
+        return -1
+    return 0
+
+
+def classify_signal(score):
+    """根据分数判断信号及颜色"""
+    return SIGNALS[signal_level(score)]
+
+
+def direction_level(avg_score):
+    """平均分对应的总体建议等级（-2 ~ 2）"""
+    if avg_score > DIRECTION_STRONG:
+        return 2
+    elif avg_score > DIRECTION_WEAK:
+        return 1
+    elif avg_score < -DIRECTION_STRONG:
+        return -2
+    elif avg_score < -DIRECTION_WEAK:
+        return -1
+    return 0
+
+
+def direction_confidence(level, avg_score):
+    """总体建议的置信度"""
+    if abs(level) == 2:
+        base, cap = CONFIDENCE_STRONG
+    elif abs(level) == 1:
+        base, cap = CONFIDENCE_WEAK
+    else:
+        return CONFIDENCE_NEUTRAL
+    return min(cap, base + abs(avg_score) * CONFIDENCE_SLOPE)
+
+
+def analyze_indicators(values):
+    """根据指标值生成单个时间框架的信号"""
+    if values["count"] < MIN_CANDLES:
+        return {
+            "price": values["price"],
+            "signal": "等待",
+            "color": NEUTRAL_COLOR,
+            "score": 0
+        }
+
+    current_price = values["price"]
+    rsi = values["rsi"]
+
+    score = score_signal(current_price, values["ema_fast"], values["ema_slow"], rsi)
+    level = signal_level(score)
+    signal, color = SIGNALS[level]
+
+    return {
+        "price": current_price,
+        "signal": signal,
+        "color": color,
+        "level": level,
+        "score": score,
+        "rsi": rsi
+    }
+
+
+def analyze_prices(prices):
+    """分析单个时间框架的收盘价序列（完整重算）"""
+    indicators = TimeframeIndicators()
+    indicators.seed(prices)
+    return analyze_indicators(indicators.values())
+
+
+def summarize_signals(results):
+    """汇总各时间框架结果，给出总体建议"""
+    if not results:
+        return None
+
+    signals_summary = {"看多": 0, "看空": 0, "中性": 0}
+    total_score = 0
+
+    for result in results.values():
+        signal_type = result["signal"]
+        if "看多" in signal_type:
+            signals_summary["看多"] += 1
+        elif "看空" in signal_type:
+            signals_summary["看空"] += 1
+        else:
+            signals_summary["中性"] += 1
+
+        total_score += result["score"]
+
+    avg_score = total_score / len(results)
+
+    level = direction_level(avg_score)
+    direction, strength, direction_color = DIRECTIONS[level]
+    confidence = direction_confidence(level, avg_score)
+
+    reason = f"看多:{signals_summary['看多']} 看空:{signals_summary['看空']} 中性:{signals_summary['中性']}"
+
+    return {
+        "direction": direction,
+        "level": level,
+        "strength": strength,
+        "color": direction_color,
+        "confidence": confidence,
+        "avg_score": avg_score,
+        "summary": signals_summary,
+        "reason": reason
+    }
+
+
+def plan_levels(is_long, price, trade_params, atr=None):
+    """
+    按交易参数计算止损、止盈和仓位
+    atr_multiple大于0且给出atr时，止损距离为 ATR × 倍数，否则为固定百分比
+    """
+    stop_distance = float(trade_params.get('stop_distance', 2.0))
+    risk_reward = float(trade_params.get('risk_reward', 1.5))
+    capital = float(trade_params.get('capital', 5000))
+    risk_percent = float(trade_params.get('risk_percent', 1))
+    atr_multiple = float(trade_params.get('atr_multiple', 0) or 0)
+    if atr and atr_multiple > 0 and price > 0:
+        stop_distance = atr * atr_multiple / price * 100
+
+    if is_long:
+        stop_loss = price * (1 - stop_distance/100)
+        take_profit = price * (1 + stop_distance/100 * risk_reward)
+    else:
+        stop_loss = price * (1 + stop_distance/100)
+        take_profit = price * (1 - stop_distance/100 * risk_reward)
+
+    # 计算仓位
+    risk_amount = capital * (risk_percent / 100)
+    price_risk = abs(price - stop_loss)
+    contract_amount = risk_amount / price_risk if price_risk > 0 else 0
+
+    return {
+        "stop_distance": stop_distance,
+        "stop_loss": stop_loss,
+        "take_profit": take_profit,
+        "capital": capital,
+        "risk_percent": risk_percent,
+        "risk_amount": risk_amount,
+        "contract_amount": contract_amount
+    }
+
+
+def format_liquidity(liquidity, quantity):
+    """交易计划的盘口流动性段落"""
+    lines = [f"\n\n📚 盘口流动性\n买卖失衡: {liquidity['imbalance']:+.2f} (前{DEPTH_LEVELS}档)"]
+    for name, fill in (("入场", liquidity["entry"]), ("止损出场", liquidity["exit"])):
+        if fill:
+            shortage = "" if fill["filled"] >= quantity else f", 挂单不足仅{fill['filled']:.4f} ETH"
+            lines.append(f"{name}滑点: {fill['slippage']:.3f}% (均价${fill['price']:.2f}, {fill['levels']}档{shortage})")
+    for name, depth in (("止损", liquidity["stop_depth"]), ("止盈", liquidity["target_depth"])):
+        lines.append(f"{name}价附近挂单: " + ("超出盘口范围" if depth is None else f"{depth:.4f} ETH"))
+    return "\n".join(lines)
+
+
+def create_trade_plan(direction, confidence, price, trade_params, atr=None, book=None):
+    """
+    创建交易计划，atr为 ATR_TIMEFRAME 的ATR（用于按波动设置止损）
+    book为已同步的 OrderBookSync 时附带按仓位估算的滑点和止损/止盈附近的挂单量
+    """
+    try:
+        is_long = "做多" in direction
+        action = "买入做多" if is_long else "卖出做空"
+        levels = plan_levels(is_long, price, trade_params, atr)
+
+        plan = f"""【📋 交易计划】
+ETH价格: ${price:.2f}
+信号: {direction}
+置信度: {confidence:.0f}%
+
+🎯 交易方向: {action}
+入场价: ${price:.2f}
+止损: ${levels['stop_loss']:.2f} ({levels['stop_distance']:.2f}%)
+止盈: ${levels['take_profit']:.2f}
+
+💰 资金管理
+本金: ${levels['capital']:.2f}
+单笔风险: ${levels['risk_amount']:.2f} ({levels['risk_percent']}%)
+合约数: {levels['contract_amount']:.4f} ETH
+
+⏰ 建议持仓: 2-4小时
+⚠️ 风险提示: 市场有风险"""
+
+        liquidity = book.plan_liquidity(is_long, levels['contract_amount'], levels['stop_loss'],
+                                        levels['take_profit']) if book is not None else None
+        if liquidity:
+            plan += format_liquidity(liquidity, levels['contract_amount'])
+
+        return plan
+
+    except Exception as e:
+        return f"生成计划错误: {str(e)}"
+
+
+class AnalysisEngine:
+    """行情获取与多时间框架分析，结果以字典返回，由调用方负责展示"""
+
+    def __init__(self, client=None, currency_pair="ETH_USDT", log=None, executor=None, cache=None,
+                 aggregate=True):
+        self.log = log or print
+        self.client = client or GateClient(log=self.log)
+        self.currency_pair = currency_pair
+        self.cache = cache
+
+        # 有界线程池，各时间框架并行请求；同一时刻只允许一轮同步/分析
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=len(TIMEFRAMES) + 1, thread_name_prefix="ethtrader-io")
+        self._owns_executor = executor is None
+        self._lock = threading.RLock()
+
+        # 推送模式（同时维护订单簿）
+        self.feed = None
+        self.order_book = None
+        self.last_price = None
+        self._on_snapshot = None
+        self._last_direction = None
+
+        # K线存储及对应的增量指标状态
+        self.candles = {
+            tf_key: CandleStore(SOURCE_CAPACITY if aggregate and tf_key == AGGREGATE_SOURCE else HISTORY_CAPACITY)
+            for tf_key in TIMEFRAMES
+        }
+        self.indicators = {tf_key: TimeframeIndicators() for tf_key in TIMEFRAMES}
+
+        # 高周期合成器，首次从交易所同步该周期后才启用
+        self.aggregators = {}
+        if aggregate:
+            self.aggregators = {tf_key: TimeframeAggregator(INTERVAL_SECONDS[tf_key])
+                                for tf_key in TIMEFRAMES if tf_key != AGGREGATE_SOURCE}
+        self.verify_mismatches = 0
+        self._pending_verify = []
+        # 推送模式下同一时刻最多一个校验任务在线程池中排队或运行
+        self._verify_scheduled = False
+
+    def log_message(self, message):
+        """记录日志"""
+        self.log(message)
+
+    def close(self):
+        """释放线程池和连接池"""
+        self.stop_stream()
+        self.save_cache()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+        close = getattr(self.client, "close", None)
+        if close:
+            close()
+
+    def load_cache(self):
+        """从本地缓存加载K线，返回成功加载的时间框架数量"""
+        if self.cache is None:
+            return 0
+
+        loaded = 0
+        with self._lock:
+            for tf_key, tf_name in TIMEFRAMES.items():
+                try:
+                    rows = self.cache.load(self.currency_pair, tf_key, self.candles[tf_key].capacity)
+                    if len(rows):
+                        self.set_history(tf_key, rows)
+                        self.log_message(f"💾 {tf_name}缓存: {len(rows)}条")
+                        loaded += 1
+                except Exception as e:
+                    self.log_message(f"❌ {tf_key}缓存读取错误: {str(e)}")
+        return loaded
+
+    def save_cache(self):
+        """把内存中的K线写回缓存（推送模式下的更新只在内存中）"""
+        if self.cache is None:
+            return
+        with self._lock:
+            for tf_key, store in self.candles.items():
+                if len(store):
+                    rows = np.column_stack((store.timestamps, store.ohlcv().T))
+                    self._save_rows(tf_key, rows)
+
+    def _save_rows(self, tf_key, rows):
+        if self.cache is None:
+            return
+        try:
+            self.cache.save(self.currency_pair, tf_key, rows)
+        except Exception as e:
+            self.log_message(f"❌ {tf_key}缓存写入错误: {str(e)}")
+
+    def test_api(self):
+        """测试API连接"""
+        try:
+            self.client.tickers(self.currency_pair, timeout=10)
+            self.log_message("✅ API连接成功")
+            return True
+        except GateAPIError:
+            self.log_message("❌ API连接失败")
+        except Exception as e:
+            self.log_message(f"❌ API测试错误: {str(e)}")
+        return False
+
+    def get_real_time_price(self):
+        """获取实时价格"""
+        try:
+            tickers = self.client.tickers(self.currency_pair)
+
+            if tickers and len(tickers) > 0:
+                ticker = tickers[0]
+
+                price = float(ticker["last"])
+                change_percent = float(ticker["change_percentage"])
+
+                self.last_price = {"price": price, "change": change_percent}
+                return self.last_price
+
+            return None
+
+        except Exception as e:
+            self.log_message(f"价格获取错误: {str(e)}")
+            return None
+
+    def fetch_history_data(self, timeframes=None):
+        """
+        并行同步各时间框架K线，首次全量下载，之后只取最后一根之后的增量
+        高周期在合成器就绪后不再单独请求，由1分钟K线合成
+        timeframes指定只同步部分周期（合成周期会同步1分钟K线）
+        """
+        with self._lock:
+            requested = set(TIMEFRAMES if timeframes is None else timeframes)
+            if any(self._is_aggregated(tf_key) for tf_key in requested):
+                requested.add(AGGREGATE_SOURCE)
+            requested = [tf_key for tf_key in TIMEFRAMES if tf_key in requested]
+
+            direct = [tf_key for tf_key in requested if not self._is_aggregated(tf_key)]
+            self._sync_parallel(direct)
+
+            # 1分钟全量重载会使合成器失效，这些周期需重新从交易所补齐
+            self._sync_parallel([tf_key for tf_key in requested
+                                 if tf_key not in direct and not self._is_aggregated(tf_key)])
+
+            self._seed_aggregators()
+            self._verify_closed()
+
+    def _sync_parallel(self, tf_keys):
+        futures = [self.executor.submit(self._timed_sync, tf_key) for tf_key in tf_keys]
+        for future in futures:
+            future.result()
+
+    def _timed_sync(self, tf_key):
+        with metrics.span("sync", tf=tf_key):
+            return self.sync_timeframe(tf_key)
+
+    def _is_aggregated(self, tf_key):
+        aggregator = self.aggregators.get(tf_key)
+        return aggregator is not None and aggregator.ready
+
+    def _seed_aggregators(self):
+        """用1分钟K线初始化尚未就绪的合成器"""
+        source = self.candles[AGGREGATE_SOURCE]
+        if not len(source):
+            return
+
+        rows = None
+        for tf_key, aggregator in self.aggregators.items():
+            if aggregator.ready or not len(self.candles[tf_key]):
+                continue
+            if rows is None:
+                rows = np.column_stack((source.timestamps, source.ohlcv().T))
+            if aggregator.seed(rows):
+                self.merge_candles(tf_key, [aggregator.current()])
+                self.log_message(f"🔗 {TIMEFRAMES[tf_key]}改为由1分钟K线合成")
+
+    def _verify_closed(self):
+        """
+        核对刚收盘的合成K线与交易所K线，不一致时以交易所为准
+        在调用线程中依次请求：推送模式下本方法本身在线程池中运行，再向同一线程池提交并等待会耗尽线程而死锁
+        """
+        with self._lock:
+            pending, self._pending_verify = self._pending_verify, []
+        if not pending:
+            return
+
+        for tf_key, timestamp in pending:
+            try:
+                rows = decode_candles(self.client.candlesticks(self.currency_pair, tf_key, from_ts=timestamp))
+            except Exception as e:
+                self.log_message(f"❌ {tf_key}校验错误: {str(e)}")
+                continue
+            with self._lock:
+                self._apply_verification(tf_key, timestamp, rows)
+
+    def _apply_verification(self, tf_key, timestamp, rows):
+        store = self.candles[tf_key]
+        remote = rows[rows[:, 0] == timestamp]
+        index = store.index_of(timestamp)
+        if not len(remote) or index < 0:
+            return True
+
+        local = store.ohlcv()[:, index]
+        remote = remote[0, 1:6]
+        if np.allclose(local[:4], remote[:4], rtol=VERIFY_PRICE_TOLERANCE, atol=0) and \
+                np.isclose(local[4], remote[4], rtol=VERIFY_VOLUME_TOLERANCE, atol=1e-8):
+            return True
+
+        # 历史K线被修正，指标需整体重算
+        store.set_row(index, *remote)
+        self._seed_indicators(tf_key)
+        self.verify_mismatches += 1
+        self.log_message(f"⚠️ {TIMEFRAMES[tf_key]}合成K线与交易所不一致，已校正")
+        return False
+
+    def sync_timeframe(self, tf_key):
+        """增量同步单个时间框架，返回新增K线数量"""
+        tf_name = TIMEFRAMES[tf_key]
+        last_timestamp = self.candles[tf_key].last_timestamp
+
+        try:
+            # 存储为空或落后太多时全量下载
+            if last_timestamp is None or self._missing_candles(tf_key) >= MAX_CANDLES_PER_REQUEST:
+                rows = decode_candles(self.client.candlesticks(
+                    self.currency_pair, tf_key, self._history_limit(tf_key)))
+                if len(rows):
+                    self.set_history(tf_key, rows)
+                    if tf_key == AGGREGATE_SOURCE:
+                        for aggregator in self.aggregators.values():
+                            aggregator.reset()
+                    self._save_rows(tf_key, rows)
+                    self.log_message(f"✅ {tf_name}数据: {len(rows)}条")
+                return len(rows)
+
+            # 从最后一根（可能未收盘）开始取，覆盖该K线并追加之后的新K线
+            rows = decode_candles(self.client.candlesticks(self.currency_pair, tf_key, from_ts=last_timestamp))
+            with metrics.span("indicators", tf=tf_key, op="merge"):
+                added = self.merge_candles(tf_key, rows)
+            self._save_rows(tf_key, rows)
+            return added
+
+        except Exception as e:
+            self.log_message(f"❌ {tf_key}数据错误: {str(e)}")
+            return 0
+
+    def _history_limit(self, tf_key):
+        """全量下载数量，作为合成来源的1分钟K线需覆盖一整根最高周期K线"""
+        if self.aggregators and tf_key == AGGREGATE_SOURCE:
+            return min(self.candles[tf_key].capacity, MAX_CANDLES_PER_REQUEST)
+        return HISTORY_LIMIT
+
+    def _missing_candles(self, tf_key):
+        """距离最后一根K线缺失的K线数量"""
+        return (time.time() - self.candles[tf_key].last_timestamp) // INTERVAL_SECONDS[tf_key]
+
+    def set_history(self, tf_key, rows):
+        """替换整段历史并重建指标状态"""
+        store = self.candles[tf_key]
+        with metrics.span("indicators", tf=tf_key, op="seed"):
+            store.reset(rows)
+            self._seed_indicators(tf_key)
+
+    def _seed_indicators(self, tf_key):
+        store = self.candles[tf_key]
+        self.indicators[tf_key].seed(store.closes.tolist(), store.highs.tolist(), store.lows.tolist(),
+                                     store.volumes.tolist())
+
+    def merge_candles(self, tf_key, rows):
+        """合并增量K线并同步更新指标，1分钟K线同时驱动高周期合成，返回新增K线数量"""
+        indicators = self.indicators[tf_key]
+        added = 0
+        for _, (_, high, low, close, volume), is_new in self.candles[tf_key].merge(rows):
+            if is_new:
+                indicators.append(close, high, low, volume)
+                added += 1
+            else:
+                indicators.update_last(close, high, low, volume)
+
+        if tf_key == AGGREGATE_SOURCE:
+            for agg_key, aggregator in self.aggregators.items():
+                if not aggregator.ready:
+                    continue
+                for row in rows:
+                    bar, closed_bucket = aggregator.update(row)
+                    if bar is not None:
+                        self.merge_candles(agg_key, [bar])
+                    if closed_bucket is not None:
+                        self._pending_verify.append((agg_key, closed_bucket))
+        return added
+
+    def update_last_candle(self, tf_key, price):
+        """用最新成交价更新未收盘的最后一根K线"""
+        store = self.candles[tf_key]
+        if not len(store):
+            return
+        store.update_last_close(price)
+        self.indicators[tf_key].update_last(price)
+
+    def analyze_timeframe(self, tf_key):
+        """分析单个时间框架"""
+        return analyze_indicators(self.indicators[tf_key].values())
+
+    def indicator_values(self, tf_key):
+        """单个时间框架的全部指标值（含MACD、布林带、ATR、VWAP）"""
+        with self._lock:
+            indicators = self.indicators[tf_key]
+            return dict(indicators.values(), **indicators.extended_values())
+
+    def update_forming_candles(self, price, now=None):
+        """用最新价格更新仍未收盘的最后一根K线，已收盘但尚未同步的周期不动"""
+        now = time.time() if now is None else now
+        for tf_key, store in self.candles.items():
+            if len(store) and store.last_timestamp + INTERVAL_SECONDS[tf_key] > now:
+                self.update_last_candle(tf_key, price)
+
+    def perform_analysis(self, timeframes=None):
+        """
+        执行分析，返回本轮结果快照
+        timeframes指定本轮需同步K线的周期（默认全部），其余周期只用最新价格更新未收盘K线
+        """
+        started = time.perf_counter()
+        with self._lock:
+            # 价格与K线并行请求，耗时约等于最慢的一次往返
+            price_future = self.executor.submit(self.get_real_time_price)
+            if timeframes is None or timeframes:
+                self.fetch_history_data(timeframes)
+
+            price_data = price_future.result()
+            if price_data:
+                self.update_forming_candles(price_data["price"])
+
+            snapshot = {
+                "time": datetime.now(),
+                "price": price_data,
+                "timeframes": {},
+                "overall": None,
+                "atr": None,
+                "depth": None
+            }
+            self._analyze(snapshot)
+
+        metrics.observe("cycle", time.perf_counter() - started)
+        return snapshot
+
+    def _analyze(self, snapshot, log_always=True):
+        """基于当前K线分析各时间框架，结果写入快照"""
+        try:
+            with metrics.span("analyze"):
+                for tf_key in TIMEFRAMES:
+                    if len(self.candles[tf_key]) >= MIN_CANDLES:
+                        snapshot["timeframes"][tf_key] = self.analyze_timeframe(tf_key)
+
+                overall = summarize_signals(snapshot["timeframes"])
+                # 只读取ATR所依赖的节点，其余扩展指标按需计算
+                snapshot["atr"] = self.indicators[ATR_TIMEFRAME].atr.value
+            snapshot["overall"] = overall
+
+            if overall and (log_always or overall["direction"] != self._last_direction):
+                log_msg = f"[{snapshot['time'].strftime('%H:%M:%S')}] {overall['direction']} | 置信度: {overall['confidence']:.0f}%"
+                self.log_message(log_msg)
+            self._last_direction = overall["direction"] if overall else None
+
+        except Exception as e:
+            self.log_message(f"分析错误: {str(e)}")
+
+    def start_stream(self, on_snapshot, url=None, order_book=True):
+        """
+        启动WebSocket推送模式
+        每条ticker/K线推送都更新K线缓冲区并重新分析，快照通过on_snapshot回调（在推送线程中调用）
+        order_book为True时同时订阅订单簿增量，快照中附带盘口概况
+        """
+        from .wsfeed import WS_URL, GateFeed
+
+        if self.feed and self.feed.running:
+            return
+
+        self._on_snapshot = on_snapshot
+        # 启用合成时只需订阅1分钟K线
+        intervals = [AGGREGATE_SOURCE] if self.aggregators else list(TIMEFRAMES)
+        self.order_book = OrderBookSync(self.client, self.currency_pair, log=self.log_message) if order_book else None
+
+        # 已解除的推送在其线程退出前仍可能回调，只处理当前推送的数据
+        def current(handler):
+            def callback(*args):
+                if feed is self.feed:
+                    handler(*args)
+            return callback
+
+        feed = GateFeed(
+            self.currency_pair, intervals,
+            on_ticker=current(self._on_stream_ticker),
+            on_candle=current(self._on_stream_candle),
+            # 每次（重）连接后用REST增量补齐断线期间缺失的K线；订单簿由编号检查自动重新同步
+            on_connect=current(self.fetch_history_data),
+            on_order_book=self.order_book.on_update if self.order_book else None,
+            url=url or WS_URL,
+            log=self.log_message)
+        self.feed = feed
+        feed.start()
+
+    def detach_stream(self):
+        """
+        解除推送但不等待推送线程退出，返回需停止的推送（没有时为None），由调用方在后台调用其stop；
+        解除后可立即重新 start_stream
+        """
+        feed, self.feed = self.feed, None
+        self.order_book = None
+        self._on_snapshot = None
+        return feed
+
+    def stop_stream(self):
+        """停止推送模式"""
+        feed = self.detach_stream()
+        if feed:
+            feed.stop()
+
+    def _on_stream_ticker(self, price_data):
+        self.last_price = price_data
+        self._publish()
+
+    def _on_stream_candle(self, tf_key, row):
+        # 历史数据尚未下载时不接收推送，否则之后的增量同步将无法补齐历史
+        if tf_key not in self.candles or not len(self.candles[tf_key]):
+            return
+        with self._lock:
+            self.merge_candles(tf_key, [row])
+        if self._pending_verify and not self._verify_scheduled:
+            self._verify_scheduled = True
+            self.executor.submit(self._run_verify)
+        self._publish()
+
+    def _run_verify(self):
+        self._verify_scheduled = False
+        self._verify_closed()
+
+    def snapshot(self, log_always=False):
+        """基于内存中的数据分析，不发起网络请求"""
+        with self._lock:
+            snapshot = {
+                "time": datetime.now(),
+                "price": self.last_price,
+                "timeframes": {},
+                "overall": None,
+                "atr": None,
+                "depth": None
+            }
+            self._analyze(snapshot, log_always=log_always)
+        order_book = self.order_book
+        if order_book is not None:
+            snapshot["depth"] = order_book.summary()
+        return snapshot
+
+    def _publish(self):
+        """重新分析并回调"""
+        snapshot = self.snapshot()
+        on_snapshot = self._on_snapshot
+        if on_snapshot:
+            on_snapshot(snapshot)
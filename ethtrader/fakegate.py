@@ -0,0 +1,486 @@
+"""
+本地模拟Gate.io行情服务，用于离线测试和基准测试
+行情由固定随机种子的1分钟随机游走生成（或回放录制的1分钟K线），高周期K线由1分钟K线合成，
+订单簿围绕当前价格随机变化
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from .candles import INTERVAL_SECONDS
+from .wsfeed import websockets
+
+API_PREFIX = "/api/v4"
+
+# 模拟订单簿每边的档数
+FAKE_BOOK_LEVELS = 200
+
+
+class FakeOrderBook:
+    """
+    模拟订单簿：以行情价格为中心、按最小价格单位排列的买卖档位
+    每次更新随机修改靠近盘口的档位并移除穿价的档位，生成带连续更新编号的增量
+    """
+
+    def __init__(self, price, levels=FAKE_BOOK_LEVELS, seed=0):
+        self.random = random.Random(seed)
+        # 最小价格单位约为价格的万分之一
+        self.tick = 10 ** round(np.log10(price) - 4)
+        self.decimals = max(0, -int(round(np.log10(self.tick))))
+        self.levels = levels
+        self.id = 1
+        self.lock = threading.Lock()
+        center = round(price / self.tick)
+        self.bids = {center - i: self._amount() for i in range(1, levels + 1)}
+        self.asks = {center + i: self._amount() for i in range(1, levels + 1)}
+
+    def _amount(self):
+        return round(self.random.expovariate(1.0), 4)
+
+    def _format(self, ticks, amount):
+        return [f"{ticks * self.tick:.{self.decimals}f}", f"{amount:.4f}"]
+
+    def snapshot(self, limit=100):
+        """REST /spot/order_book?with_id=true 格式"""
+        with self.lock:
+            bids = sorted(self.bids.items(), reverse=True)[:limit]
+            asks = sorted(self.asks.items())[:limit]
+            now = int(time.time() * 1000)
+            return {"id": self.id, "current": now, "update": now,
+                    "bids": [self._format(t, a) for t, a in bids],
+                    "asks": [self._format(t, a) for t, a in asks]}
+
+    def update(self, price, changes=6, skip=0):
+        """
+        随价格推进一次，返回 spot.order_book_update 格式的增量
+        skip为跳过（不推送）的更新编号数，用于测试编号中断
+        """
+        with self.lock:
+            center = round(price / self.tick)
+            bids, asks = [], []
+            for ticks in [t for t in self.bids if t >= center]:
+                del self.bids[ticks]
+                bids.append(self._format(ticks, 0))
+            for ticks in [t for t in self.asks if t <= center]:
+                del self.asks[ticks]
+                asks.append(self._format(ticks, 0))
+
+            for _ in range(changes):
+                is_bid = self.random.random() < 0.5
+                book, changed = (self.bids, bids) if is_bid else (self.asks, asks)
+                offset = 1 + int(self.random.expovariate(0.15))
+                ticks = center - offset if is_bid else center + offset
+                amount = 0.0 if ticks in book and self.random.random() < 0.3 else self._amount()
+                if amount > 0:
+                    book[ticks] = amount
+                elif ticks in book:
+                    del book[ticks]
+                else:
+                    continue
+                changed.append(self._format(ticks, amount))
+
+            first = self.id + 1 + skip
+            self.id = first + self.random.randint(0, 3)
+            return {"t": int(time.time() * 1000), "e": "depthUpdate", "E": int(time.time()),
+                    "U": first, "u": self.id, "b": bids, "a": asks}
+
+    def state(self):
+        """当前全部档位 ({买价: 数量}, {卖价: 数量})，用于核对"""
+        with self.lock:
+            return ({round(t * self.tick, self.decimals): a for t, a in self.bids.items()},
+                    {round(t * self.tick, self.decimals): a for t, a in self.asks.items()})
+
+
+class FakeMarket:
+    """单个交易对的模拟行情"""
+
+    def __init__(self, currency_pair="ETH_USDT", price=3000.0, volatility=0.001,
+                 history_minutes=24000, seed=None, clock=time.time, minutes=None):
+        self.currency_pair = currency_pair
+        self.volatility = volatility
+        self.clock = clock
+        self.random = random.Random(zlib.crc32(currency_pair.encode()) if seed is None else seed)
+        self.lock = threading.Lock()
+
+        # 1分钟K线 [时间戳, 开, 高, 低, 收, 成交量]，最后一根未收盘
+        now = int(self.clock()) // 60 * 60
+        if minutes:
+            # 回放录制的K线：整体平移到当前时间，最后一根作为未收盘K线
+            shift = now - int(minutes[-1][0])
+            self.minutes = [[int(m[0]) + shift] + [float(x) for x in m[1:6]] for m in minutes]
+        else:
+            self.minutes = []
+            for i in range(history_minutes, -1, -1):
+                self._new_minute(now - i * 60, price)
+                for _ in range(3):
+                    price = self._step(price)
+        self.open_24h = self.minutes[max(0, len(self.minutes) - 1440)][1]
+        self._book = None
+
+    def _step(self, price):
+        """价格走一步并更新当前1分钟K线"""
+        price *= 1 + self.random.gauss(0, self.volatility)
+        bar = self.minutes[-1]
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        bar[5] += self.random.uniform(0.1, 5.0)
+        return price
+
+    def _new_minute(self, timestamp, price):
+        self.minutes.append([timestamp, price, price, price, price, 0.0])
+
+    @property
+    def price(self):
+        return self.minutes[-1][4]
+
+    def tick(self):
+        """推进一次行情，跨分钟时开启新K线"""
+        with self.lock:
+            minute = int(self.clock()) // 60 * 60
+            if minute > self.minutes[-1][0]:
+                self._new_minute(minute, self.price)
+            self._step(self.price)
+
+    def bars(self, interval, from_ts=None, limit=100, to_ts=None):
+        """按周期合成K线，返回 [时间戳, 开, 高, 低, 收, 成交量, 是否收盘]"""
+        seconds = INTERVAL_SECONDS[interval]
+        with self.lock:
+            if from_ts is None:
+                start = (self.minutes[-1][0] // seconds - limit + 1) * seconds
+            else:
+                start = int(from_ts) // seconds * seconds
+            stop = self.minutes[-1][0] if to_ts is None else int(to_ts) // seconds * seconds + seconds - 1
+            minutes = [m for m in self.minutes if start <= m[0] <= stop]
+
+        bars = []
+        for timestamp, o, h, l, c, v in minutes:
+            bucket = timestamp // seconds * seconds
+            if bars and bars[-1][0] == bucket:
+                bar = bars[-1]
+                bar[2] = max(bar[2], h)
+                bar[3] = min(bar[3], l)
+                bar[4] = c
+                bar[5] += v
+            else:
+                bars.append([bucket, o, h, l, c, v, True])
+        if bars and bars[-1][0] + seconds > self.minutes[-1][0]:
+            # 最后一根包含未收盘的1分钟K线
+            bars[-1][6] = False
+        return bars if from_ts is not None else bars[-limit:]
+
+    def candlesticks(self, interval, from_ts=None, limit=100, to_ts=None):
+        """Gate.io REST格式K线"""
+        return [[str(ts), f"{v * c:.8f}", f"{c:.8f}", f"{h:.8f}", f"{l:.8f}", f"{o:.8f}",
+                 f"{v:.8f}", "true" if closed else "false"]
+                for ts, o, h, l, c, v, closed in self.bars(interval, from_ts, limit, to_ts)]
+
+    def ticker(self):
+        """Gate.io REST格式行情"""
+        price = self.price
+        change = (price / self.open_24h - 1) * 100
+        return {
+            "currency_pair": self.currency_pair,
+            "last": f"{price:.8f}",
+            "lowest_ask": f"{price * 1.0001:.8f}",
+            "highest_bid": f"{price * 0.9999:.8f}",
+            "change_percentage": f"{change:.2f}",
+            "base_volume": f"{sum(m[5] for m in self.minutes[-1440:]):.8f}",
+            "quote_volume": f"{sum(m[5] * m[4] for m in self.minutes[-1440:]):.8f}",
+            "high_24h": f"{max(m[2] for m in self.minutes[-1440:]):.8f}",
+            "low_24h": f"{min(m[3] for m in self.minutes[-1440:]):.8f}"
+        }
+
+    @property
+    def book(self):
+        """模拟订单簿（首次使用时以当前价格创建）"""
+        with self.lock:
+            if self._book is None:
+                self._book = FakeOrderBook(self.price, seed=zlib.crc32(self.currency_pair.encode()))
+            return self._book
+
+    def candle_update(self, interval):
+        """Gate.io WebSocket格式的当前K线推送内容"""
+        ts, o, h, l, c, v, closed = self.bars(interval, limit=1)[-1]
+        return {
+            "t": str(ts), "v": f"{v * c:.8f}", "c": f"{c:.8f}", "h": f"{h:.8f}",
+            "l": f"{l:.8f}", "o": f"{o:.8f}", "n": f"{interval}_{self.currency_pair}",
+            "a": f"{v:.8f}", "w": closed
+        }
+
+
+class FakeExchange:
+    """多个交易对的模拟行情，按需创建"""
+
+    def __init__(self, history_minutes=24000, **market_options):
+        self.history_minutes = history_minutes
+        self.market_options = market_options
+        self.markets = {}
+        self._lock = threading.Lock()
+
+    def market(self, currency_pair):
+        with self._lock:
+            if currency_pair not in self.markets:
+                self.markets[currency_pair] = FakeMarket(
+                    currency_pair, history_minutes=self.history_minutes, **self.market_options)
+            return self.markets[currency_pair]
+
+
+def load_fixture(path):
+    """读取录制的1分钟K线，返回 (交易对, [[时间戳, 开, 高, 低, 收, 成交量]])"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["currency_pair"], data["minutes"]
+
+
+def record_fixture(client, currency_pair, minutes, path):
+    """从交易所录制最近minutes根1分钟K线到JSON文件，返回录制的数量"""
+    from .backfill import dedup_rows, plan_pages
+    from .candles import decode_candles
+
+    end = int(time.time()) // 60 * 60 + 60
+    pages = plan_pages(end - minutes * 60, end, "1m")
+    rows = [decode_candles(client.candlesticks(currency_pair, "1m", from_ts=page_start, to_ts=page_end))
+            for page_start, page_end in pages]
+    rows = dedup_rows(np.concatenate([r for r in rows if len(r)])).tolist()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"currency_pair": currency_pair, "recorded_at": int(time.time()),
+                   "minutes": [[int(r[0])] + r[1:] for r in rows]}, f)
+    return len(rows)
+
+
+class FakeGateHTTP:
+    """
+    模拟Gate.io v4 REST服务（/spot/tickers、/spot/candlesticks），在后台线程中运行
+    latency为每个请求的固定延迟（秒），jitter为额外的随机延迟上限，用于模拟网络往返
+    """
+
+    def __init__(self, exchange=None, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+        self.exchange = exchange or FakeExchange()
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fakegate-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, path, query):
+        """返回 (状态码, JSON数据)"""
+        self.requests += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        pair = params.get("currency_pair")
+        if path == f"{API_PREFIX}/spot/tickers":
+            pairs = [pair] if pair else list(self.exchange.markets) or ["ETH_USDT"]
+            return 200, [self.exchange.market(p).ticker() for p in pairs]
+
+        if path == f"{API_PREFIX}/spot/candlesticks":
+            interval = params.get("interval", "30m")
+            if not pair or interval not in INTERVAL_SECONDS:
+                return 400, {"label": "INVALID_PARAM_VALUE", "message": "invalid currency_pair or interval"}
+            if "limit" in params and ("from" in params or "to" in params):
+                return 400, {"label": "INVALID_PARAM_VALUE", "message": "limit conflicts with from/to"}
+            market = self.exchange.market(pair)
+            return 200, market.candlesticks(interval, params.get("from"), int(params.get("limit", 100)),
+                                            params.get("to"))
+
+        if path == f"{API_PREFIX}/spot/order_book":
+            if not pair:
+                return 400, {"label": "INVALID_PARAM_VALUE", "message": "invalid currency_pair"}
+            return 200, self.exchange.market(pair).book.snapshot(int(params.get("limit", 10)))
+
+        return 404, {"label": "NOT_FOUND", "message": path}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 头部与正文分两次写出，keep-alive下需关闭Nagle，否则每个请求多等一个延迟确认
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, data = server.handle(url.path, url.query)
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeGateWS:
+    """
+    模拟Gate.io v4 WebSocket服务，支持订阅tickers/candlesticks/order_book_update并定时推送
+    skip_updates大于0时，之后的订单簿增量跳过相应数量的更新编号（每次推送消耗一个），用于测试重新同步
+    """
+
+    def __init__(self, exchange=None, host="127.0.0.1", port=0, push_interval=0.1):
+        self.exchange = exchange or FakeExchange()
+        self.host = host
+        self.port = port
+        self.push_interval = push_interval
+        self.skip_updates = 0
+
+        self.clients = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/ws/v4/"
+
+    def start(self):
+        """在后台线程中启动服务，返回后即可连接"""
+        if websockets is None:
+            raise RuntimeError("未安装websockets，无法启动模拟推送服务")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._thread_main, name="fakegate-ws", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+        self._thread.join(10)
+        self._thread = None
+
+    def drop_connections(self):
+        """断开所有客户端，用于测试自动重连"""
+        asyncio.run_coroutine_threadsafe(self._close_clients(), self._loop).result(10)
+
+    def _thread_main(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._serve())
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _serve(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._push_task = asyncio.ensure_future(self._push_loop())
+        self._ready.set()
+
+    async def _shutdown(self):
+        self._push_task.cancel()
+        await self._close_clients()
+        self._server.close()
+        await self._server.wait_closed()
+        self._loop.call_soon(self._loop.stop)
+
+    async def _close_clients(self):
+        for ws in list(self.clients):
+            await ws.close()
+
+    async def _handler(self, ws):
+        subscriptions = set()
+        self.clients[ws] = subscriptions
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                channel = message.get("channel")
+                event = message.get("event")
+                payload = tuple(message.get("payload") or ())
+
+                if channel == "spot.ping":
+                    reply = {"time": int(time.time()), "channel": "spot.pong", "event": "", "result": None}
+                elif event in ("subscribe", "unsubscribe"):
+                    if event == "subscribe":
+                        subscriptions.add((channel, payload))
+                    else:
+                        subscriptions.discard((channel, payload))
+                    reply = {"time": int(time.time()), "channel": channel, "event": event,
+                             "result": {"status": "success"}}
+                else:
+                    reply = {"time": int(time.time()), "channel": channel, "event": event,
+                             "error": {"code": 2, "message": "unknown event"}}
+                await ws.send(json.dumps(reply))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.clients.pop(ws, None)
+
+    async def _push_loop(self):
+        while True:
+            await asyncio.sleep(self.push_interval)
+
+            pairs = set()
+            books = set()
+            for subscriptions in self.clients.values():
+                for channel, payload in subscriptions:
+                    if channel == "spot.order_book_update":
+                        books.add(payload[0])
+                        pairs.add(payload[0])
+                    else:
+                        pairs.add(payload[-1])
+            for pair in pairs:
+                self.exchange.market(pair).tick()
+            # 同一交易对的订单簿增量对所有订阅者相同
+            skip = 1 if self.skip_updates > 0 else 0
+            self.skip_updates -= skip
+            book_updates = {}
+            for pair in books:
+                market = self.exchange.market(pair)
+                book_updates[pair] = market.book.update(market.price, skip=skip)
+
+            for ws, subscriptions in list(self.clients.items()):
+                for channel, payload in list(subscriptions):
+                    if channel == "spot.order_book_update":
+                        result = book_updates[payload[0]]
+                    elif channel == "spot.tickers":
+                        result = self.exchange.market(payload[-1]).ticker()
+                    elif channel == "spot.candlesticks":
+                        result = self.exchange.market(payload[-1]).candle_update(payload[0])
+                    else:
+                        continue
+                    message = {"time": int(time.time()), "channel": channel, "event": "update",
+                               "result": result}
+                    try:
+                        await ws.send(json.dumps(message))
+                    except websockets.exceptions.ConnectionClosed:
+                        break
@@ -0,0 +1,368 @@
+"""
+Gate.io v4 REST接口封装
+相同的并发请求合并为一次，行情和K线响应短时缓存；
+按接口限频并根据429和限频响应头自适应降速，连续失败时熔断
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+BASE_URL = "https://api.gateio.ws/api/v4"
+
+# 单次K线请求最多返回的数量
+MAX_CANDLES_PER_REQUEST = 1000
+
+# 连接池大小，需不小于并发请求数
+POOL_SIZE = 8
+
+# 公共行情接口限频：每个接口每10秒200次（留出余量）
+PUBLIC_RATE_LIMIT = (180, 10)
+
+# 各接口响应缓存时间（秒），缓存的JSON由多个调用方共用，不可修改
+CACHE_TTL = {
+    "/spot/tickers": 1.0,
+    "/spot/candlesticks": 1.0
+}
+CACHE_SIZE = 1024
+
+# 重试：429、5xx和网络错误按指数退避重试
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+
+# 熔断：连续失败次数达到阈值后暂停请求
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Gate.io限频响应头
+HEADER_LIMIT = "X-Gate-RateLimit-Limit"
+HEADER_REMAIN = "X-Gate-RateLimit-Requests-Remain"
+HEADER_RESET = "X-Gate-RateLimit-Reset-Timestamp"
+
+
+class GateAPIError(Exception):
+    """Gate.io返回非200状态码"""
+
+    def __init__(self, status_code, text=""):
+        super().__init__(f"HTTP {status_code}: {text[:200]}")
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝请求"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"接口连续失败，{retry_in:.0f}秒后重试")
+        self.retry_in = retry_in
+
+
+class RateLimiter:
+    """
+    令牌桶限频，可在多个线程中共用，acquire在令牌不足时阻塞等待
+    收到429时速率减半，之后每次成功逐步恢复到上限（加性增、乘性减）
+    """
+
+    def __init__(self, rate, period):
+        self.capacity = rate
+        self.max_refill = rate / period
+        self.refill = self.max_refill
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.refill)
+            time.sleep(wait)
+
+    def throttle(self, pause=0.0):
+        """被限频：速率减半，并在pause秒内暂停发放令牌"""
+        with self._lock:
+            self.refill = max(self.max_refill / 16, self.refill / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if pause > 0:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def recover(self):
+        """请求成功：速率逐步恢复"""
+        if self.refill < self.max_refill:
+            with self._lock:
+                self.refill = min(self.max_refill, self.refill + self.max_refill / 20)
+
+    def pause(self, seconds):
+        """额度用尽，暂停到重置时间"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断，冷却后放行一次试探请求，成功则恢复"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        """熔断中抛出 CircuitOpenError，返回True表示本次为冷却后的试探请求"""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.opened_at + self.cooldown - self.clock()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(max(remaining, 0))
+            self._trial = True
+            return True
+
+    def release_trial(self):
+        """试探请求未记录成功或失败就结束（如意外异常）时释放，下一个请求可再次试探"""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """记录一次失败，返回True表示本次失败触发了熔断"""
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = self.clock()
+                self._trial = False
+                return True
+            return False
+
+
+class GateClient:
+    """Gate.io现货行情客户端，所有请求共用一个keep-alive连接池"""
+
+    def __init__(self, base_url=BASE_URL, pool_size=POOL_SIZE, cache_ttl=None, rate_limit=PUBLIC_RATE_LIMIT,
+                 max_retries=MAX_RETRIES, breaker=None, log=None):
+        self.base_url = base_url
+        self.cache_ttl = CACHE_TTL if cache_ttl is None else cache_ttl
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.log = log
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept": "application/json"})
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._limiters = {}
+
+        # 统计
+        self.requests = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    def log_message(self, message):
+        if self.log:
+            self.log(message)
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+    def limiter(self, path):
+        """接口对应的限频器（Gate.io按接口分别限频）"""
+        with self._lock:
+            if path not in self._limiters:
+                self._limiters[path] = RateLimiter(*self.rate_limit)
+            return self._limiters[path]
+
+    def _cached(self, key, ttl):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, _ = entry
+            if time.monotonic() - stored_at > ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            metrics.count("cache_hits", path=key[0])
+            return entry
+
+    def _store(self, key, data):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def get(self, path, params=None, timeout=10, ttl=None):
+        """
+        发送GET请求并返回解析后的JSON
+        ttl秒内的相同请求直接返回缓存（默认按接口取 CACHE_TTL，0为不缓存），
+        正在进行中的相同请求只等待其结果，不重复发送
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        ttl = self.cache_ttl.get(path, 0) if ttl is None else ttl
+        if ttl > 0:
+            entry = self._cached(key, ttl)
+            if entry is not None:
+                return entry[1]
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+                metrics.count("coalesced", path=path)
+
+        if not leader:
+            return call.result()
+
+        try:
+            data = self._request(path, params, timeout)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            if ttl > 0:
+                self._store(key, data)
+            call.set_result(data)
+            return data
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _request(self, path, params, timeout):
+        """限频、重试、熔断"""
+        url = f"{self.base_url}{path}"
+        limiter = self.limiter(path)
+
+        for attempt in range(self.max_retries + 1):
+            trial = self.breaker.before_request()
+            try:
+                limiter.acquire()
+                self.requests += 1
+                metrics.count("requests", path=path)
+
+                retry_after = 0.0
+                try:
+                    with metrics.span("http", path=path):
+                        response = self.session.get(url, params=params, timeout=timeout)
+                except requests.RequestException as e:
+                    metrics.count("http_errors", path=path, status="network")
+                    error = e
+                else:
+                    self._observe_rate_limit(limiter, response)
+                    if response.status_code == 200:
+                        self.breaker.record_success()
+                        limiter.recover()
+                        with metrics.span("json", path=path):
+                            return response.json()
+
+                    metrics.count("http_errors", path=path, status=str(response.status_code))
+                    error = GateAPIError(response.status_code, response.text)
+                    if response.status_code == 429:
+                        retry_after = _retry_after(response)
+                        limiter.throttle(retry_after)
+                    elif response.status_code < 500:
+                        # 参数等客户端错误，重试无意义；接口可达，视为成功，不计入熔断
+                        self.breaker.record_success()
+                        raise error
+
+                tripped = self.breaker.record_failure()
+            finally:
+                # 试探请求以意外异常结束时释放，否则熔断永远不会恢复
+                if trial:
+                    self.breaker.release_trial()
+            if tripped:
+                self.log_message(f"⛔ 接口连续失败，暂停请求{self.breaker.cooldown:.0f}秒")
+            if tripped or attempt == self.max_retries:
+                raise error
+
+            self.retries += 1
+            metrics.count("retries", path=path)
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+            time.sleep(max(retry_after, delay * random.uniform(0.5, 1.0)))
+
+    def _observe_rate_limit(self, limiter, response):
+        """按限频响应头调整：剩余额度用尽时暂停到重置时间"""
+        remain = response.headers.get(HEADER_REMAIN)
+        reset = response.headers.get(HEADER_RESET)
+        if remain is None or reset is None:
+            return
+        try:
+            remain = int(remain)
+            reset = float(reset)
+        except ValueError:
+            return
+        if remain <= 0:
+            # 重置时间为毫秒时间戳
+            limiter.pause(max(0.0, reset / 1000 - time.time()))
+
+    def tickers(self, currency_pair=None, timeout=5):
+        """获取行情，不指定交易对时返回全部"""
+        params = {"currency_pair": currency_pair} if currency_pair else None
+        return self.get("/spot/tickers", params=params, timeout=timeout)
+
+    def order_book(self, currency_pair, limit=100, timeout=5):
+        """获取订单簿快照，包含用于衔接增量推送的更新编号（id）"""
+        params = {"currency_pair": currency_pair, "limit": limit, "with_id": "true"}
+        return self.get("/spot/order_book", params=params, timeout=timeout)
+
+    def candlesticks(self, currency_pair, interval, limit=100, from_ts=None, to_ts=None, timeout=10):
+        """
+        获取K线数据
+        指定from_ts时返回该时间戳（含）之后的K线，to_ts为结束时间戳（含，默认为当前），
+        Gate.io不允许limit与from/to同时使用，单次最多返回 MAX_CANDLES_PER_REQUEST 根
+        """
+        params = {
+            "currency_pair": currency_pair,
+            "interval": interval
+        }
+        if from_ts is not None:
+            params["from"] = int(from_ts)
+            if to_ts is not None:
+                params["to"] = int(to_ts)
+        else:
+            params["limit"] = limit
+        return self.get("/spot/candlesticks", params=params, timeout=timeout)
+
+
+def _retry_after(response):
+    """429响应的等待秒数"""
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
@@ -0,0 +1,645 @@
+"""
+增量指标计算
+每个指标保存"已收盘K线"的状态和最后一根（可能仍在变动的）K线，
+新增或修改最后一根K线只需常数次浮点运算
+
+时间框架的全部指标组成一张依赖图：相同的中间量（EMA、涨跌差值、Wilder平滑、滚动求和）只建一个节点，
+节点按序列版本惰性求值并缓存，未收盘K线变动时只有被读取的节点重新计算
+"""
+
+import math
+
+EMA_FAST = 7
+EMA_SLOW = 25
+RSI_PERIOD = 14
+
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2
+ATR_PERIOD = 14
+# 滚动VWAP的K线数量
+VWAP_PERIOD = 20
+
+
+class IncrementalIndicator:
+    """增量指标基类，子类实现 _initial / _step / _output"""
+
+    __slots__ = ('_committed', '_last', '_state')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """清空状态"""
+        self._committed = self._initial()
+        self._last = None
+        self._state = self._committed
+
+    def append(self, price):
+        """追加一根新K线"""
+        if self._last is not None:
+            self._committed = self._state
+        self._last = price
+        self._state = self._step(self._committed, price)
+
+    def update_last(self, price):
+        """更新最后一根K线（未收盘K线价格变动）"""
+        if self._last is None:
+            self.append(price)
+            return
+        self._last = price
+        self._state = self._step(self._committed, price)
+
+    def seed(self, prices):
+        """用历史价格初始化"""
+        self.reset()
+        for price in prices:
+            self.append(price)
+
+    @property
+    def value(self):
+        return self._output(self._state)
+
+    def _initial(self):
+        raise NotImplementedError
+
+    def _step(self, state, price):
+        raise NotImplementedError
+
+    def _output(self, state):
+        raise NotImplementedError
+
+
+class EMA(IncrementalIndicator):
+    """指数移动平均线，前period根用SMA作为种子"""
+
+    __slots__ = ('period', 'multiplier')
+
+    def __init__(self, period):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        super().__init__()
+
+    def _initial(self):
+        # (数量, 种子累计, EMA值, 最新价)
+        return (0, 0.0, None, None)
+
+    def _step(self, state, price):
+        count, seed_sum, ema, _ = state
+        count += 1
+        if ema is not None:
+            ema = (price - ema) * self.multiplier + ema
+        elif count == self.period:
+            ema = (seed_sum + price) / self.period
+        else:
+            seed_sum += price
+        return (count, seed_sum, ema, price)
+
+    def _output(self, state):
+        ema, price = state[2], state[3]
+        if ema is not None:
+            return ema
+        return price if price is not None else 0
+
+
+class RSI(IncrementalIndicator):
+    """RSI指标，使用Wilder平滑"""
+
+    __slots__ = ('period',)
+
+    def __init__(self, period=RSI_PERIOD):
+        self.period = period
+        super().__init__()
+
+    def _initial(self):
+        # (差值数量, 上一价格, 平均涨幅, 平均跌幅)
+        return (0, None, 0.0, 0.0)
+
+    def _step(self, state, price):
+        count, prev, avg_gain, avg_loss = state
+        if prev is None:
+            return (0, price, 0.0, 0.0)
+
+        delta = price - prev
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        count += 1
+
+        if count <= self.period:
+            # 前period个差值先累加，满period时取简单平均作为种子
+            avg_gain += gain
+            avg_loss += loss
+            if count == self.period:
+                avg_gain /= self.period
+                avg_loss /= self.period
+        else:
+            avg_gain = (avg_gain * (self.period - 1) + gain) / self.period
+            avg_loss = (avg_loss * (self.period - 1) + loss) / self.period
+
+        return (count, price, avg_gain, avg_loss)
+
+    def _output(self, state):
+        count, _, avg_gain, avg_loss = state
+        if count < self.period:
+            return 50
+        if avg_loss == 0:
+            return 100
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+class Node:
+    """
+    依赖图节点，状态分为已收盘部分 _committed 和包含最后一根K线的 _state
+    _state 在序列版本变化后首次读取时由 _step 重新计算，追加新K线前由 commit 固化；
+    _seed 一次处理整段历史，返回每根K线的输出序列，供依赖它的节点批量初始化
+    """
+
+    __slots__ = ('graph', '_committed', '_state', '_version')
+
+    # 无已收盘状态的节点（只由当前K线决定），追加K线时不需要固化
+    stateless = False
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._committed = self._initial()
+        self._state = None
+        self._version = -1
+
+    def state(self):
+        if self._version != self.graph.version:
+            self._state = self._step(self._committed)
+            self._version = self.graph.version
+        return self._state
+
+    def commit(self):
+        """把最后一根K线并入已收盘状态"""
+        self._committed = self.state()
+
+    def _initial(self):
+        return None
+
+    def _step(self, committed):
+        raise NotImplementedError
+
+    def _seed(self, series):
+        raise NotImplementedError
+
+
+class Field(Node):
+    """最后一根K线的字段（开高低收量）"""
+
+    __slots__ = ('index',)
+
+    stateless = True
+
+    def __init__(self, graph, index):
+        self.index = index
+        super().__init__(graph)
+
+    @property
+    def value(self):
+        return self.graph.bar[self.index]
+
+    def _seed(self, series):
+        return self.graph.columns[self.index]
+
+
+class Prev(Node):
+    """输入在上一根K线的值"""
+
+    __slots__ = ('source',)
+
+    def __init__(self, graph, source):
+        self.source = source
+        super().__init__(graph)
+
+    @property
+    def value(self):
+        return self._committed
+
+    def commit(self):
+        self._committed = self.source.value
+
+    def _seed(self, series):
+        values = series[self.source]
+        self._committed = values[-2] if len(values) > 1 else None
+        return [None] + values[:-1]
+
+
+class Combine(Node):
+    """输入的逐K线组合 func(*values)，任一输入为None时为None；结果按版本缓存，供多个使用者共享"""
+
+    __slots__ = ('func', 'sources')
+
+    stateless = True
+
+    def __init__(self, graph, func, *sources):
+        self.func = func
+        self.sources = sources
+        super().__init__(graph)
+
+    @property
+    def value(self):
+        if self._version != self.graph.version:
+            values = [source.value for source in self.sources]
+            self._state = None if None in values else self.func(*values)
+            self._version = self.graph.version
+        return self._state
+
+    def _seed(self, series):
+        func = self.func
+        return [None if None in values else func(*values)
+                for values in zip(*(series[source] for source in self.sources))]
+
+
+class Recursive(Node):
+    """逐K线递推的单输入节点，子类实现 _advance(状态, 输入值) 和 _output(状态)"""
+
+    __slots__ = ('source', 'period')
+
+    def __init__(self, graph, source, period):
+        self.source = source
+        self.period = period
+        super().__init__(graph)
+
+    def _step(self, committed):
+        value = self.source.value
+        if value is None:
+            return committed
+        return self._advance(committed, value)
+
+    @property
+    def value(self):
+        return self._output(self.state())
+
+    def _seed(self, series):
+        advance, output = self._advance, self._output
+        state = committed = self._initial()
+        values = []
+        for value in series[self.source]:
+            committed = state
+            if value is not None:
+                state = advance(state, value)
+            values.append(output(state))
+        self._committed = committed
+        return values
+
+
+class EMANode(Recursive):
+    """输入的EMA，前period个有效值用SMA作为种子，未满period时为None"""
+
+    __slots__ = ('multiplier',)
+
+    def __init__(self, graph, source, period):
+        self.multiplier = 2 / (period + 1)
+        super().__init__(graph, source, period)
+
+    def _initial(self):
+        # (数量, 种子累计, EMA值)
+        return (0, 0.0, None)
+
+    def _advance(self, state, value):
+        count, seed_sum, ema = state
+        if ema is not None:
+            return (count + 1, seed_sum, (value - ema) * self.multiplier + ema)
+        count += 1
+        if count == self.period:
+            return (count, seed_sum, (seed_sum + value) / self.period)
+        return (count, seed_sum + value, None)
+
+    def _output(self, state):
+        return state[2]
+
+
+class WilderNode(Recursive):
+    """输入的Wilder平滑，前period个有效值取简单平均作为种子，未满period时为None"""
+
+    __slots__ = ()
+
+    def _initial(self):
+        # (数量, 平均值)
+        return (0, 0.0)
+
+    def _advance(self, state, value):
+        count, average = state
+        count += 1
+        if count <= self.period:
+            average += value
+            if count == self.period:
+                average /= self.period
+        else:
+            average = (average * (self.period - 1) + value) / self.period
+        return (count, average)
+
+    def _output(self, state):
+        count, average = state
+        return average if count >= self.period else None
+
+
+class RollingSum(Node):
+    """输入最近period个值的和，不足period个时为None"""
+
+    __slots__ = ('source', 'period')
+
+    def __init__(self, graph, source, period):
+        self.source = source
+        self.period = period
+        super().__init__(graph)
+
+    def _initial(self):
+        # (最近period-1个已收盘值, 其和)
+        return ((), 0.0)
+
+    def _step(self, committed):
+        return self.source.value
+
+    def commit(self):
+        value = self.state()
+        window = self._committed[0]
+        if value is not None:
+            window = (window + (value,))[-(self.period - 1):] if self.period > 1 else ()
+        # 每根收盘K线重新求和，避免浮点误差累积
+        self._committed = (window, math.fsum(window))
+
+    @property
+    def value(self):
+        value = self.state()
+        window, total = self._committed
+        if value is None or len(window) < self.period - 1:
+            return None
+        return total + value
+
+    def _seed(self, series):
+        values = series[self.source]
+        window = tuple(value for value in values[:-1] if value is not None)
+        window = window[-(self.period - 1):] if self.period > 1 else ()
+        self._committed = (window, math.fsum(window))
+
+        # 中间各K线的滚动和（累计和之差，仅供依赖节点使用）
+        sums = []
+        valid = []
+        running = 0.0
+        for value in values:
+            if value is None:
+                sums.append(None)
+                continue
+            valid.append(value)
+            running += value
+            if len(valid) > self.period:
+                running -= valid[-self.period - 1]
+            sums.append(running if len(valid) >= self.period else None)
+        return sums
+
+
+def _rsi(avg_gain, avg_loss):
+    if avg_gain is None:
+        return 50
+    if avg_loss == 0:
+        return 100
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class RSINode(Node):
+    """RSI = 100 - 100 / (1 + 平均涨幅 / 平均跌幅)"""
+
+    __slots__ = ('gain', 'loss')
+
+    stateless = True
+
+    def __init__(self, graph, gain, loss):
+        self.gain = gain
+        self.loss = loss
+        super().__init__(graph)
+
+    @property
+    def value(self):
+        avg_gain = self.gain.value
+        return 50 if avg_gain is None else _rsi(avg_gain, self.loss.value)
+
+    def _seed(self, series):
+        return [_rsi(g, l) for g, l in zip(series[self.gain], series[self.loss])]
+
+
+def _sub(a, b):
+    return a - b
+
+
+def _gain(delta):
+    return delta if delta > 0 else 0.0
+
+
+def _loss(delta):
+    return -delta if delta < 0 else 0.0
+
+
+def _square(x):
+    return x * x
+
+
+def _true_range(high, low, prev_close):
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+def _typical_volume(high, low, close, volume):
+    return (high + low + close) / 3 * volume
+
+
+class IndicatorGraph:
+    """
+    单个序列的指标依赖图
+    node() 按 (类型, 参数) 去重，依赖先于使用者创建；
+    commit按创建顺序的逆序进行，使用者固化时读到的依赖仍是最后一根K线的状态
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.order = []
+        # 需要固化的节点，按创建顺序的逆序排列
+        self.stateful = []
+        self.version = 0
+        self.count = 0
+        # 最后一根K线 (开, 高, 低, 收, 量)
+        self.bar = None
+        # 批量初始化时的各列数据
+        self.columns = None
+
+    def node(self, cls, *args):
+        key = (cls,) + args
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = cls(self, *args)
+            self.order.append(node)
+            if not node.stateless:
+                self.stateful.insert(0, node)
+        return node
+
+    def field(self, index):
+        return self.node(Field, index)
+
+    def reset(self):
+        for node in self.order:
+            node._committed = node._initial()
+        self.version += 1
+        self.count = 0
+        self.bar = None
+
+    def append(self, open_, high, low, close, volume):
+        """追加一根新K线，上一根固化为已收盘"""
+        if self.count:
+            for node in self.stateful:
+                node.commit()
+        self.bar = (open_, high, low, close, volume)
+        self.count += 1
+        self.version += 1
+
+    def update_last(self, open_, high, low, close, volume):
+        """覆盖最后一根K线，只使缓存失效，读取时再计算"""
+        self.bar = (open_, high, low, close, volume)
+        self.version += 1
+
+    def seed(self, opens, highs, lows, closes, volumes):
+        """
+        用整段历史初始化，结果与逐根 append 相同
+        各节点按创建顺序对整列数据递推一次，而不是每根K线遍历全部节点
+        """
+        self.reset()
+        if not len(closes):
+            return
+        self.columns = (list(opens), list(highs), list(lows), list(closes), list(volumes))
+        series = {}
+        try:
+            for node in self.order:
+                series[node] = node._seed(series)
+        finally:
+            self.columns = None
+        self.bar = tuple(column[-1] for column in (opens, highs, lows, closes, volumes))
+        self.count = len(closes)
+        self.version += 1
+
+
+class TimeframeIndicators:
+    """
+    单个时间框架的指标：快慢EMA与RSI（评分使用，默认EMA7/EMA25/RSI14），
+    以及MACD、布林带、ATR和滚动VWAP
+    """
+
+    def __init__(self, fast=EMA_FAST, slow=EMA_SLOW, rsi_period=RSI_PERIOD):
+        graph = self.graph = IndicatorGraph()
+        high, low, close, volume = (graph.field(index) for index in (1, 2, 3, 4))
+        prev_close = graph.node(Prev, close)
+        delta = graph.node(Combine, _sub, close, prev_close)
+
+        self.ema_fast = graph.node(EMANode, close, fast)
+        self.ema_slow = graph.node(EMANode, close, slow)
+        self.rsi = graph.node(RSINode,
+                              graph.node(WilderNode, graph.node(Combine, _gain, delta), rsi_period),
+                              graph.node(WilderNode, graph.node(Combine, _loss, delta), rsi_period))
+
+        self.macd = graph.node(Combine, _sub, graph.node(EMANode, close, MACD_FAST),
+                               graph.node(EMANode, close, MACD_SLOW))
+        self.macd_signal = graph.node(EMANode, self.macd, MACD_SIGNAL)
+
+        self.bb_sum = graph.node(RollingSum, close, BOLLINGER_PERIOD)
+        self.bb_sum_sq = graph.node(RollingSum, graph.node(Combine, _square, close), BOLLINGER_PERIOD)
+
+        # 第一根K线没有前收盘价，不计入真实波幅
+        true_range = graph.node(Combine, _true_range, high, low, prev_close)
+        self.atr = graph.node(WilderNode, true_range, ATR_PERIOD)
+
+        self.vwap_pv = graph.node(RollingSum, graph.node(Combine, _typical_volume, high, low, close, volume),
+                                  VWAP_PERIOD)
+        self.vwap_volume = graph.node(RollingSum, volume, VWAP_PERIOD)
+
+        self._values = None
+        self._values_version = -1
+
+    @property
+    def count(self):
+        return self.graph.count
+
+    @property
+    def price(self):
+        return self.graph.bar[3] if self.graph.bar else None
+
+    def reset(self):
+        """清空状态"""
+        self.graph.reset()
+
+    def seed(self, prices, highs=None, lows=None, volumes=None):
+        """用历史收盘价（及高低点、成交量）初始化"""
+        highs = prices if highs is None else highs
+        lows = prices if lows is None else lows
+        volumes = [0.0] * len(prices) if volumes is None else volumes
+        self.graph.seed(prices, highs, lows, prices, volumes)
+
+    def append(self, price, high=None, low=None, volume=0.0):
+        """追加一根新K线，未给出高低点时取收盘价"""
+        self.graph.append(price, price if high is None else high, price if low is None else low, price, volume)
+
+    def update_last(self, price, high=None, low=None, volume=None):
+        """更新最后一根K线，高低点随价格扩展，未给出成交量时不变"""
+        bar = self.graph.bar
+        if bar is None:
+            self.append(price, high, low, volume or 0.0)
+            return
+        open_, last_high, last_low, _, last_volume = bar
+        high = max(last_high, price) if high is None else high
+        low = min(last_low, price) if low is None else low
+        self.graph.update_last(open_, high, low, price, last_volume if volume is None else volume)
+
+    def values(self):
+        """
+        评分使用的指标值，只计算快慢EMA与RSI所依赖的节点
+        同一序列版本内重复读取返回同一个字典（调用方不应修改）
+        """
+        if self._values_version == self.graph.version:
+            return self._values
+        if not self.count:
+            values = {"price": 0, "ema_fast": 0, "ema_slow": 0, "rsi": 50, "count": 0}
+        else:
+            price = self.price
+            ema_fast = self.ema_fast.value
+            ema_slow = self.ema_slow.value
+            values = {
+                "price": price,
+                # 种子期内EMA取最新价
+                "ema_fast": price if ema_fast is None else ema_fast,
+                "ema_slow": price if ema_slow is None else ema_slow,
+                "rsi": self.rsi.value,
+                "count": self.count
+            }
+        self._values, self._values_version = values, self.graph.version
+        return values
+
+    def extended_values(self):
+        """MACD、布林带、ATR、VWAP（按需计算），数据不足时为None"""
+        if not self.count:
+            return dict.fromkeys(("macd", "macd_signal", "macd_hist", "bb_mid", "bb_upper", "bb_lower",
+                                  "atr", "vwap"))
+        macd = self.macd.value
+        signal = self.macd_signal.value
+        values = {
+            "macd": macd,
+            "macd_signal": signal,
+            "macd_hist": macd - signal if macd is not None and signal is not None else None,
+            "bb_mid": None,
+            "bb_upper": None,
+            "bb_lower": None,
+            "atr": self.atr.value,
+            "vwap": None
+        }
+
+        total = self.bb_sum.value
+        if total is not None:
+            mean = total / BOLLINGER_PERIOD
+            variance = max(0.0, self.bb_sum_sq.value / BOLLINGER_PERIOD - mean * mean)
+            width = BOLLINGER_WIDTH * math.sqrt(variance)
+            values.update(bb_mid=mean, bb_upper=mean + width, bb_lower=mean - width)
+
+        volume = self.vwap_volume.value
+        if volume:
+            values["vwap"] = self.vwap_pv.value / volume
+        return values
@@ -0,0 +1,106 @@
+"""
+日志缓冲
+界面只显示最近的若干行（环形缓冲），新日志先标记为待刷新，由界面每帧最多取一次；
+完整历史写入按大小滚动的日志文件，可随时导出
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+# 界面显示的最大行数
+LOG_VISIBLE_LINES = 300
+
+# 单个日志文件大小及保留的旧文件数
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+class LogSink:
+    """线程安全的日志缓冲，write可在任意线程调用，take在界面线程调用"""
+
+    def __init__(self, path=None, capacity=LOG_VISIBLE_LINES, max_bytes=LOG_MAX_BYTES,
+                 backup_count=LOG_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lines = deque(maxlen=capacity)
+        self.total = 0
+
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def write(self, message):
+        """
+        记录一行日志
+        返回True表示此前没有待刷新的内容，调用方需安排一次界面刷新
+        """
+        entry = f"[{datetime.now().strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            self.lines.append(entry)
+            self.total += 1
+            if self._file is not None:
+                self._file.write(f"{datetime.now().strftime('%Y-%m-%d')} {entry}\n")
+                self._file.flush()
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+
+            schedule = not self._dirty
+            self._dirty = True
+        return schedule
+
+    def take(self):
+        """取出待显示的文本（最近capacity行），没有新日志时返回None"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return "\n".join(self.lines) + "\n"
+
+    def clear(self):
+        """清空界面显示的行（日志文件保留）"""
+        with self._lock:
+            self.lines.clear()
+            self._dirty = True
+
+    def _rotate(self):
+        """log -> log.1 -> log.2 ...，超出保留数量的最旧文件删除"""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def files(self):
+        """现有日志文件，从旧到新"""
+        if not self.path:
+            return []
+        candidates = [f"{self.path}.{index}" for index in range(self.backup_count, 0, -1)] + [self.path]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def export(self, destination):
+        """把全部日志文件按时间顺序合并写入destination，返回写入的字节数"""
+        written = 0
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            with open(destination, "wb") as out:
+                for path in self.files():
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    out.write(data)
+                    written += len(data)
+        return written
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
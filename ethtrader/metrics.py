@@ -0,0 +1,204 @@
+"""
+性能统计
+各阶段（请求、解码、指标、分析、界面）的耗时直方图和计数，可导出为JSON或Prometheus文本；
+默认关闭，关闭时 span() 直接返回空上下文，开销可忽略
+设置环境变量 ETHTRADER_METRICS=1 可在启动时开启
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# 直方图桶上限（秒）
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """固定桶耗时直方图"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶估算分位数（取所在桶的上限，不超过最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+
+class _NoopSpan:
+    """关闭统计时使用的空上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "key", "started")
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.key, time.perf_counter() - self.started, exc_type is not None)
+        return False
+
+
+def _key(name, labels):
+    """标签值统一为字符串：同一标签混用数字和字符串（如 status=503 / "network"）时键仍可排序"""
+    return (name, tuple(sorted((label, str(value)) for label, value in labels.items()))) if labels else (name, ())
+
+
+def _format_labels(labels, **extra):
+    items = list(extra.items()) + list(labels)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _display_name(key):
+    name, labels = key
+    return name + "".join(f"[{value}]" for _, value in labels)
+
+
+class Metrics:
+    """耗时与计数的注册表，可在多个线程中共用"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._spans = {}
+            self._counters = {}
+            self.started = time.time()
+
+    def span(self, name, **labels):
+        """计时上下文：with metrics.span("http", path=...): ...，异常时同时计入错误数"""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, _key(name, labels))
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时"""
+        if self.enabled:
+            self._observe(_key(name, labels), seconds, False)
+
+    def count(self, name, value=1, **labels):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, key, seconds, failed):
+        with self._lock:
+            histogram = self._spans.get(key)
+            if histogram is None:
+                histogram = self._spans[key] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                error_key = ("errors", (("span", key[0]),) + key[1])
+                self._counters[error_key] = self._counters.get(error_key, 0) + 1
+
+    def snapshot(self):
+        """当前统计的字典形式"""
+        with self._lock:
+            spans = {_display_name(key): {
+                "count": h.count,
+                "total_ms": h.total * 1000,
+                "avg_ms": h.total / h.count * 1000 if h.count else 0.0,
+                "p50_ms": h.quantile(0.5) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+                "max_ms": h.max * 1000,
+            } for key, h in self._spans.items()}
+            counters = {_display_name(key): value for key, value in self._counters.items()}
+        return {
+            "enabled": self.enabled,
+            "uptime": time.time() - self.started,
+            "spans": spans,
+            "counters": counters
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus文本格式"""
+        lines = ["# TYPE ethtrader_span_seconds histogram"]
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+
+        for (name, labels), h in spans:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulative += count
+                lines.append(f"ethtrader_span_seconds_bucket{_format_labels(labels, span=name, le=bound)} {cumulative}")
+            lines.append(f"ethtrader_span_seconds_bucket{_format_labels(labels, span=name, le='+Inf')} {h.count}")
+            lines.append(f"ethtrader_span_seconds_sum{_format_labels(labels, span=name)} {h.total:.6f}")
+            lines.append(f"ethtrader_span_seconds_count{_format_labels(labels, span=name)} {h.count}")
+
+        lines.append("# TYPE ethtrader_events_total counter")
+        for (name, labels), value in counters:
+            lines.append(f"ethtrader_events_total{_format_labels(labels, event=name)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top=20):
+        """调试面板文本：按总耗时排序"""
+        snapshot = self.snapshot()
+        if not snapshot["spans"] and not snapshot["counters"]:
+            return "暂无数据（请先开启性能统计）"
+
+        lines = ["阶段  次数  平均  P95  最大 (ms)"]
+        spans = sorted(snapshot["spans"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        for name, s in spans[:top]:
+            lines.append(f"{name}  {s['count']}  {s['avg_ms']:.1f}  {s['p95_ms']:.1f}  {s['max_ms']:.1f}")
+        if snapshot["counters"]:
+            lines.append("")
+            lines.extend(f"{name}: {value}" for name, value in sorted(snapshot["counters"].items()))
+        return "\n".join(lines)
+
+
+metrics = Metrics(enabled=os.environ.get("ETHTRADER_METRICS") == "1")
@@ -0,0 +1,479 @@
+"""
+L2订单簿
+REST快照（/spot/order_book，带更新编号）之后逐条应用WebSocket增量（spot.order_book_update）：
+每边按价格排序保存在数组中，一条增量只修改涉及的档位；前 DEPTH_LEVELS 档的挂单量之和随档位变化
+增量维护，买卖失衡为O(1)；按计划仓位估算的吃单滑点缓存到下次前几档发生变化
+增量编号不连续时订单簿作废，缓存其后的增量，重新获取快照后衔接
+
+用法:
+    python -m ethtrader.orderbook --record book.jsonl --seconds 60     # 录制快照和增量推送
+    python -m ethtrader.orderbook --replay book.jsonl --size 10         # 重放并输出盘口统计
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+# 快照档数
+SNAPSHOT_LIMIT = 100
+# 买卖失衡统计的档数
+DEPTH_LEVELS = 20
+# 计划价位附近统计挂单量的范围（价格的比例）
+LEVEL_BAND = 0.001
+# 两次获取快照的最短间隔（秒），REST快照落后于推送时等待其追上
+RESYNC_INTERVAL = 1.0
+# 等待快照期间最多缓存的增量条数
+PENDING_LIMIT = 2000
+
+# 估算成交之后没有档位变化
+NO_CHANGE = sys.maxsize
+
+
+class OrderBookGap(Exception):
+    """增量编号不连续，需要重新获取快照"""
+
+
+class BookSide:
+    """
+    单边订单簿
+    keys升序排列（卖盘为价格，买盘为负价格），下标0为最优价
+    """
+
+    def __init__(self, is_bid, depth=DEPTH_LEVELS):
+        self.sign = -1.0 if is_bid else 1.0
+        self.depth = depth
+        self.keys = array("d")
+        self.amounts = array("d")
+        # 前depth档挂单量之和
+        self.top_amount = 0.0
+        # 自上次估算成交以来变化的最浅档位，及该次估算的结果
+        self.changed = 0
+        self._fill = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def price(self, index):
+        return self.keys[index] * self.sign
+
+    def load(self, levels):
+        """用快照的 [[价格, 数量], ...] 重建"""
+        rows = sorted((self.sign * float(price), float(amount)) for price, amount in levels if float(amount) > 0)
+        self.keys = array("d", [key for key, _ in rows])
+        self.amounts = array("d", [amount for _, amount in rows])
+        self.top_amount = math.fsum(self.amounts[:self.depth])
+        self.changed = 0
+        self._fill = None
+
+    def clear(self):
+        self.load([])
+
+    def set(self, price, amount):
+        """设置一个价位的挂单量（0为删除），返回变化的档位下标，删除不存在的价位时返回None"""
+        key = self.sign * price
+        keys, amounts, depth = self.keys, self.amounts, self.depth
+        index = bisect_left(keys, key)
+        exists = index < len(keys) and keys[index] == key
+
+        if amount > 0:
+            if exists:
+                if index < depth:
+                    self.top_amount += amount - amounts[index]
+                amounts[index] = amount
+            else:
+                keys.insert(index, key)
+                amounts.insert(index, amount)
+                if index < depth:
+                    # 原第depth档被挤出统计范围
+                    self.top_amount += amount
+                    if len(keys) > depth:
+                        self.top_amount -= amounts[depth]
+        elif exists:
+            if index < depth:
+                # 第depth+1档进入统计范围
+                self.top_amount -= amounts[index]
+                if len(keys) > depth:
+                    self.top_amount += amounts[depth]
+            del keys[index]
+            del amounts[index]
+        else:
+            return None
+
+        if index < self.changed:
+            self.changed = index
+        return index
+
+    def fill(self, quantity):
+        """
+        从最优价依次吃单quantity，返回 (均价, 成交量, 吃到的档数)，无挂单时均价为None
+        只有此前吃到的档位发生变化时才重新计算
+        """
+        cached = self._fill
+        if cached is not None and cached[0] == quantity and self.changed >= cached[1]:
+            return cached[2]
+
+        remaining = quantity
+        cost = 0.0
+        levels = 0
+        amounts, sign = self.amounts, self.sign
+        for index in range(len(amounts)):
+            take = min(remaining, amounts[index])
+            cost += take * self.keys[index] * sign
+            remaining -= take
+            levels = index + 1
+            if remaining <= 0:
+                break
+        filled = quantity - max(remaining, 0.0)
+        result = (cost / filled if filled > 0 else None, filled, levels)
+        # 全部成交时只有前levels档的变化影响结果，挂单不足时任何变化都会影响
+        self._fill = (quantity, levels if remaining <= 0 else NO_CHANGE, result)
+        self.changed = NO_CHANGE
+        return result
+
+    def amount_between(self, low, high):
+        """价格在 [low, high] 内的挂单量，超出已知档位范围时返回None"""
+        if not len(self.keys):
+            return None
+        low_key, high_key = sorted((self.sign * low, self.sign * high))
+        if low_key > self.keys[-1]:
+            return None
+        start = bisect_left(self.keys, low_key)
+        end = bisect_right(self.keys, high_key)
+        return math.fsum(self.amounts[start:end])
+
+
+class OrderBook:
+    """快照 + 增量维护的L2订单簿（非线程安全，由 OrderBookSync 加锁）"""
+
+    def __init__(self, currency_pair=None, depth=DEPTH_LEVELS):
+        self.currency_pair = currency_pair
+        self.bids = BookSide(True, depth)
+        self.asks = BookSide(False, depth)
+        # 最后应用的更新编号，None表示未同步
+        self.last_id = None
+        self.updated_at = None
+        self.updates = 0
+        self.levels_touched = 0
+
+    @property
+    def synced(self):
+        return self.last_id is not None
+
+    def load_snapshot(self, snapshot):
+        """加载 /spot/order_book?with_id=true 的结果"""
+        self.bids.load(snapshot["bids"])
+        self.asks.load(snapshot["asks"])
+        self.last_id = int(snapshot["id"])
+        self.updated_at = snapshot.get("update") or snapshot.get("current")
+
+    def invalidate(self):
+        self.last_id = None
+        self.bids.clear()
+        self.asks.clear()
+
+    def apply(self, update):
+        """
+        应用一条 spot.order_book_update 增量（b/a 为绝对数量，0为删除）
+        返回False表示已包含在快照中而丢弃；编号不连续时订单簿作废并抛出 OrderBookGap
+        """
+        if self.last_id is None:
+            raise OrderBookGap("订单簿未同步")
+        first, last = int(update["U"]), int(update["u"])
+        if last <= self.last_id:
+            return False
+        if first > self.last_id + 1:
+            expected = self.last_id + 1
+            self.invalidate()
+            raise OrderBookGap(f"增量编号不连续: 期望{expected}，收到{first}")
+
+        for price, amount in update.get("b", ()):
+            self.bids.set(float(price), float(amount))
+        for price, amount in update.get("a", ()):
+            self.asks.set(float(price), float(amount))
+        self.levels_touched += len(update.get("b", ())) + len(update.get("a", ()))
+        self.updates += 1
+        self.last_id = last
+        self.updated_at = update.get("t", self.updated_at)
+        return True
+
+    @property
+    def best_bid(self):
+        return self.bids.price(0) if len(self.bids) else None
+
+    @property
+    def best_ask(self):
+        return self.asks.price(0) if len(self.asks) else None
+
+    @property
+    def mid(self):
+        if not len(self.bids) or not len(self.asks):
+            return None
+        return (self.bids.price(0) + self.asks.price(0)) / 2
+
+    def imbalance(self):
+        """前 DEPTH_LEVELS 档买卖挂单量失衡，-1（全为卖盘）到 1（全为买盘）"""
+        bid, ask = max(self.bids.top_amount, 0.0), max(self.asks.top_amount, 0.0)
+        total = bid + ask
+        return (bid - ask) / total if total > 0 else 0.0
+
+    def estimate_fill(self, is_buy, quantity):
+        """
+        市价买入（吃卖盘）或卖出（吃买盘）quantity的估算
+        返回 {均价, 相对最优价的滑点%, 成交量, 档数}，挂单不足时成交量小于quantity
+        """
+        side = self.asks if is_buy else self.bids
+        if not len(side) or quantity <= 0:
+            return None
+        average, filled, levels = side.fill(quantity)
+        best = side.price(0)
+        return {
+            "price": average,
+            "slippage": abs(average - best) / best * 100,
+            "filled": filled,
+            "levels": levels
+        }
+
+    def depth_near(self, price, band=LEVEL_BAND):
+        """price上下band范围内的买卖挂单量之和，超出订单簿已知范围时返回None"""
+        low, high = price * (1 - band), price * (1 + band)
+        bid = self.bids.amount_between(low, high)
+        ask = self.asks.amount_between(low, high)
+        if bid is None or ask is None:
+            return None
+        return bid + ask
+
+    def summary(self):
+        """盘口概况"""
+        best_bid, best_ask = self.best_bid, self.best_ask
+        return {
+            "bid": best_bid,
+            "ask": best_ask,
+            "spread": (best_ask - best_bid) / best_bid * 100 if best_bid and best_ask else None,
+            "imbalance": self.imbalance(),
+            "bid_depth": self.bids.top_amount,
+            "ask_depth": self.asks.top_amount,
+            "levels": (len(self.bids), len(self.asks))
+        }
+
+
+class OrderBookSync:
+    """
+    订单簿同步：推送增量先进入缓存队列，订单簿已同步时依次应用，编号不连续或尚未同步时获取快照后衔接
+    on_update在推送线程的事件循环中调用，不会阻塞：快照在后台线程获取（同一时刻最多一个），期间增量继续缓存；
+    读取方法可在任意线程调用
+    record回调收到 ("snapshot" | "update", 数据)，用于录制
+    """
+
+    def __init__(self, client, currency_pair, limit=SNAPSHOT_LIMIT, depth=DEPTH_LEVELS, log=None,
+                 record=None, resync_interval=RESYNC_INTERVAL):
+        self.client = client
+        self.currency_pair = currency_pair
+        self.limit = limit
+        self.log = log or print
+        self.record = record
+        self.resync_interval = resync_interval
+
+        self.book = OrderBook(currency_pair, depth)
+        self.resyncs = 0
+        self.gaps = 0
+        self._pending = deque(maxlen=PENDING_LIMIT)
+        self._last_fetch = 0.0
+        self._resyncing = False
+        self._lock = threading.Lock()
+
+    def log_message(self, message):
+        self.log(message)
+
+    @property
+    def synced(self):
+        return self.book.synced
+
+    @property
+    def resyncing(self):
+        """后台快照获取进行中"""
+        return self._resyncing
+
+    def on_update(self, update):
+        """推送增量"""
+        if self.record:
+            self.record("update", update)
+        with self._lock:
+            self._pending.append(update)
+            if self.book.synced:
+                self._drain(after_snapshot=False)
+            start = not self.book.synced and self.client is not None and not self._resyncing and \
+                time.monotonic() - self._last_fetch >= self.resync_interval
+            if start:
+                self._resyncing = True
+                self._last_fetch = time.monotonic()
+        if start:
+            # REST请求（含重试可达数十秒）不能在推送循环中进行，否则期间收不到推送、心跳超时断线
+            threading.Thread(target=self._resync_background, name="ethtrader-orderbook", daemon=True).start()
+
+    def _resync_background(self):
+        try:
+            self.resync()
+        finally:
+            with self._lock:
+                self._resyncing = False
+
+    def resync(self):
+        """获取快照并衔接缓存的增量（阻塞）"""
+        self._last_fetch = time.monotonic()
+        try:
+            snapshot = self.client.order_book(self.currency_pair, limit=self.limit)
+        except Exception as e:
+            self.log_message(f"❌ 订单簿快照获取失败: {str(e)}")
+            return
+        self.load_snapshot(snapshot)
+
+    def load_snapshot(self, snapshot):
+        if self.record:
+            self.record("snapshot", snapshot)
+        with self._lock:
+            self.book.load_snapshot(snapshot)
+            self.resyncs += 1
+            self._drain(after_snapshot=True)
+
+    def _drain(self, after_snapshot):
+        """
+        依次应用缓存的增量
+        推送中断时订单簿作废；刚加载的快照落后于第一条增量时同样作废，保留增量等待下一次快照
+        """
+        pending = self._pending
+        while pending:
+            try:
+                self.book.apply(pending[0])
+            except OrderBookGap as e:
+                if not after_snapshot:
+                    self.gaps += 1
+                    self.log_message(f"⚠️ 订单簿{e}，重新获取快照")
+                return
+            pending.popleft()
+
+    def summary(self):
+        with self._lock:
+            return self.book.summary() if self.book.synced else None
+
+    def plan_liquidity(self, is_long, quantity, stop_loss, take_profit, band=LEVEL_BAND):
+        """
+        交易计划的盘口流动性：入场吃单的均价和滑点、止损/止盈价位附近的挂单量、买卖失衡
+        未同步时返回None
+        """
+        with self._lock:
+            book = self.book
+            if not book.synced:
+                return None
+            return {
+                "imbalance": book.imbalance(),
+                "entry": book.estimate_fill(is_long, quantity),
+                # 止损为反向市价单
+                "exit": book.estimate_fill(not is_long, quantity),
+                "stop_depth": book.depth_near(stop_loss, band),
+                "target_depth": book.depth_near(take_profit, band)
+            }
+
+
+def read_recording(path):
+    """读取录制文件，逐条返回 (类型, 数据)"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["type"], entry["data"]
+
+
+def replay(events, size=None, log=None):
+    """
+    按录制顺序重放快照和增量（不发起请求），返回同步器和每条增量的平均处理耗时（秒）
+    size不为空时每条增量之后同时估算该数量的买入滑点
+    """
+    sync = OrderBookSync(None, None, log=log or (lambda message: None))
+    elapsed = 0.0
+    count = 0
+    for kind, data in events:
+        if kind == "snapshot":
+            sync.load_snapshot(data)
+            continue
+        started = time.perf_counter()
+        sync.on_update(data)
+        if size:
+            sync.book.estimate_fill(True, size)
+        elapsed += time.perf_counter() - started
+        count += 1
+    return sync, elapsed / count if count else 0.0
+
+
+def record(client, currency_pair, path, seconds, url=None, log=print):
+    """录制快照和增量推送到JSON Lines文件，返回增量条数"""
+    from .wsfeed import WS_URL, GateFeed
+
+    lock = threading.Lock()
+    counts = {"snapshot": 0, "update": 0}
+    with open(path, "w", encoding="utf-8") as f:
+        def write(kind, data):
+            with lock:
+                f.write(json.dumps({"type": kind, "data": data}) + "\n")
+                counts[kind] += 1
+
+        sync = OrderBookSync(client, currency_pair, log=log, record=write)
+        feed = GateFeed(currency_pair, [], on_order_book=sync.on_update, url=url or WS_URL, log=log)
+        feed.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            feed.stop()
+    log(f"✅ 已录制 {counts['snapshot']} 个快照、{counts['update']} 条增量: {path}")
+    return counts["update"]
+
+
+def format_summary(summary):
+    if summary is None:
+        return "订单簿未同步"
+    return (f"买一 {summary['bid']:.6g} / 卖一 {summary['ask']:.6g}  价差 {summary['spread']:.4f}%  "
+            f"失衡 {summary['imbalance']:+.2f}  档数 {summary['levels'][0]}/{summary['levels'][1]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="L2订单簿录制与重放")
+    parser.add_argument("--pair", default="ETH_USDT")
+    parser.add_argument("--record", help="录制到该文件（JSON Lines）")
+    parser.add_argument("--seconds", type=float, default=60, help="录制时长")
+    parser.add_argument("--replay", help="重放录制文件")
+    parser.add_argument("--size", type=float, help="重放时估算该数量市价买入的滑点")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        from .gateio import GateClient
+        client = GateClient()
+        try:
+            record(client, args.pair, args.record, args.seconds)
+        finally:
+            client.close()
+        return 0
+
+    if args.replay:
+        sync, per_update = replay(read_recording(args.replay), args.size, log=print)
+        book = sync.book
+        print(f"增量 {book.updates} 条，涉及档位 {book.levels_touched} 个，快照 {sync.resyncs} 次，"
+              f"编号中断 {sync.gaps} 次，平均 {per_update * 1e6:.1f}us/条")
+        print(format_summary(sync.summary()))
+        if args.size and book.synced:
+            for is_buy in (True, False):
+                fill = book.estimate_fill(is_buy, args.size)
+                print(f"{'买入' if is_buy else '卖出'} {args.size:g}: 均价 {fill['price']:.6g} "
+                      f"滑点 {fill['slippage']:.4f}% ({fill['levels']}档, 成交 {fill['filled']:g})")
+        return 0 if book.synced else 1
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+模拟交易（纸面交易）
+把交易计划转为模拟持仓：仓位、止损和止盈按 plan_levels 计算，保证金按杠杆计算（逐仓），
+杠杆过高时强平价先于止损触发
+每个交易对的持仓出场价位保存在两个有序索引中（价格上涨触发 / 下跌触发），每个价格tick
+只需与索引两端比较，未触发时耗时与持仓数量无关；浮动盈亏由按交易对汇总的净持仓和成本计算
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .backtest import DEFAULT_MAX_HOLD, EXIT_STOP, EXIT_TARGET, EXIT_TIMEOUT, summarize_trades
+from .engine import plan_levels
+
+# 强平、手动平仓（与回测的出场原因编号连续）
+EXIT_LIQUIDATION, EXIT_MANUAL = 3, 4
+
+EXIT_NAMES = {
+    EXIT_STOP: "止损",
+    EXIT_TARGET: "止盈",
+    EXIT_TIMEOUT: "超时",
+    EXIT_LIQUIDATION: "强平",
+    EXIT_MANUAL: "手动"
+}
+
+# 维持保证金率
+MAINTENANCE_MARGIN = 0.005
+
+DEFAULT_CAPITAL = 5000
+
+# 与回测成交记录相同的字段，entry/exit 为时间戳（秒）
+TRADE_DTYPE = [
+    ("entry", np.float64), ("exit", np.float64), ("direction", np.int8),
+    ("entry_price", np.float64), ("exit_price", np.float64),
+    ("quantity", np.float64), ("pnl", np.float64), ("reason", np.int8)
+]
+
+
+def liquidation_price(is_long, price, leverage, maintenance=MAINTENANCE_MARGIN):
+    """逐仓强平价：亏损达到保证金减去维持保证金"""
+    if is_long:
+        return price * (1 - 1 / leverage + maintenance)
+    return price * (1 + 1 / leverage - maintenance)
+
+
+class _LevelIndex:
+    """按价位升序排列的 (价位, 持仓编号)"""
+
+    __slots__ = ("levels", "ids")
+
+    def __init__(self):
+        self.levels = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.levels)
+
+    def add(self, level, position_id):
+        index = bisect_right(self.levels, level)
+        self.levels.insert(index, level)
+        self.ids.insert(index, position_id)
+
+    def remove(self, level, position_id):
+        index = bisect_left(self.levels, level)
+        while self.ids[index] != position_id:
+            index += 1
+        del self.levels[index]
+        del self.ids[index]
+
+    def pop_upto(self, price):
+        """取出价位 ≤ price 的全部持仓"""
+        end = bisect_right(self.levels, price)
+        ids = self.ids[:end]
+        del self.levels[:end]
+        del self.ids[:end]
+        return ids
+
+    def pop_from(self, price):
+        """取出价位 ≥ price 的全部持仓"""
+        start = bisect_left(self.levels, price)
+        ids = self.ids[start:]
+        del self.levels[start:]
+        del self.ids[start:]
+        return ids
+
+
+class _Book:
+    """单个交易对的出场索引和净持仓"""
+
+    __slots__ = ("rising", "falling", "quantity", "cost", "price")
+
+    def __init__(self):
+        # 价格上涨到价位时触发：多单止盈、空单止损/强平
+        self.rising = _LevelIndex()
+        # 价格下跌到价位时触发：多单止损/强平、空单止盈
+        self.falling = _LevelIndex()
+        # 带方向的数量之和与 数量×入场价 之和
+        self.quantity = 0.0
+        self.cost = 0.0
+        self.price = None
+
+    def unrealized(self):
+        if self.price is None:
+            return 0.0
+        return self.quantity * self.price - self.cost
+
+
+class PaperAccount:
+    """
+    模拟账户
+    open/on_tick/close 可在不同线程调用；on_tick 返回本次平仓的成交记录
+    """
+
+    def __init__(self, capital=DEFAULT_CAPITAL, fee_rate=0.0, max_hold=DEFAULT_MAX_HOLD, log=None,
+                 clock=time.time):
+        self.log = log or (lambda message: None)
+        self.fee_rate = fee_rate
+        self.max_hold = max_hold
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset(capital)
+
+    def log_message(self, message):
+        self.log(message)
+
+    def reset(self, capital=None):
+        """清空持仓和成交记录"""
+        with self._lock:
+            if capital is not None:
+                self.capital = float(capital)
+            self.balance = self.capital
+            self.margin = 0.0
+            self.positions = {}
+            self.trades = []
+            self._books = {}
+            self._expiry = []
+            self._ids = itertools.count(1)
+
+    def open(self, pair, direction, price, trade_params, atr=None, confidence=0, now=None):
+        """
+        按交易计划开仓，direction为分析结果的方向文本（观望不开仓）
+        仓位按当前余额和风险比例计算，返回持仓字典，保证金不足时返回None
+        """
+        if "做多" in direction:
+            is_long = True
+        elif "做空" in direction:
+            is_long = False
+        else:
+            return None
+        leverage = max(1.0, float(trade_params.get('leverage', 1) or 1))
+        now = self.clock() if now is None else now
+
+        with self._lock:
+            levels = plan_levels(is_long, price, dict(trade_params, capital=self.balance), atr)
+            quantity = levels["contract_amount"]
+            if quantity <= 0:
+                return None
+            margin = quantity * price / leverage
+            if margin > self.balance - self.margin:
+                self.log_message(f"❌ 模拟开仓失败: 可用保证金不足（需要${margin:.2f}）")
+                return None
+
+            side = 1 if is_long else -1
+            liquidation = liquidation_price(is_long, price, leverage)
+            if is_long:
+                stop = (liquidation, EXIT_LIQUIDATION) if liquidation >= levels["stop_loss"] else \
+                    (levels["stop_loss"], EXIT_STOP)
+                up, down = (levels["take_profit"], EXIT_TARGET), stop
+            else:
+                stop = (liquidation, EXIT_LIQUIDATION) if liquidation <= levels["stop_loss"] else \
+                    (levels["stop_loss"], EXIT_STOP)
+                up, down = stop, (levels["take_profit"], EXIT_TARGET)
+
+            position = {
+                "id": next(self._ids),
+                "pair": pair,
+                "direction": side,
+                "entry_price": price,
+                "quantity": quantity,
+                "leverage": leverage,
+                "margin": margin,
+                "stop_loss": levels["stop_loss"],
+                "take_profit": levels["take_profit"],
+                "liquidation": liquidation,
+                "up": up,
+                "down": down,
+                "confidence": confidence,
+                "opened_at": now
+            }
+            self.positions[position["id"]] = position
+            self.margin += margin
+
+            book = self._books.get(pair)
+            if book is None:
+                book = self._books[pair] = _Book()
+            book.rising.add(up[0], position["id"])
+            book.falling.add(down[0], position["id"])
+            book.quantity += side * quantity
+            book.cost += side * quantity * price
+            book.price = price
+            if self.max_hold:
+                heapq.heappush(self._expiry, (now + self.max_hold, position["id"]))
+
+        self.log_message(f"📝 模拟{'做多' if is_long else '做空'} {pair} {quantity:.4f} @ ${price:.6g} "
+                         f"{leverage:g}x 止损${levels['stop_loss']:.6g} 止盈${levels['take_profit']:.6g}")
+        return position
+
+    def on_tick(self, pair, price, now=None):
+        """
+        价格更新：触发到价的止损/止盈/强平和超时持仓
+        未触发时只比较索引两端的价位
+        """
+        with self._lock:
+            book = self._books.get(pair)
+            if book is None:
+                return []
+            book.price = price
+            closed = []
+
+            rising, falling = book.rising, book.falling
+            if rising.levels and rising.levels[0] <= price:
+                for position_id in rising.pop_upto(price):
+                    position = self.positions[position_id]
+                    closed.append(self._close(position, price, position["up"], now, popped=rising))
+            if falling.levels and falling.levels[-1] >= price:
+                for position_id in falling.pop_from(price):
+                    position = self.positions[position_id]
+                    closed.append(self._close(position, price, position["down"], now, popped=falling))
+
+            if self._expiry:
+                now = self.clock() if now is None else now
+                while self._expiry and self._expiry[0][0] <= now:
+                    _, position_id = heapq.heappop(self._expiry)
+                    position = self.positions.get(position_id)
+                    if position is not None:
+                        closed.append(self._close_at_market(position, EXIT_TIMEOUT, now))
+        return closed
+
+    def close(self, position_id, price=None, now=None):
+        """手动平仓，price为空时使用该交易对的最新价"""
+        with self._lock:
+            position = self.positions.get(position_id)
+            if position is None:
+                return None
+            if price is not None:
+                self._books[position["pair"]].price = price
+            return self._close_at_market(position, EXIT_MANUAL, now)
+
+    def close_all(self, pair=None, now=None):
+        """按最新价平掉全部（或指定交易对的）持仓"""
+        with self._lock:
+            return [self._close_at_market(position, EXIT_MANUAL, now)
+                    for position in list(self.positions.values())
+                    if pair is None or position["pair"] == pair]
+
+    def _close_at_market(self, position, reason, now):
+        book = self._books[position["pair"]]
+        price = book.price if book.price is not None else position["entry_price"]
+        return self._close(position, price, (price, reason), now)
+
+    def _close(self, position, price, exit_level, now, popped=None):
+        """平仓结算：止盈按价位成交，止损按触发时的价格成交（跳空时有滑点），强平损失全部保证金"""
+        level, reason = exit_level
+        book = self._books[position["pair"]]
+        if popped is not book.rising:
+            book.rising.remove(position["up"][0], position["id"])
+        if popped is not book.falling:
+            book.falling.remove(position["down"][0], position["id"])
+        del self.positions[position["id"]]
+
+        side = position["direction"]
+        quantity = position["quantity"]
+        entry_price = position["entry_price"]
+        exit_price = level if reason in (EXIT_TARGET, EXIT_LIQUIDATION) else price
+        fees = self.fee_rate * quantity * (entry_price + exit_price)
+        pnl = side * quantity * (exit_price - entry_price) - fees
+        if reason == EXIT_LIQUIDATION:
+            pnl = -position["margin"] - fees
+
+        book.quantity -= side * quantity
+        book.cost -= side * quantity * entry_price
+        if not book.rising:
+            # 浮点累加误差清零
+            book.quantity = book.cost = 0.0
+        self.margin -= position["margin"]
+        self.balance += pnl
+        now = self.clock() if now is None else now
+        trade = (position["opened_at"], now, side, entry_price, exit_price, quantity, pnl, reason)
+        self.trades.append(trade)
+
+        self.log_message(f"{'✅' if pnl >= 0 else '❌'} 模拟平仓({EXIT_NAMES[reason]}) {position['pair']} "
+                         f"@ ${exit_price:.6g} 盈亏 ${pnl:+.2f}")
+        return dict(zip([name for name, _ in TRADE_DTYPE], trade), pair=position["pair"])
+
+    def unrealized(self, pair=None):
+        """浮动盈亏"""
+        with self._lock:
+            if pair is not None:
+                book = self._books.get(pair)
+                return book.unrealized() if book else 0.0
+            return sum(book.unrealized() for book in self._books.values())
+
+    def status(self):
+        """权益、浮动盈亏和持仓数（每个tick显示用，不统计成交记录）"""
+        with self._lock:
+            unrealized = sum(book.unrealized() for book in self._books.values())
+            return {
+                "balance": self.balance,
+                "margin": self.margin,
+                "unrealized": unrealized,
+                "equity": self.balance + unrealized,
+                "open_positions": len(self.positions)
+            }
+
+    def trade_array(self):
+        """成交记录结构化数组（字段同回测）"""
+        with self._lock:
+            return np.array(self.trades, dtype=TRADE_DTYPE)
+
+    def summary(self):
+        """账户状态和成交统计"""
+        trades = self.trade_array()
+        unrealized = self.unrealized()
+        with self._lock:
+            report = summarize_trades(trades, self.capital, bar_seconds=1)
+            report.update({
+                "capital": self.capital,
+                "balance": self.balance,
+                "margin": self.margin,
+                "unrealized": unrealized,
+                "equity": self.balance + unrealized,
+                "open_positions": len(self.positions),
+                "liquidations": int((trades["reason"] == EXIT_LIQUIDATION).sum())
+            })
+        return report
+
+
+def format_account(account, top=10):
+    """模拟账户文本"""
+    report = account.summary()
+    with account._lock:
+        positions = sorted(account.positions.values(), key=lambda p: p["opened_at"], reverse=True)[:top]
+        prices = {pair: book.price for pair, book in account._books.items()}
+
+    lines = [f"""【📝 模拟账户】
+权益: ${report['equity']:.2f} (初始 ${report['capital']:.2f}, {(report['equity'] / report['capital'] - 1) * 100:+.2f}%)
+余额: ${report['balance']:.2f}  占用保证金: ${report['margin']:.2f}
+浮动盈亏: ${report['unrealized']:+.2f}  持仓: {report['open_positions']}
+已平仓: {report['trades']} 笔, 盈亏 ${report['total_pnl']:+.2f}, 胜率 {report['win_rate']:.1f}%
+出场: 止损 {report['stops']} / 止盈 {report['targets']} / 超时 {report['timeouts']} / 强平 {report['liquidations']}"""]
+    for p in positions:
+        price = prices.get(p["pair"]) or p["entry_price"]
+        pnl = p["direction"] * p["quantity"] * (price - p["entry_price"])
+        lines.append(f"{'多' if p['direction'] > 0 else '空'} {p['pair']} {p['quantity']:.4f} @ ${p['entry_price']:.6g} "
+                     f"{p['leverage']:g}x 止损${p['down' if p['direction'] > 0 else 'up'][0]:.6g} "
+                     f"止盈${p['take_profit']:.6g} 浮盈 ${pnl:+.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,286 @@
+"""
+多交易对扫描
+一次不带 currency_pair 的 /spot/tickers 请求取得全部价格，K线在客户端限频内并发获取；
+每个交易对只请求少数几个源周期，其余时间框架由源周期合成，
+之后只在源周期K线收盘后补齐增量，各时间框架对全部交易对批量分析并按分数排序
+
+用法:
+    python -m ethtrader.scanner --pairs 300 --top 20 --repeat 30
+"""
+
+import argparse
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from .aggregate import resample
+from .batch import analyze_batch, summarize_batch
+from .candles import INTERVAL_SECONDS, decode_candles
+from .engine import DIRECTIONS, HISTORY_LIMIT, MIN_CANDLES, TIMEFRAMES
+from .gateio import MAX_CANDLES_PER_REQUEST, GateClient
+
+SCAN_QUOTE = "USDT"
+SCAN_PAIRS = 300
+SCAN_WORKERS = 16
+
+# 源周期：每个时间框架由能整除它的最大源周期合成
+SOURCE_INTERVALS = ("1m", "1h")
+
+# 杠杆代币（如 ETH3L_USDT）不参与扫描
+LEVERAGED_TOKEN = re.compile(r"\d+[LS]_")
+
+
+def source_for(tf_key, sources=SOURCE_INTERVALS):
+    """时间框架对应的源周期"""
+    seconds = INTERVAL_SECONDS[tf_key]
+    candidates = [s for s in sources if seconds % INTERVAL_SECONDS[s] == 0]
+    return max(candidates, key=INTERVAL_SECONDS.get)
+
+
+def source_limits(timeframes, sources=SOURCE_INTERVALS, history=HISTORY_LIMIT):
+    """每个源周期需保留的K线数：覆盖由它合成的最高周期的history根，不超过单次请求上限"""
+    limits = {}
+    for tf_key in timeframes:
+        source = source_for(tf_key, sources)
+        needed = history * INTERVAL_SECONDS[tf_key] // INTERVAL_SECONDS[source]
+        limits[source] = min(MAX_CANDLES_PER_REQUEST, max(limits.get(source, 0), needed))
+    return limits
+
+
+def merge_rows(old, new, limit):
+    """合并增量K线（同一时间戳以新数据为准），只保留最近limit根"""
+    if not len(new):
+        return old
+    if len(old):
+        new = np.concatenate([old[old[:, 0] < new[0, 0]], new])
+    return new[-limit:]
+
+
+class MarketScanner:
+    """
+    扫描全部USDT交易对的多时间框架信号
+    K线按交易对缓存在内存中，每轮只请求收盘后需要补齐的源周期
+    """
+
+    def __init__(self, client=None, quote=SCAN_QUOTE, max_pairs=SCAN_PAIRS, timeframes=None,
+                 sources=SOURCE_INTERVALS, history=HISTORY_LIMIT, workers=SCAN_WORKERS,
+                 min_quote_volume=0, log=None):
+        # 客户端按接口限频，并发请求在限频内排队；传入的客户端（与分析引擎共用限频和熔断）由调用方关闭
+        self.client = client or GateClient(pool_size=workers, log=log)
+        self._owns_client = client is None
+        self.quote = quote
+        self.max_pairs = max_pairs
+        self.timeframes = list(timeframes or TIMEFRAMES)
+        self.sources = [s for s in sources if any(source_for(tf, sources) == s for tf in self.timeframes)]
+        self.history = history
+        self.limits = source_limits(self.timeframes, sources, history)
+        self.min_quote_volume = min_quote_volume
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ethtrader-scan")
+        self.log = log
+
+        # 交易对 -> {源周期: K线数组}
+        self.candles = {}
+        self.results = []
+        self.requests = 0
+        # 同一时刻只进行一轮扫描（K线缓存的合并与释放不是线程安全的）
+        self._scan_lock = threading.Lock()
+
+    def log_message(self, message):
+        if self.log:
+            self.log(message)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_client:
+            self.client.close()
+
+    def select_pairs(self, tickers):
+        """按24小时成交额选出前max_pairs个交易对，返回 {交易对: 行情}"""
+        suffix = f"_{self.quote}"
+        candidates = []
+        for ticker in tickers:
+            pair = ticker.get("currency_pair", "")
+            if not pair.endswith(suffix) or LEVERAGED_TOKEN.search(pair):
+                continue
+            try:
+                price = float(ticker["last"])
+                quote_volume = float(ticker.get("quote_volume") or 0)
+                change = float(ticker.get("change_percentage") or 0)
+            except (KeyError, ValueError):
+                continue
+            if price <= 0 or quote_volume < self.min_quote_volume:
+                continue
+            candidates.append((quote_volume, pair, {"price": price, "change": change, "quote_volume": quote_volume}))
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return {pair: info for _, pair, info in candidates[:self.max_pairs]}
+
+    def _needs_fetch(self, pair, source, now):
+        """源周期最后一根K线已收盘（或尚无数据）时需要请求"""
+        rows = self.candles.get(pair, {}).get(source)
+        if rows is None or not len(rows):
+            return True
+        return rows[-1, 0] + INTERVAL_SECONDS[source] <= now
+
+    def _fetch(self, pair, source, now):
+        """请求一个源周期的K线（在线程池中执行，不修改共享状态）"""
+        rows = self.candles.get(pair, {}).get(source)
+        limit = self.limits[source]
+        seconds = INTERVAL_SECONDS[source]
+
+        if rows is not None and len(rows) and (now - rows[-1, 0]) // seconds < limit:
+            raw = self.client.candlesticks(pair, source, from_ts=int(rows[-1, 0]))
+        else:
+            raw = self.client.candlesticks(pair, source, limit=limit)
+        return decode_candles(raw)
+
+    def refresh(self, pairs):
+        """并发补齐K线，返回失败的请求数"""
+        now = time.time()
+        jobs = [(pair, source) for pair in pairs for source in self.sources
+                if self._needs_fetch(pair, source, now)]
+        futures = {self.executor.submit(self._fetch, pair, source, now): (pair, source)
+                   for pair, source in jobs}
+
+        failures = 0
+        for future in as_completed(futures):
+            pair, source = futures[future]
+            try:
+                rows = future.result()
+            except Exception:
+                failures += 1
+                continue
+            stored = self.candles.setdefault(pair, {})
+            stored[source] = merge_rows(stored.get(source, np.empty((0, 6))), rows, self.limits[source])
+
+        self.requests += len(jobs)
+        # 不再入选的交易对释放缓存
+        for pair in list(self.candles):
+            if pair not in pairs:
+                del self.candles[pair]
+        return len(jobs), failures
+
+    def _closes(self, pair, tf_key, price):
+        """时间框架最近history根收盘价，最后一根未收盘K线使用最新价格"""
+        source = source_for(tf_key, self.sources)
+        rows = self.candles.get(pair, {}).get(source)
+        if rows is None or not len(rows):
+            return None
+        if tf_key != source:
+            rows = resample(rows, INTERVAL_SECONDS[tf_key])
+        closes = rows[-self.history:, 4].copy()
+        closes[-1] = price
+        return closes
+
+    def analyze(self, pairs):
+        """各时间框架对全部交易对批量分析，返回按信号强度排序的结果"""
+        names = list(pairs)
+        scores = np.zeros((len(names), len(self.timeframes)))
+        valid = np.zeros((len(names), len(self.timeframes)), dtype=bool)
+        levels = np.zeros((len(names), len(self.timeframes)), dtype=np.int8)
+        rsi = np.full((len(names), len(self.timeframes)), np.nan)
+
+        for column, tf_key in enumerate(self.timeframes):
+            # 长度相同的序列一起计算（新上线的交易对K线较少）
+            groups = {}
+            for row, pair in enumerate(names):
+                closes = self._closes(pair, tf_key, pairs[pair]["price"])
+                if closes is not None and len(closes) >= MIN_CANDLES:
+                    groups.setdefault(len(closes), []).append((row, closes))
+
+            for members in groups.values():
+                rows = [row for row, _ in members]
+                result = analyze_batch(np.vstack([closes for _, closes in members]))
+                scores[rows, column] = result["score"]
+                valid[rows, column] = result["valid"]
+                levels[rows, column] = result["level"]
+                rsi[rows, column] = result["rsi"]
+
+        summary = summarize_batch(scores, valid)
+        results = []
+        for row, pair in enumerate(names):
+            if not summary["count"][row]:
+                continue
+            level = int(summary["level"][row])
+            results.append(dict(
+                pairs[pair],
+                pair=pair,
+                avg_score=float(summary["avg_score"][row]),
+                level=level,
+                direction=DIRECTIONS[level][0],
+                confidence=float(summary["confidence"][row]),
+                signals={tf: int(levels[row, column]) for column, tf in enumerate(self.timeframes)
+                         if valid[row, column]},
+                rsi={tf: float(rsi[row, column]) for column, tf in enumerate(self.timeframes)
+                     if valid[row, column]}
+            ))
+
+        results.sort(key=lambda r: (abs(r["avg_score"]), r["confidence"], r["quote_volume"]), reverse=True)
+        return results
+
+    def scan(self, wait=True):
+        """
+        完成一轮扫描，返回排序后的结果列表
+        已有扫描在进行时，wait为True则等待其结束后再扫描，否则直接返回None
+        """
+        if not self._scan_lock.acquire(blocking=wait):
+            return None
+        try:
+            started = time.perf_counter()
+            tickers = self.client.tickers(timeout=10)
+            pairs = self.select_pairs(tickers)
+
+            requested, failures = self.refresh(pairs)
+            self.results = self.analyze(pairs)
+        finally:
+            self._scan_lock.release()
+
+        elapsed = time.perf_counter() - started
+        message = f"🔍 扫描完成: {len(self.results)}/{len(pairs)}个交易对，请求{requested}次，耗时{elapsed:.1f}秒"
+        if failures:
+            message += f"，{failures}次失败"
+        self.log_message(message)
+        return self.results
+
+
+def format_ranking(results, top=20):
+    """排行榜文本"""
+    lines = [f"【🔍 市场扫描 {datetime.now().strftime('%H:%M:%S')}】"]
+    for rank, result in enumerate(results[:top], 1):
+        lines.append(f"{rank:>2}. {result['pair']:<14} ${result['price']:<12.6g} {result['change']:+6.2f}%  "
+                     f"{result['direction']} 分数{result['avg_score']:+.2f} 置信度{result['confidence']:.0f}%")
+    if len(lines) == 1:
+        lines.append("暂无结果")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多交易对市场扫描")
+    parser.add_argument("--quote", default=SCAN_QUOTE)
+    parser.add_argument("--pairs", type=int, default=SCAN_PAIRS, help="按成交额选取的交易对数量")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--repeat", type=float, help="每隔N秒重复扫描")
+    args = parser.parse_args(argv)
+
+    scanner = MarketScanner(quote=args.quote, max_pairs=args.pairs, workers=args.workers, log=print)
+    try:
+        while True:
+            began = time.time()
+            print(format_ranking(scanner.scan(), args.top))
+            if not args.repeat:
+                return 0
+            time.sleep(max(0, args.repeat - (time.time() - began)))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        scanner.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
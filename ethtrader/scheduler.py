@@ -0,0 +1,109 @@
+"""
+K线收盘对齐的调度器
+每个时间框架在其K线收盘后稍等片刻同步一次，收盘之间只按刷新频率更新价格；
+单线程执行，各轮不会重叠，停止时立即唤醒退出
+"""
+
+import threading
+import time
+
+from .candles import INTERVAL_SECONDS
+from .engine import TIMEFRAMES
+
+# 收盘后等待交易所生成K线的秒数
+CLOSE_DELAY = 2.0
+
+# 价格刷新频率（秒）
+PRICE_INTERVAL = 60
+
+
+def next_close(tf_key, now):
+    """now之后该周期下一根K线的收盘时间"""
+    seconds = INTERVAL_SECONDS[tf_key]
+    return (int(now) // seconds + 1) * seconds
+
+
+class CandleScheduler:
+    """
+    按K线收盘时间调度分析
+    run_cycle(due) 在调度线程中调用，due为本轮需同步K线的周期列表（可能为空，表示只刷新价格）
+    """
+
+    def __init__(self, run_cycle, timeframes=None, price_interval=PRICE_INTERVAL,
+                 close_delay=CLOSE_DELAY, clock=time.time, log=None):
+        self.run_cycle = run_cycle
+        self.timeframes = list(timeframes or TIMEFRAMES)
+        self.price_interval = price_interval
+        self.close_delay = close_delay
+        self.clock = clock
+        self.log = log
+
+        self.cycles = 0
+        self._thread = None
+        self._stopping = False
+        self._wake = threading.Event()
+        # 前一个调度线程仍在执行时，新线程的下一轮等待它结束
+        self._cycle_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stopping
+
+    def log_message(self, message):
+        if self.log:
+            self.log(message)
+
+    def start(self):
+        """启动调度线程，已在运行时不重复启动"""
+        if self.running:
+            return False
+        self._stopping = False
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._wake,),
+                                        name="ethtrader-scheduler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """停止调度，等待中的线程立即退出，正在执行的一轮结束后退出"""
+        self._stopping = True
+        self._wake.set()
+
+    def set_price_interval(self, seconds):
+        """修改价格刷新频率，立即生效"""
+        self.price_interval = seconds
+        self._wake.set()
+
+    def _run(self, wake):
+        now = self.clock()
+        due_at = {tf_key: next_close(tf_key, now) + self.close_delay for tf_key in self.timeframes}
+        # 启动时先完整同步一次
+        due = list(self.timeframes)
+        last_run = now
+
+        while True:
+            if due is None:
+                timeout = min(min(due_at.values()), last_run + self.price_interval) - self.clock()
+                if timeout > 0:
+                    # 停止或修改刷新频率时被唤醒，重新计算等待时间
+                    wake.wait(timeout)
+                    wake.clear()
+                    if self._stopping or wake is not self._wake:
+                        return
+                    continue
+
+                now = self.clock()
+                due = [tf_key for tf_key in self.timeframes if due_at[tf_key] <= now]
+                for tf_key in due:
+                    due_at[tf_key] = next_close(tf_key, now) + self.close_delay
+
+            with self._cycle_lock:
+                if self._stopping or wake is not self._wake:
+                    return
+                last_run = self.clock()
+                try:
+                    self.run_cycle(due)
+                except Exception as e:
+                    self.log_message(f"❌ 调度错误: {str(e)}")
+                self.cycles += 1
+            due = None
@@ -0,0 +1,416 @@
+"""
+分析服务（无界面守护进程）
+每个交易对只运行一套行情获取与分析（推送模式或K线收盘对齐的轮询），所有交易对共用一个
+HTTP连接池（含响应缓存和限频）和SQLite K线缓存；每份快照只编码一次，再分发给任意数量的客户端，
+客户端数量不增加交易所请求
+
+HTTP（只读，JSON）:
+    GET /pairs              交易对及最新快照时间
+    GET /snapshot?pair=X    最新分析快照
+    GET /health             运行状态、客户端数和交易所请求统计
+    GET /metrics            性能统计（Prometheus文本格式，需 --metrics）
+WebSocket（与Gate.io推送相同的消息格式）:
+    {"channel": "ethtrader.snapshot", "event": "subscribe", "payload": ["ETH_USDT", ...]}
+    订阅后立即收到最新快照，之后每次分析更新推送一次；客户端来不及接收时只保留每个交易对的最新一条
+
+用法:
+    python -m ethtrader.server --pairs ETH_USDT,BTC_USDT --host 0.0.0.0 --push --cache candles.sqlite
+    应用的“分析服务”设置填写 ws://主机:8765/ 后，开始监控即改为订阅该服务
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .cache import CandleCache
+from .engine import TIMEFRAMES, AnalysisEngine
+from .gateio import GateClient
+from .metrics import metrics
+from .scheduler import PRICE_INTERVAL, CandleScheduler
+from .wsfeed import GateFeed, websockets
+
+SNAPSHOT_CHANNEL = "ethtrader.snapshot"
+
+DEFAULT_PORT = 8765
+DEFAULT_HTTP_PORT = 8766
+
+
+def encode_snapshot(pair, snapshot):
+    """快照编码为JSON文本（时间为Unix时间戳，客户端按本地时区还原）"""
+    data = dict(snapshot, time=snapshot["time"].timestamp())
+    return json.dumps({"pair": pair, "snapshot": data}, ensure_ascii=False)
+
+
+def decode_snapshot(data):
+    """还原为 AnalysisEngine.snapshot 的格式"""
+    return dict(data, time=datetime.fromtimestamp(data["time"]))
+
+
+def update_message(payload):
+    """推送消息，payload为已编码的快照，直接拼接而不重新编码"""
+    return (f'{{"time": {int(time.time())}, "channel": "{SNAPSHOT_CHANNEL}", '
+            f'"event": "update", "result": {payload}}}')
+
+
+class _Subscriber:
+    """一个WebSocket客户端：待发送的回复和每个交易对最新一条未发送的快照"""
+
+    def __init__(self):
+        self.pairs = set()
+        self.replies = []
+        self.pending = {}
+        self.wake = asyncio.Event()
+
+
+class SnapshotHub:
+    """
+    最新快照与订阅分发
+    publish可在任意线程调用；分发在服务的事件循环中进行，每个客户端只保留每个交易对最新一条未发送的快照，
+    慢客户端不会积压消息，也不会拖慢其他客户端
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.published = 0
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._subscribers = {}
+        self.clients = set()
+
+    def latest(self, pair):
+        """最新快照的 (编码, 快照)，尚未分析时为None"""
+        with self._lock:
+            return self._latest.get(pair)
+
+    def pairs(self):
+        with self._lock:
+            return {pair: snapshot["time"] for pair, (_, snapshot) in self._latest.items()}
+
+    def publish(self, pair, snapshot):
+        """保存并分发一份快照"""
+        payload = encode_snapshot(pair, snapshot)
+        with self._lock:
+            self._latest[pair] = (payload, snapshot)
+            self.published += 1
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, pair, update_message(payload))
+
+    def subscribe(self, subscriber, pairs):
+        """在事件循环中调用，已有快照的交易对立即排入发送"""
+        for pair in pairs:
+            subscriber.pairs.add(pair)
+            self._subscribers.setdefault(pair, set()).add(subscriber)
+            latest = self.latest(pair)
+            if latest is not None:
+                subscriber.pending[pair] = update_message(latest[0])
+        subscriber.wake.set()
+
+    def unsubscribe(self, subscriber, pairs=None):
+        for pair in list(subscriber.pairs if pairs is None else pairs):
+            subscriber.pairs.discard(pair)
+            subscriber.pending.pop(pair, None)
+            subscribers = self._subscribers.get(pair)
+            if subscribers:
+                subscribers.discard(subscriber)
+
+    def subscriptions(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _fan_out(self, pair, message):
+        for subscriber in self._subscribers.get(pair, ()):
+            subscriber.pending[pair] = message
+            subscriber.wake.set()
+
+
+class AnalysisServer:
+    """
+    分析服务：每个交易对一个分析引擎，快照经 SnapshotHub 分发
+    push为True时各交易对使用WebSocket推送更新，否则由一个调度线程依次轮询全部交易对
+    """
+
+    def __init__(self, pairs, client=None, cache=None, push=False, price_interval=PRICE_INTERVAL,
+                 host="127.0.0.1", port=DEFAULT_PORT, http_port=DEFAULT_HTTP_PORT, feed_url=None, log=None):
+        self.pairs = list(pairs)
+        self.log = log or print
+        self.client = client or GateClient(log=self.log)
+        self.cache = cache
+        self.push = push
+        self.host = host
+        self.port = port
+        self.http_port = http_port
+        self.feed_url = feed_url
+        self.started = None
+
+        self.hub = SnapshotHub()
+        # 各交易对的分析引擎共用连接池、K线缓存和有界线程池；每个引擎最多占用一个线程做收盘校验
+        # （可能等待该引擎的锁），其余线程足够任一交易对并行同步全部周期
+        self.executor = ThreadPoolExecutor(max_workers=len(TIMEFRAMES) + len(self.pairs),
+                                           thread_name_prefix="ethtrader-io")
+        self.engines = {pair: AnalysisEngine(client=self.client, currency_pair=pair, log=self.log_message,
+                                             executor=self.executor, cache=cache)
+                        for pair in self.pairs}
+        self.scheduler = CandleScheduler(self.run_cycle, price_interval=price_interval, log=self.log_message)
+
+        self._http = ThreadingHTTPServer((host, http_port), self._handler_class())
+        self._http.daemon_threads = True
+        self.http_port = self._http.server_address[1]
+        self._http_thread = None
+        self._loop = None
+        self._ws_server = None
+        self._ws_thread = None
+        self._ready = threading.Event()
+
+    def log_message(self, message):
+        self.log(message)
+
+    def start(self):
+        """启动HTTP/WebSocket服务和行情分析，返回后即可连接"""
+        if websockets is None:
+            raise RuntimeError("未安装websockets，无法启动分析服务")
+        self.started = time.time()
+
+        self._loop = asyncio.new_event_loop()
+        self.hub.loop = self._loop
+        self._ws_thread = threading.Thread(target=self._ws_main, name="ethtrader-server-ws", daemon=True)
+        self._ws_thread.start()
+        self._ready.wait(10)
+        self._http_thread = threading.Thread(target=self._http.serve_forever, name="ethtrader-server-http",
+                                             daemon=True)
+        self._http_thread.start()
+        self.log_message(f"🖥️ 分析服务已启动: ws://{self.host}:{self.port}/  http://{self.host}:{self.http_port}/")
+
+        for pair, engine in self.engines.items():
+            if engine.load_cache():
+                self.hub.publish(pair, engine.snapshot())
+
+        if self.push:
+            # 各交易对的推送在连接后先补齐K线，之后每条推送重新分析
+            for pair, engine in self.engines.items():
+                engine.start_stream(lambda snapshot, pair=pair: self.hub.publish(pair, snapshot),
+                                    url=self.feed_url)
+        else:
+            self.scheduler.start()
+        return self
+
+    def stop(self):
+        """停止分析和服务，释放连接"""
+        self.scheduler.stop()
+        for engine in self.engines.values():
+            engine.close()
+        self.executor.shutdown(wait=False)
+        if self._http_thread is not None:
+            self._http.shutdown()
+            self._http_thread.join(10)
+            self._http_thread = None
+        self._http.server_close()
+        if self._ws_thread is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+            self._ws_thread.join(10)
+            self._ws_thread = None
+        self.log_message("⏹️ 分析服务已停止")
+
+    def run_cycle(self, due):
+        """调度线程中依次同步并分析全部交易对"""
+        for pair, engine in self.engines.items():
+            try:
+                self.hub.publish(pair, engine.perform_analysis(due))
+            except Exception as e:
+                self.log_message(f"❌ {pair} 分析错误: {str(e)}")
+
+    def health(self):
+        return {
+            "uptime": time.time() - self.started if self.started else 0.0,
+            "mode": "push" if self.push else "poll",
+            "pairs": len(self.pairs),
+            "clients": len(self.hub.clients),
+            "subscriptions": self.hub.subscriptions(),
+            "published": self.hub.published,
+            "exchange_requests": self.client.requests,
+            "cache_hits": self.client.cache_hits,
+            "coalesced": self.client.coalesced
+        }
+
+    def handle(self, path, query):
+        """HTTP请求，返回 (状态码, 内容类型, 正文)"""
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        if path == "/snapshot":
+            pair = params.get("pair") or (self.pairs[0] if len(self.pairs) == 1 else None)
+            if pair not in self.engines:
+                return 404, "application/json", json.dumps({"error": f"未知的交易对: {pair}"}, ensure_ascii=False)
+            latest = self.hub.latest(pair)
+            if latest is None:
+                return 503, "application/json", json.dumps({"error": "尚未完成首次分析"}, ensure_ascii=False)
+            return 200, "application/json", latest[0]
+        if path == "/pairs":
+            times = self.hub.pairs()
+            return 200, "application/json", json.dumps(
+                [{"pair": pair, "time": times[pair].timestamp() if pair in times else None} for pair in self.pairs])
+        if path == "/health":
+            return 200, "application/json", json.dumps(self.health())
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", metrics.to_prometheus()
+        return 404, "application/json", json.dumps({"error": path})
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, content_type, text = server.handle(url.path, url.query)
+                body = text.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _ws_main(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._serve())
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _serve(self):
+        self._ws_server = await websockets.serve(self._ws_handler, self.host, self.port)
+        self.port = self._ws_server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+    async def _shutdown(self):
+        self.hub.loop = None
+        for ws in list(self.hub.clients):
+            await ws.close()
+        self._ws_server.close()
+        await self._ws_server.wait_closed()
+        self._loop.call_soon(self._loop.stop)
+
+    async def _ws_handler(self, ws):
+        subscriber = _Subscriber()
+        self.hub.clients.add(ws)
+        writer = asyncio.ensure_future(self._ws_writer(ws, subscriber))
+        try:
+            async for raw in ws:
+                subscriber.replies.append(self._ws_request(subscriber, raw))
+                subscriber.wake.set()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            self.hub.unsubscribe(subscriber)
+            self.hub.clients.discard(ws)
+
+    def _ws_request(self, subscriber, raw):
+        """处理一条客户端消息，返回回复"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            message = {}
+        channel = message.get("channel")
+        event = message.get("event")
+        reply = {"time": int(time.time()), "channel": channel, "event": event}
+
+        if channel == "spot.ping":
+            reply.update(channel="spot.pong", event="", result=None)
+        elif channel == SNAPSHOT_CHANNEL and event in ("subscribe", "unsubscribe"):
+            pairs = list(message.get("payload") or ())
+            unknown = [pair for pair in pairs if pair not in self.engines]
+            if unknown:
+                reply["error"] = {"code": 2, "message": f"未知的交易对: {','.join(unknown)}"}
+            elif event == "subscribe":
+                self.hub.subscribe(subscriber, pairs)
+                reply["result"] = {"status": "success"}
+            else:
+                self.hub.unsubscribe(subscriber, pairs)
+                reply["result"] = {"status": "success"}
+        else:
+            reply["error"] = {"code": 2, "message": "unknown event"}
+        return json.dumps(reply, ensure_ascii=False)
+
+    async def _ws_writer(self, ws, subscriber):
+        """按顺序发送回复，再发送各交易对最新的快照"""
+        try:
+            while True:
+                await subscriber.wake.wait()
+                subscriber.wake.clear()
+                replies, subscriber.replies = subscriber.replies, []
+                pending, subscriber.pending = subscriber.pending, {}
+                for message in replies + list(pending.values()):
+                    await ws.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class SnapshotFeed(GateFeed):
+    """
+    订阅分析服务的快照推送（断线后自动重连并重新订阅）
+    on_snapshot(交易对, 快照) 在推送线程中调用，快照格式同 AnalysisEngine.snapshot
+    """
+
+    def __init__(self, url, pairs, on_snapshot, log=None, **options):
+        super().__init__(None, [], url=url, log=log, **options)
+        self.pairs = list(pairs)
+        self.on_snapshot = on_snapshot
+
+    def subscriptions(self):
+        return [{"time": int(time.time()), "channel": SNAPSHOT_CHANNEL, "event": "subscribe",
+                 "payload": self.pairs}]
+
+    def handle_message(self, raw):
+        message = json.loads(raw)
+        if message.get("event") != "update":
+            if message.get("error"):
+                self.log(f"❌ 分析服务错误: {message['error']['message']}")
+            return
+        if message.get("channel") == SNAPSHOT_CHANNEL:
+            result = message["result"]
+            self.on_snapshot(result["pair"], decode_snapshot(result["snapshot"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ETH交易助手分析服务")
+    parser.add_argument("--pairs", default="ETH_USDT", help="交易对，逗号分隔")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，局域网访问用 0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="WebSocket端口")
+    parser.add_argument("--http-port", type=int, default=DEFAULT_HTTP_PORT, help="HTTP端口")
+    parser.add_argument("--push", action="store_true", help="使用交易所WebSocket推送（默认按K线收盘轮询）")
+    parser.add_argument("--interval", type=int, default=PRICE_INTERVAL, help="轮询模式的价格刷新频率（秒）")
+    parser.add_argument("--cache", help="SQLite K线缓存文件")
+    parser.add_argument("--metrics", action="store_true", help="开启性能统计（GET /metrics）")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+    pairs = [pair.strip().upper() for pair in args.pairs.split(",") if pair.strip()]
+    cache = CandleCache(args.cache) if args.cache else None
+    server = AnalysisServer(pairs, cache=cache, push=args.push, price_interval=args.interval,
+                            host=args.host, port=args.port, http_port=args.http_port)
+    try:
+        server.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        if cache is not None:
+            cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+参数扫描
+在历史K线上批量回测 trade_params、指标周期、RSI阈值和置信度公式的不同组合，
+按信号参数分组后分发到进程池：K线以只读内存映射在进程间共享，
+同一进程内的高周期合成和EMA/RSI中间结果跨组复用，同组的交易参数共用一次信号计算
+
+用法:
+    python -m ethtrader.sweep --db candles.sqlite --days 90 --random 10000 --top 20 --output sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .backtest import (DEFAULT_MAX_HOLD, DEFAULT_TRADE_PARAMS, SignalCache, simulate,
+                       summarize_trades)
+from .candles import INTERVAL_SECONDS
+from .engine import (CONFIDENCE_SLOPE, CONFIDENCE_STRONG, CONFIDENCE_WEAK, DIRECTION_STRONG,
+                     DIRECTION_WEAK, MIN_CANDLES, RSI_OVERBOUGHT, RSI_OVERSOLD, TIMEFRAMES)
+from .indicators import EMA_FAST, EMA_SLOW, RSI_PERIOD
+
+# 影响信号的参数（同组共用一次信号计算）及默认值
+SIGNAL_PARAMS = {
+    "fast": EMA_FAST,
+    "slow": EMA_SLOW,
+    "rsi_period": RSI_PERIOD,
+    "overbought": RSI_OVERBOUGHT,
+    "oversold": RSI_OVERSOLD,
+    "strong": DIRECTION_STRONG,
+    "weak": DIRECTION_WEAK,
+    "strong_base": CONFIDENCE_STRONG[0],
+    "weak_base": CONFIDENCE_WEAK[0],
+    "slope": CONFIDENCE_SLOPE
+}
+
+# 只影响交易模拟的参数
+TRADE_PARAMS = {
+    "stop_distance": float(DEFAULT_TRADE_PARAMS['stop_distance']),
+    "risk_reward": float(DEFAULT_TRADE_PARAMS['risk_reward']),
+    "risk_percent": float(DEFAULT_TRADE_PARAMS['risk_percent']),
+    "auto_plan_threshold": 85.0
+}
+
+# 默认搜索空间
+DEFAULT_SPACE = {
+    "fast": [5, 7, 9, 12],
+    "slow": [20, 25, 30, 50],
+    "rsi_period": [9, 14, 21],
+    "overbought": [65, 70, 75, 80],
+    "oversold": [20, 25, 30, 35],
+    "strong": [1.2, 1.5, 2.0],
+    "weak": [0.5, 0.8, 1.0],
+    "slope": [5, 10, 15],
+    "stop_distance": [1.0, 1.5, 2.0, 3.0, 4.0],
+    "risk_reward": [1.0, 1.5, 2.0, 3.0],
+    "risk_percent": [0.5, 1.0, 2.0],
+    "auto_plan_threshold": [50, 65, 75, 85]
+}
+
+# 可用的排序指标
+OBJECTIVES = ("total_pnl", "profit_factor", "win_rate", "return_over_drawdown")
+
+# 工作进程内的共享数据
+_worker = {}
+
+
+def is_consistent(config):
+    """过滤无意义的组合"""
+    return (config["fast"] < config["slow"] and config["oversold"] < config["overbought"]
+            and config["weak"] < config["strong"])
+
+
+def _complete(overrides):
+    config = dict(SIGNAL_PARAMS, **TRADE_PARAMS)
+    config.update(overrides)
+    return config
+
+
+def grid_configs(space):
+    """网格搜索：搜索空间的全部组合"""
+    keys = list(space)
+    for values in itertools.product(*(space[key] for key in keys)):
+        config = _complete(dict(zip(keys, values)))
+        if is_consistent(config):
+            yield config
+
+
+def random_configs(space, count, seed=None):
+    """随机搜索：从搜索空间中不重复地抽取count个组合"""
+    rng = random.Random(seed)
+    keys = list(space)
+    total = 1
+    for key in keys:
+        total *= len(space[key])
+
+    seen = set()
+    attempts = 0
+    while len(seen) < count and attempts < count * 20 and len(seen) < total:
+        attempts += 1
+        values = tuple(rng.choice(space[key]) for key in keys)
+        if values in seen:
+            continue
+        config = _complete(dict(zip(keys, values)))
+        if not is_consistent(config):
+            continue
+        seen.add(values)
+        yield config
+
+
+def group_configs(configs):
+    """按信号参数分组，返回 [(信号参数, [交易参数, ...])]"""
+    groups = {}
+    for config in configs:
+        signal_key = tuple(config[key] for key in SIGNAL_PARAMS)
+        trade = {key: config[key] for key in TRADE_PARAMS}
+        groups.setdefault(signal_key, []).append(trade)
+    return [(dict(zip(SIGNAL_PARAMS, key)), trades) for key, trades in groups.items()]
+
+
+def _init_worker(path, base, timeframes, capital, max_hold, fee_rate):
+    """工作进程初始化：以只读内存映射打开K线，建立本进程的指标缓存"""
+    rows = np.load(path, mmap_mode="r")
+    _worker["rows"] = rows
+    _worker["cache"] = SignalCache(rows, base, timeframes)
+    _worker["base"] = base
+    _worker["capital"] = capital
+    _worker["max_hold"] = max_hold
+    _worker["fee_rate"] = fee_rate
+
+
+def evaluate_group(signal_params, trades):
+    """计算一组信号参数的信号，并模拟其下的全部交易参数"""
+    rows = _worker["rows"]
+    base = _worker["base"]
+    capital = _worker["capital"]
+    signals = _worker["cache"].signals(**signal_params)
+
+    results = []
+    for trade in trades:
+        trade_params = {
+            'capital': str(capital),
+            'risk_percent': str(trade["risk_percent"]),
+            'stop_distance': str(trade["stop_distance"]),
+            'risk_reward': str(trade["risk_reward"])
+        }
+        executed = simulate(rows, signals, trade_params, trade["auto_plan_threshold"],
+                            _worker["max_hold"], _worker["fee_rate"], base)
+        report = summarize_trades(executed, capital, INTERVAL_SECONDS[base])
+        report["return_over_drawdown"] = (report["total_pnl"] / report["max_drawdown"]
+                                          if report["max_drawdown"] > 0 else 0.0)
+        results.append(dict(signal_params, **trade, **report))
+    return results
+
+
+def run_sweep(rows, configs, base="1m", timeframes=None, capital=5000.0, max_hold=DEFAULT_MAX_HOLD,
+              fee_rate=0.0, workers=None, log=print):
+    """
+    并行回测全部参数组合，返回结果列表（每个组合一个字典）
+    K线写入临时 .npy 文件，各工作进程以只读方式映射，不复制数据
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.float64)
+    groups = group_configs(configs)
+    total = sum(len(trades) for _, trades in groups)
+    workers = workers or os.cpu_count() or 1
+    log(f"🔍 {total}个参数组合，{len(groups)}组信号参数，{workers}个进程")
+
+    results = []
+    began = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="ethtrader-sweep-") as directory:
+        path = os.path.join(directory, "candles.npy")
+        np.save(path, rows)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(path, base, timeframes, capital, max_hold, fee_rate)) as pool:
+            # 相同周期参数的组排在一起，让同一进程更容易复用EMA/RSI中间结果
+            groups.sort(key=lambda group: (group[0]["fast"], group[0]["slow"], group[0]["rsi_period"]))
+            futures = [pool.submit(evaluate_group, signal_params, trades) for signal_params, trades in groups]
+            step = max(1, len(futures) // 10)
+            for finished, future in enumerate(as_completed(futures), 1):
+                results.extend(future.result())
+                if finished % step == 0 or finished == len(futures):
+                    log(f"⏳ {len(results)}/{total} 完成，耗时{time.perf_counter() - began:.0f}秒")
+
+    return results
+
+
+def rank_results(results, objective="total_pnl", min_trades=10):
+    """按指标从高到低排序，交易次数过少的组合排在最后"""
+    return sorted(results, key=lambda r: (r["trades"] >= min_trades, r[objective]), reverse=True)
+
+
+def write_results(path, results):
+    """保存为CSV"""
+    if not results:
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def format_result(rank, result):
+    return (f"{rank:>3}. 收益${result['total_pnl']:>9.2f} 胜率{result['win_rate']:5.1f}% "
+            f"盈亏因子{result['profit_factor']:5.2f} 回撤{result['max_drawdown_percent']:5.1f}% "
+            f"交易{result['trades']:>5} | EMA {result['fast']}/{result['slow']} "
+            f"RSI{result['rsi_period']} {result['oversold']}/{result['overbought']} "
+            f"建议阈值{result['weak']}/{result['strong']} 止损{result['stop_distance']}% "
+            f"盈亏比{result['risk_reward']} 自动计划{result['auto_plan_threshold']}%")
+
+
+def main(argv=None):
+    from .cache import CandleCache
+
+    parser = argparse.ArgumentParser(description="交易参数扫描")
+    parser.add_argument("--db", required=True, help="K线缓存SQLite文件")
+    parser.add_argument("--pair", default="ETH_USDT")
+    parser.add_argument("--base", default="1m", choices=list(TIMEFRAMES), help="基础周期，高周期由其合成")
+    parser.add_argument("--days", type=float, help="只使用最近N天")
+    parser.add_argument("--random", type=int, default=10000, help="随机搜索的组合数")
+    parser.add_argument("--grid", action="store_true", help="网格搜索全部组合（数量很大）")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, help="进程数，默认为CPU核数")
+    parser.add_argument("--capital", type=float, default=5000.0)
+    parser.add_argument("--max-hold", type=float, default=DEFAULT_MAX_HOLD / 3600, help="最长持仓（小时）")
+    parser.add_argument("--fee-rate", type=float, default=0.0, help="单边手续费率，如0.001")
+    parser.add_argument("--objective", default="total_pnl", choices=OBJECTIVES)
+    parser.add_argument("--min-trades", type=int, default=10)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="全部结果保存为CSV")
+    args = parser.parse_args(argv)
+
+    cache = CandleCache(args.db)
+    start = time.time() - args.days * 86400 if args.days else None
+    rows = cache.load(args.pair, args.base, start=start)
+    cache.close()
+    if len(rows) < MIN_CANDLES:
+        print(f"❌ 缓存中{args.pair} {args.base}数据不足: {len(rows)}条")
+        return 1
+
+    if args.grid:
+        configs = grid_configs(DEFAULT_SPACE)
+    else:
+        configs = random_configs(DEFAULT_SPACE, args.random, args.seed)
+
+    began = time.perf_counter()
+    results = run_sweep(rows, configs, args.base, capital=args.capital, max_hold=args.max_hold * 3600,
+                        fee_rate=args.fee_rate, workers=args.workers)
+    ranked = rank_results(results, args.objective, args.min_trades)
+
+    print(f"【🏆 前{min(args.top, len(ranked))}名 ({args.objective})】")
+    for rank, result in enumerate(ranked[:args.top], 1):
+        print(format_result(rank, result))
+    print(f"耗时: {time.perf_counter() - began:.1f}秒")
+
+    if args.output:
+        write_results(args.output, ranked)
+        print(f"✅ 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
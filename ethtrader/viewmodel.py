@@ -0,0 +1,116 @@
+"""
+界面视图模型
+工作线程把分析快照转换为 {(控件名, 属性): 值} 的视图模型并发布，
+界面线程每帧最多取一次，只应用与上次渲染不同的属性（控件名 app 表示应用自身的状态）
+"""
+
+import threading
+
+PRICE_UP_COLOR = (0, 1, 0, 1)
+PRICE_DOWN_COLOR = (1, 0, 0, 1)
+PRICE_FLAT_COLOR = (0.8, 0.8, 0.8, 1)
+
+
+def price_view(price, change):
+    """价格区域的视图模型"""
+    if change > 0:
+        color = PRICE_UP_COLOR
+    elif change < 0:
+        color = PRICE_DOWN_COLOR
+    else:
+        color = PRICE_FLAT_COLOR
+    return {
+        ("app", "current_price"): price,
+        ("app", "price_change"): change,
+        ("price_label", "text"): f"${price:.2f}",
+        ("change_label", "text"): f"{change:+.2f}%",
+        ("change_label", "color"): color
+    }
+
+
+def snapshot_view(snapshot):
+    """分析快照的视图模型"""
+    # 分析模块（NumPy）在首次分析时才加载，价格视图不依赖它
+    from .engine import TIMEFRAMES
+
+    view = {}
+
+    price_data = snapshot["price"]
+    if price_data:
+        view.update(price_view(price_data['price'], price_data['change']))
+
+    for tf_key, result in snapshot["timeframes"].items():
+        tf_name = TIMEFRAMES[tf_key]
+        view[(f"{tf_name}_price", "text")] = f"${result['price']:.2f}"
+        view[(f"{tf_name}_signal", "text")] = result['signal']
+        view[(f"{tf_name}_signal", "color")] = tuple(result['color'])
+
+    if snapshot.get("atr") is not None:
+        view[("app", "atr")] = snapshot["atr"]
+
+    overall = snapshot["overall"]
+    if overall:
+        direction = overall["direction"]
+        view[("direction_label", "text")] = direction
+        view[("direction_label", "color")] = tuple(overall["color"])
+        view[("confidence_label", "text")] = f'置信度: {overall["confidence"]:.0f}%'
+        view[("reason_label", "text")] = overall["reason"]
+        view[("status_label", "text")] = f'✅ 分析完成 - {direction.split("建议")[-1]}'
+
+    return view
+
+
+def paper_view(status):
+    """模拟账户状态的视图模型"""
+    unrealized = status["unrealized"]
+    return {
+        ("paper_label", "text"): f"📝 模拟权益 ${status['equity']:.2f}  浮盈 ${unrealized:+.2f}  "
+                                 f"持仓 {status['open_positions']}",
+        ("paper_label", "color"): PRICE_UP_COLOR if unrealized > 0 else PRICE_DOWN_COLOR if unrealized < 0
+        else PRICE_FLAT_COLOR
+    }
+
+
+class ViewState:
+    """
+    线程安全的视图模型合并与比对
+    publish可在任意线程调用，新发布的值覆盖尚未渲染的旧值；
+    带时间戳的发布早于已接受的最新时间时整体丢弃，避免旧周期的结果覆盖新状态
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._rendered = {}
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def publish(self, view, stamp=None):
+        """
+        合并一份视图模型
+        返回True表示此前没有待渲染的内容，调用方需安排一次渲染
+        """
+        with self._lock:
+            if stamp is not None:
+                if self._latest is not None and stamp < self._latest:
+                    return False
+                self._latest = stamp
+
+            schedule = not self._pending
+            self._pending.update(view)
+            return schedule and bool(self._pending)
+
+    def take(self):
+        """取出与上次渲染不同的属性 {(控件名, 属性): 值}，并记为已渲染"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        changes = {key: value for key, value in pending.items() if self._rendered.get(key) != value}
+        self._rendered.update(changes)
+        return changes
+
+    def widget_values(self, name):
+        """某个控件最近一次渲染的全部属性 {属性: 值}"""
+        return {prop: value for (widget, prop), value in self._rendered.items() if widget == name}
+
+    def value(self, key, default=None):
+        """最近一次渲染的值"""
+        return self._rendered.get(key, default)
@@ -0,0 +1,202 @@
+"""
+Gate.io v4现货WebSocket推送
+订阅 spot.tickers、spot.candlesticks 和 spot.order_book_update，断线后自动重连并重新订阅
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+try:
+    import websockets
+except ImportError:  # 未安装时仅推送模式不可用
+    websockets = None
+
+WS_URL = "wss://api.gateio.ws/ws/v4/"
+
+# 订单簿增量推送间隔
+ORDER_BOOK_INTERVAL = "100ms"
+
+
+def parse_ticker(result):
+    """解析 spot.tickers 推送"""
+    return {
+        "price": float(result["last"]),
+        "change": float(result["change_percentage"])
+    }
+
+
+def parse_candle(result):
+    """
+    解析 spot.candlesticks 推送
+    返回 (周期, (时间戳, 开, 高, 低, 收, 成交量))，成交量为基础币种
+    """
+    interval = result["n"].split("_", 1)[0]
+    close = float(result["c"])
+    if "a" in result:
+        volume = float(result["a"])
+    else:
+        volume = float(result["v"]) / close if close else 0.0
+    row = (int(float(result["t"])), float(result["o"]), float(result["h"]),
+           float(result["l"]), close, volume)
+    return interval, row
+
+
+class GateFeed:
+    """在独立线程中运行asyncio循环，将推送转交给回调函数"""
+
+    def __init__(self, currency_pair, intervals, on_ticker=None, on_candle=None,
+                 on_connect=None, on_order_book=None, url=WS_URL, log=None,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, ping_interval=15):
+        self.currency_pair = currency_pair
+        self.intervals = list(intervals)
+        self.on_ticker = on_ticker
+        self.on_candle = on_candle
+        self.on_connect = on_connect
+        self.on_order_book = on_order_book
+        self.url = url
+        self.log = log or print
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.ping_interval = ping_interval
+
+        self.connected = False
+        self.connections = 0
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动推送线程"""
+        if websockets is None:
+            raise RuntimeError("未安装websockets，无法使用推送模式")
+        if self.running:
+            return
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._thread_main, name="ethtrader-ws", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止推送并等待线程退出"""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._request_stop)
+        self._thread.join(timeout)
+
+    def _request_stop(self):
+        self._stopping.set()
+
+    def _thread_main(self):
+        asyncio.set_event_loop(self._loop)
+        # 在循环所属线程中创建，兼容Python 3.9
+        self._stopping = asyncio.Event()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    def subscriptions(self):
+        """订阅消息列表"""
+        now = int(time.time())
+        messages = []
+        if self.on_ticker:
+            messages.append({
+                "time": now,
+                "channel": "spot.tickers",
+                "event": "subscribe",
+                "payload": [self.currency_pair]
+            })
+        for interval in self.intervals:
+            messages.append({
+                "time": now,
+                "channel": "spot.candlesticks",
+                "event": "subscribe",
+                "payload": [interval, self.currency_pair]
+            })
+        if self.on_order_book:
+            messages.append({
+                "time": now,
+                "channel": "spot.order_book_update",
+                "event": "subscribe",
+                "payload": [self.currency_pair, ORDER_BOOK_INTERVAL]
+            })
+        return messages
+
+    async def _run(self):
+        """连接循环，异常断开后指数退避重连"""
+        delay = self.reconnect_delay
+
+        while not self._stopping.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=self.ping_interval,
+                                              open_timeout=10) as ws:
+                    for message in self.subscriptions():
+                        await ws.send(json.dumps(message))
+
+                    self.connected = True
+                    self.connections += 1
+                    delay = self.reconnect_delay
+                    self.log("✅ 推送已连接" if self.connections == 1 else "🔄 推送已重连")
+                    if self.on_connect:
+                        await self._loop.run_in_executor(None, self.on_connect)
+
+                    await self._read(ws)
+
+            except Exception as e:
+                if not self._stopping.is_set():
+                    self.log(f"❌ 推送断开: {str(e)}")
+            finally:
+                self.connected = False
+
+            if self._stopping.is_set():
+                break
+
+            # 等待重连，期间可被stop立即打断
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _read(self, ws):
+        """读取推送直到连接关闭或停止"""
+        stop_task = asyncio.ensure_future(self._stopping.wait())
+        try:
+            while True:
+                recv_task = asyncio.ensure_future(ws.recv())
+                done, _ = await asyncio.wait({recv_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                if stop_task in done:
+                    recv_task.cancel()
+                    await ws.close()
+                    return
+                raw = recv_task.result()
+                try:
+                    self.handle_message(raw)
+                except Exception as e:
+                    self.log(f"❌ 推送数据错误: {str(e)}")
+        finally:
+            stop_task.cancel()
+
+    def handle_message(self, raw):
+        """分发一条推送消息"""
+        message = json.loads(raw)
+        if message.get("event") != "update":
+            if message.get("error"):
+                self.log(f"❌ 推送错误: {message['error']}")
+            return
+
+        channel = message.get("channel")
+        result = message.get("result")
+
+        if channel == "spot.tickers" and self.on_ticker:
+            self.on_ticker(parse_ticker(result))
+        elif channel == "spot.candlesticks" and self.on_candle:
+            self.on_candle(*parse_candle(result))
+        elif channel == "spot.order_book_update" and self.on_order_book:
+            self.on_order_book(result)
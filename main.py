@@ -6,49 +6,60 @@ ETH多时间框架实时监控交易系统 v5.1 安卓版
 import kivy
 kivy.require('2.0.0')
 
+# 启动时只导入监控页用到的控件，其余控件和分析模块（NumPy、requests）在首次使用时导入
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from kivy.uix.textinput import TextInput
-from kivy.uix.togglebutton import ToggleButton
-from kivy.uix.dropdown import DropDown
-from kivy.uix.spinner import Spinner
-from kivy.uix.popup import Popup
-from kivy.uix.progressbar import ProgressBar
-from kivy.uix.switch import Switch
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
-from kivy.core.window import Window
 from kivy.clock import Clock
 from kivy.graphics import Color, Rectangle
-from kivy.uix.image import Image
-from kivy.uix.stacklayout import StackLayout
 from kivy.metrics import dp
+from kivy.utils import platform
 
-import requests
-import threading
-import time
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import random
-import numpy as np
-import json
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置窗口大小适合手机
-Window.size = (360, 640)
+from ethtrader.logsink import LogSink
+from ethtrader.metrics import metrics
+from ethtrader.viewmodel import ViewState, paper_view, price_view, snapshot_view
+
+# 桌面调试时使用手机大小的窗口，手机上保持全屏
+if platform not in ('android', 'ios'):
+    from kivy.core.window import Window
+    Window.size = (360, 640)
+
+CURRENCY_PAIR = 'ETH_USDT'
+
+# 修改后需重新编译提醒规则的参数
+ALERT_PARAMS = ('auto_plan_threshold', 'alert_prices', 'alert_rsi_count')
+
+# 允许清空的参数（清空表示关闭）
+OPTIONAL_PARAMS = ALERT_PARAMS + ('server_url',)
+
+# 价格刷新频率选项（秒），K线按各周期收盘时间同步
+REFRESH_INTERVALS = {'30秒': 30, '60秒': 60, '2分钟': 120, '5分钟': 300}
 
 class ETHTraderApp(App):
     def build(self):
         self.title = "ETH交易助手 v5.1"
+        
+        # 日志：界面只显示最近的行，完整历史写入滚动文件（日志页首次打开时创建显示控件）
+        self.log_text = None
+        self.log_sink = LogSink(os.path.join(self.user_data_dir, 'ethtrader.log'))
+        self.log_message("ETH交易助手 v5.1 安卓版 启动")
         self.root_layout = BoxLayout(orientation='vertical', spacing=dp(5), padding=dp(10))
         
         # 设置背景颜色
         with self.root_layout.canvas.before:
             Color(0.1, 0.1, 0.2, 1)  # 深蓝色背景
-            self.rect = Rectangle(size=Window.size, pos=self.root_layout.pos)
+            self.rect = Rectangle(size=self.root_layout.size, pos=self.root_layout.pos)
+        self.root_layout.bind(size=self.update_background, pos=self.update_background)
         
         # 创建顶部标题栏
         header = BoxLayout(size_hint=(1, 0.1), orientation='horizontal')
@@ -59,35 +70,39 @@ class ETHTraderApp(App):
         # 创建标签页
         self.tabs = TabbedPanel(do_default_tab=False, size_hint=(1, 0.9))
         
-        # 标签1: 实时监控
+        # 初始化变量
+        self.current_price = 0
+        self.price_change = 0
+        self.atr = None
+        self.monitoring = False
+        self.api_working = False
+        self.auto_scan = False
+        self.push_mode = False
+        self.paper_mode = False
+        self.price_interval = REFRESH_INTERVALS['60秒']
+        
+        # 视图模型：工作线程发布，界面每帧最多渲染一次变化的属性
+        self.view_state = ViewState()
+        self.view_widgets = {'app': self}
+        
+        # 标签1: 实时监控（启动时创建）
         tab1 = TabbedPanelItem(text='📈 实时监控')
         self.setup_monitoring_tab(tab1)
         self.tabs.add_widget(tab1)
         
-        # 标签2: 交易参数
-        tab2 = TabbedPanelItem(text='⚙️ 交易设置')
-        self.setup_settings_tab(tab2)
-        self.tabs.add_widget(tab2)
-        
-        # 标签3: 交易计划
-        tab3 = TabbedPanelItem(text='📋 交易计划')
-        self.setup_plan_tab(tab3)
-        self.tabs.add_widget(tab3)
-        
-        # 标签4: 日志
-        tab4 = TabbedPanelItem(text='📝 日志')
-        self.setup_log_tab(tab4)
-        self.tabs.add_widget(tab4)
+        # 标签2-5: 交易设置、交易计划、市场扫描、日志，首次切换到时创建
+        self.tab_builders = {}
+        for text, setup in (('⚙️ 交易设置', self.setup_settings_tab),
+                            ('📋 交易计划', self.setup_plan_tab),
+                            ('🔍 市场扫描', self.setup_scan_tab),
+                            ('📝 日志', self.setup_log_tab)):
+            tab = TabbedPanelItem(text=text)
+            self.tab_builders[tab] = setup
+            self.tabs.add_widget(tab)
+        self.tabs.bind(current_tab=self.on_tab_switch)
         
         self.root_layout.add_widget(self.tabs)
         
-        # 初始化变量
-        self.current_price = 0
-        self.price_change = 0
-        self.monitoring = False
-        self.api_working = False
-        self.base_url = "https://api.gateio.ws/api/v4"
-        
         # 交易参数默认值
         self.trade_params = {
             'capital': '5000',
@@ -95,19 +110,61 @@ class ETHTraderApp(App):
             'risk_percent': '1',
             'stop_distance': '2.0',
             'risk_reward': '1.5',
-            'auto_plan_threshold': '85'
+            'atr_multiple': '0',
+            'auto_plan_threshold': '85',
+            'alert_prices': '',
+            'alert_rsi_count': '3',
+            'server_url': ''
         }
         
-        # 数据存储
-        self.price_histories = {
-            "1m": [], "5m": [], "15m": [], "1h": [], "4h": []
-        }
+        # 分析引擎、K线缓存、调度器、提醒规则和模拟账户在后台加载（见 load_core），加载完成前为None
+        self.engine = None
+        self.cache = None
+        self.scheduler = None
+        self.alerts = None
+        self.paper = None
+        self.last_frame = None
+        
+        # 多交易对扫描器（随分析模块加载）
+        self.scanner = None
+        
+        # 分析服务订阅（设置了服务地址时开始监控即改为订阅，见 ethtrader.server）
+        self.remote_feed = None
         
-        # 启动初始化
-        Clock.schedule_once(self.initialize_app, 1)
+        # 后台任务线程池（有界，退出时统一关闭）
+        self.workers = ThreadPoolExecutor(max_workers=3, thread_name_prefix='ethtrader-ui')
+        
+        # 启动初始化（首帧显示后立即开始）
+        Clock.schedule_once(self.initialize_app, 0)
         
         return self.root_layout
     
+    def update_background(self, instance, value):
+        """背景随布局大小变化"""
+        self.rect.size = instance.size
+        self.rect.pos = instance.pos
+    
+    def on_tab_switch(self, panel, tab):
+        """首次切换到标签页时创建其内容"""
+        setup = self.tab_builders.pop(tab, None)
+        if setup is not None:
+            with metrics.span("ui", op="tab"):
+                setup(tab)
+    
+    def register_widgets(self, **widgets):
+        """登记延迟创建的控件，并应用其已发布的视图属性"""
+        self.view_widgets.update(widgets)
+        for name, widget in widgets.items():
+            for prop, value in self.view_state.widget_values(name).items():
+                setattr(widget, prop, value)
+    
+    def require_core(self):
+        """分析模块尚未加载完成时提示并返回False"""
+        if self.engine is None:
+            self.show_popup("提示", "正在加载分析模块，请稍候")
+            return False
+        return True
+    
     def setup_monitoring_tab(self, tab):
         """设置监控标签页"""
         layout = ScrollView(size_hint=(1, 1))
@@ -128,9 +185,10 @@ class ETHTraderApp(App):
         
         # 控制按钮
         btn_box = BoxLayout(size_hint=(1, None), height=dp(40))
-        self.start_btn = Button(text='▶️ 开始监控', on_press=self.start_monitoring)
-        self.stop_btn = Button(text='⏸️ 暂停', on_press=self.stop_monitoring)
-        self.refresh_btn = Button(text='🔄 刷新', on_press=self.manual_refresh)
+        # 分析模块加载完成前不可用
+        self.start_btn = Button(text='▶️ 开始监控', on_press=self.start_monitoring, disabled=True)
+        self.stop_btn = Button(text='⏸️ 暂停', on_press=self.stop_monitoring, disabled=True)
+        self.refresh_btn = Button(text='🔄 刷新', on_press=self.manual_refresh, disabled=True)
         
         btn_box.add_widget(self.start_btn)
         btn_box.add_widget(self.stop_btn)
@@ -170,9 +228,17 @@ class ETHTraderApp(App):
         
         layout.add_widget(content)
         tab.add_widget(layout)
+        
+        self.register_widgets(price_label=self.price_label, change_label=self.change_label,
+                              direction_label=self.direction_label, confidence_label=self.confidence_label,
+                              reason_label=self.reason_label, **self.signal_labels)
     
     def setup_settings_tab(self, tab):
         """设置交易参数标签页"""
+        from kivy.uix.spinner import Spinner
+        from kivy.uix.switch import Switch
+        from kivy.uix.textinput import TextInput
+        
         layout = ScrollView(size_hint=(1, 1))
         content = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None)
         content.bind(minimum_height=content.setter('height'))
@@ -186,7 +252,11 @@ class ETHTraderApp(App):
             ("🛡️ 单笔风险 (%):", "risk_percent", "1"),
             ("📉 止损距离 (%):", "stop_distance", "2.0"),
             ("📈 盈亏比:", "risk_reward", "1.5"),
+            ("🌊 ATR止损倍数 (0=按%):", "atr_multiple", "0"),
             ("🔔 自动计划阈值 (%):", "auto_plan_threshold", "85"),
+            ("🎯 价格提醒 (逗号分隔):", "alert_prices", ""),
+            ("📶 RSI极值周期数 (0=关闭):", "alert_rsi_count", "3"),
+            ("🖥️ 分析服务 (ws://主机:端口/):", "server_url", ""),
         ]
         
         self.param_inputs = {}
@@ -195,8 +265,8 @@ class ETHTraderApp(App):
             param_box = BoxLayout(orientation='horizontal', size_hint=(1, None), height=dp(50))
             param_box.add_widget(Label(text=label_text, font_size='14sp', color=(1, 1, 1, 1), size_hint_x=0.6))
             
-            input_field = TextInput(text=default, multiline=False, font_size='14sp', 
-                                   size_hint_x=0.4, background_color=(0.2, 0.2, 0.3, 1),
+            input_field = TextInput(text=self.trade_params.get(key, default), multiline=False,
+                                   font_size='14sp', size_hint_x=0.4, background_color=(0.2, 0.2, 0.3, 1),
                                    foreground_color=(1, 1, 1, 1))
             input_field.bind(text=self.on_param_change)
             param_box.add_widget(input_field)
@@ -214,16 +284,47 @@ class ETHTraderApp(App):
         
         content.add_widget(auto_box)
         
+        # 推送模式开关
+        push_box = BoxLayout(orientation='horizontal', size_hint=(1, None), height=dp(50))
+        push_box.add_widget(Label(text='⚡ 实时推送:', font_size='14sp', color=(1, 1, 1, 1)))
+        
+        self.push_switch = Switch(active=self.push_mode)
+        self.push_switch.bind(active=self.on_push_switch)
+        push_box.add_widget(self.push_switch)
+        
+        content.add_widget(push_box)
+        
+        # 性能统计开关
+        metrics_box = BoxLayout(orientation='horizontal', size_hint=(1, None), height=dp(50))
+        metrics_box.add_widget(Label(text='🐞 性能统计:', font_size='14sp', color=(1, 1, 1, 1)))
+        
+        self.metrics_switch = Switch(active=metrics.enabled)
+        self.metrics_switch.bind(active=self.on_metrics_switch)
+        metrics_box.add_widget(self.metrics_switch)
+        
+        content.add_widget(metrics_box)
+        
+        # 模拟交易开关
+        paper_box = BoxLayout(orientation='horizontal', size_hint=(1, None), height=dp(50))
+        paper_box.add_widget(Label(text='📝 模拟交易:', font_size='14sp', color=(1, 1, 1, 1)))
+        
+        self.paper_switch = Switch(active=self.paper_mode)
+        self.paper_switch.bind(active=self.on_paper_switch)
+        paper_box.add_widget(self.paper_switch)
+        
+        content.add_widget(paper_box)
+        
         # 刷新频率选择
         freq_box = BoxLayout(orientation='horizontal', size_hint=(1, None), height=dp(50))
         freq_box.add_widget(Label(text='刷新频率:', font_size='14sp', color=(1, 1, 1, 1)))
         
         self.freq_spinner = Spinner(
-            text='60秒',
-            values=('30秒', '60秒', '2分钟', '5分钟'),
+            text=next(name for name, seconds in REFRESH_INTERVALS.items() if seconds == self.price_interval),
+            values=tuple(REFRESH_INTERVALS),
             size_hint=(None, None),
             size=(dp(100), dp(44))
         )
+        self.freq_spinner.bind(text=self.on_freq_change)
         freq_box.add_widget(self.freq_spinner)
         content.add_widget(freq_box)
         
@@ -238,9 +339,13 @@ class ETHTraderApp(App):
         
         layout.add_widget(content)
         tab.add_widget(layout)
+        
+        self.register_widgets(status_label=self.status_label)
     
     def setup_plan_tab(self, tab):
         """设置交易计划标签页"""
+        from kivy.uix.textinput import TextInput
+        
         layout = BoxLayout(orientation='vertical', spacing=dp(10))
         
         # 生成计划按钮
@@ -252,6 +357,17 @@ class ETHTraderApp(App):
                          size_hint=(1, 0.1))
         layout.add_widget(copy_btn)
         
+        # 模拟账户
+        paper_box = BoxLayout(orientation='horizontal', size_hint=(1, 0.1), spacing=dp(10))
+        paper_box.add_widget(Button(text='📝 模拟账户', on_press=self.show_paper))
+        paper_box.add_widget(Button(text='⏹️ 全部平仓', on_press=self.close_paper))
+        paper_box.add_widget(Button(text='🔄 重置账户', on_press=self.reset_paper))
+        layout.add_widget(paper_box)
+        
+        self.paper_label = Label(text='📝 模拟交易未开启', font_size='12sp', color=(0.8, 0.8, 0.8, 1),
+                                 size_hint=(1, 0.05))
+        layout.add_widget(self.paper_label)
+        
         # 计划显示区域
         self.plan_text = TextInput(text='请先生成交易计划...', readonly=True,
                                   font_size='12sp', background_color=(0.1, 0.1, 0.15, 1),
@@ -259,27 +375,65 @@ class ETHTraderApp(App):
         layout.add_widget(self.plan_text)
         
         tab.add_widget(layout)
+        
+        self.register_widgets(plan_text=self.plan_text, paper_label=self.paper_label)
+    
+    def setup_scan_tab(self, tab):
+        """设置市场扫描标签页"""
+        from kivy.uix.switch import Switch
+        from kivy.uix.textinput import TextInput
+        
+        layout = BoxLayout(orientation='vertical', spacing=dp(10))
+        
+        scan_btn = Button(text='🔍 扫描USDT交易对', on_press=self.manual_scan,
+                         size_hint=(1, 0.1))
+        layout.add_widget(scan_btn)
+        
+        # 监控时每轮一起扫描
+        scan_box = BoxLayout(orientation='horizontal', size_hint=(1, 0.1))
+        scan_box.add_widget(Label(text='🔁 监控时自动扫描:', font_size='14sp', color=(1, 1, 1, 1)))
+        self.scan_switch = Switch(active=self.auto_scan)
+        self.scan_switch.bind(active=self.on_scan_switch)
+        scan_box.add_widget(self.scan_switch)
+        layout.add_widget(scan_box)
+        
+        # 扫描结果
+        self.scan_text = TextInput(text='点击按钮扫描成交额前300的USDT交易对...', readonly=True,
+                                  font_size='11sp', background_color=(0.1, 0.1, 0.15, 1),
+                                  foreground_color=(1, 1, 1, 1))
+        layout.add_widget(self.scan_text)
+        
+        tab.add_widget(layout)
+        
+        self.register_widgets(scan_text=self.scan_text)
     
     def setup_log_tab(self, tab):
         """设置日志标签页"""
+        from kivy.uix.textinput import TextInput
+        
         layout = BoxLayout(orientation='vertical', spacing=dp(5))
         
         # 控制按钮
         log_btn_box = BoxLayout(size_hint=(1, 0.1))
         clear_btn = Button(text='🗑️ 清空日志', on_press=self.clear_log)
         export_btn = Button(text='📤 导出日志', on_press=self.export_log)
+        metrics_btn = Button(text='📊 性能统计', on_press=self.show_metrics)
         
         log_btn_box.add_widget(clear_btn)
         log_btn_box.add_widget(export_btn)
+        log_btn_box.add_widget(metrics_btn)
         layout.add_widget(log_btn_box)
         
         # 日志显示区域
-        self.log_text = TextInput(text='ETH交易助手 v5.1 安卓版 启动\n', readonly=True,
+        self.log_text = TextInput(text='', readonly=True,
                                  font_size='12sp', background_color=(0.1, 0.1, 0.15, 1),
                                  foreground_color=(0.9, 0.9, 0.9, 1))
         layout.add_widget(self.log_text)
         
         tab.add_widget(layout)
+        
+        # 显示创建之前积累的日志
+        self.flush_log(0)
     
     def on_param_change(self, instance, value):
         """参数改变时的处理"""
@@ -289,318 +443,129 @@ class ETHTraderApp(App):
                 param_name = key
                 break
         
-        if param_name and value:
+        # 提醒参数和服务地址允许清空
+        if param_name and (value or param_name in OPTIONAL_PARAMS):
             self.trade_params[param_name] = value
             self.log_message(f"参数更新: {param_name} = {value}")
+            if param_name in ALERT_PARAMS:
+                self.update_alert_rules()
     
     def initialize_app(self, dt):
         """初始化应用程序"""
         self.log_message("🎮 ETH交易助手 v5.1 安卓版启动")
         self.log_message("=" * 40)
+        self.workers.submit(self.startup)
+    
+    def startup(self):
+        """后台启动：HTTP客户端就绪后先取价格显示，同时在另一线程加载分析模块，完成后获取初始数据"""
+        from ethtrader.gateio import GateClient
         
-        # 测试API连接
-        threading.Thread(target=self.test_api).start()
-        
-        # 获取初始数据
-        threading.Thread(target=self.initial_data_fetch).start()
+        client = GateClient(log=self.log_message)
+        core = self.workers.submit(self.load_core, client)
+        self.test_api(client)
+        try:
+            core.result()
+        except Exception as e:
+            self.log_message(f"❌ 分析模块加载失败: {str(e)}")
+            return
+        self.initial_data_fetch()
+    
+    def load_core(self, client):
+        """导入分析模块（NumPy指标路径），创建K线缓存、调度器、提醒规则、模拟账户、扫描器和分析引擎"""
+        from ethtrader.alerts import AlertEngine
+        from ethtrader.cache import CandleCache
+        from ethtrader.engine import AnalysisEngine
+        from ethtrader.gateio import POOL_SIZE
+        from ethtrader.paper import PaperAccount
+        from ethtrader.scanner import MarketScanner
+        from ethtrader.scheduler import CandleScheduler
+        
+        # K线缓存在应用数据目录
+        self.cache = CandleCache(os.path.join(self.user_data_dir, 'candles.sqlite'))
+        
+        # 轮询调度：各周期收盘后同步K线，其间按刷新频率只更新价格
+        self.scheduler = CandleScheduler(self.run_cycle, price_interval=self.price_interval,
+                                         log=self.log_message)
+        
+        # 提醒规则：每次价格/分析更新及扫描后对监控的交易对批量求值
+        self.alerts = AlertEngine()
+        self.update_alert_rules()
+        
+        # 模拟交易账户：开启后生成的交易计划转为模拟持仓，每次价格更新匹配止损/止盈
+        self.paper = PaperAccount(self.trade_params['capital'], log=self.log_message)
+        
+        # 多交易对扫描器：与分析引擎共用客户端，两者的请求合计在同一限频内，熔断状态一致；并发数不超过连接池大小
+        self.scanner = MarketScanner(client=client, workers=POOL_SIZE, log=self.log_message)
+        
+        # 分析引擎（不依赖Kivy）最后创建，其余对象就绪后才可使用
+        self.engine = AnalysisEngine(client=client, currency_pair=CURRENCY_PAIR, log=self.log_message,
+                                     cache=self.cache)
+        Clock.schedule_once(self.on_core_ready, 0)
+    
+    def on_core_ready(self, dt):
+        """分析模块加载完成，启用监控按钮"""
+        self.start_btn.disabled = self.monitoring
+        self.stop_btn.disabled = not self.monitoring
+        self.refresh_btn.disabled = False
     
-    def test_api(self):
-        """测试API连接"""
+    def test_api(self, client):
+        """测试API连接并显示最新价格（只需HTTP客户端）"""
         try:
-            url = f"{self.base_url}/spot/tickers"
-            params = {"currency_pair": "ETH_USDT"}
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                self.api_working = True
-                self.log_message("✅ API连接成功")
-                Clock.schedule_once(lambda dt: setattr(self.status_label, 'text', '✅ API连接成功'), 0)
-            else:
-                self.api_working = False
-                self.log_message("❌ API连接失败")
+            ticker = client.tickers(CURRENCY_PAIR, timeout=10)[0]
+            self.publish_view(price_view(float(ticker["last"]), float(ticker["change_percentage"])))
         except Exception as e:
-            self.log_message(f"❌ API测试错误: {str(e)}")
-            self.api_working = False
+            self.log_message(f"❌ API连接失败: {str(e)}")
+            return
+        self.api_working = True
+        self.log_message(f"✅ API连接成功，价格: ${float(ticker['last']):.2f}")
+        self.publish_view({("status_label", "text"): '✅ API连接成功'})
     
     def initial_data_fetch(self):
         """获取初始数据"""
+        # 先用本地缓存立即给出信号
+        cached = self.engine.load_cache()
+        if cached:
+            self.apply_snapshot(self.engine.snapshot(log_always=True))
+        
         # 获取实时价格
-        price_data = self.get_real_time_price()
+        price_data = self.engine.get_real_time_price()
         if price_data:
-            Clock.schedule_once(lambda dt: self.update_price_display(price_data['price'], price_data['change']), 0)
+            self.publish_view(price_view(price_data['price'], price_data['change']))
             self.log_message(f"✅ 价格获取: ${price_data['price']:.2f}")
         
-        # 获取历史数据
-        self.fetch_history_data()
-    
-    def get_real_time_price(self):
-        """获取实时价格"""
-        try:
-            url = f"{self.base_url}/spot/tickers"
-            params = {"currency_pair": "ETH_USDT"}
-            
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                tickers = response.json()
-                if tickers and len(tickers) > 0:
-                    ticker = tickers[0]
-                    
-                    price = float(ticker["last"])
-                    change_percent = float(ticker["change_percentage"])
-                    
-                    return {"price": price, "change": change_percent}
-            
-            return None
-            
-        except Exception as e:
-            self.log_message(f"价格获取错误: {str(e)}")
-            return None
-    
-    def fetch_history_data(self):
-        """获取历史数据"""
-        timeframes = {
-            "1m": {"interval": "1m", "limit": 100},
-            "5m": {"interval": "5m", "limit": 100},
-            "15m": {"interval": "15m", "limit": 100},
-            "1h": {"interval": "1h", "limit": 100},
-            "4h": {"interval": "4h", "limit": 100}
-        }
-        
-        for tf_key, params in timeframes.items():
-            try:
-                url = f"{self.base_url}/spot/candlesticks"
-                
-                params_dict = {
-                    "currency_pair": "ETH_USDT",
-                    "interval": params["interval"],
-                    "limit": params["limit"]
-                }
-                
-                response = requests.get(url, params=params_dict, timeout=10)
-                
-                if response.status_code == 200:
-                    candles = response.json()
-                    
-                    if candles and len(candles) > 0:
-                        candles.sort(key=lambda x: float(x[0]))
-                        prices = [float(candle[2]) for candle in candles]
-                        
-                        if prices:
-                            self.price_histories[tf_key] = prices
-                            
-                            tf_name = {"1m": "1分钟", "5m": "5分钟", "15m": "15分钟",
-                                      "1h": "1小时", "4h": "4小时"}[tf_key]
-                            self.log_message(f"✅ {tf_name}数据: {len(prices)}条")
-            except Exception as e:
-                self.log_message(f"❌ {tf_key}数据错误: {str(e)}")
-    
-    def calculate_ema(self, prices, period):
-        """计算指数移动平均线"""
-        if len(prices) < period:
-            return prices[-1] if prices else 0
-        
-        prices_array = np.array(prices[-period*3:])
-        multiplier = 2 / (period + 1)
-        
-        sma = np.mean(prices_array[:period])
-        ema = sma
-        
-        for price in prices_array[period:]:
-            ema = (price - ema) * multiplier + ema
-        
-        return float(ema)
-    
-    def calculate_rsi(self, prices, period=14):
-        """计算RSI指标"""
-        if len(prices) < period + 1:
-            return 50
-        
-        deltas = np.diff(prices[-period-1:])
-        seed = deltas[:period]
-        
-        up = seed[seed >= 0].sum() / period
-        down = -seed[seed < 0].sum() / period
-        
-        if down == 0:
-            return 100
-        
-        rs = up / down
-        rsi = 100 - (100 / (1 + rs))
-        
-        return float(rsi)
-    
-    def analyze_timeframe(self, tf_key, tf_name):
-        """分析单个时间框架"""
-        prices = self.price_histories[tf_key]
-        
-        if len(prices) < 25:
-            return {
-                "price": prices[-1] if prices else 0,
-                "signal": "等待",
-                "color": (0.8, 0.8, 0.8, 1),
-                "score": 0
-            }
-        
-        current_price = prices[-1]
-        
-        # 计算EMA
-        ema7 = self.calculate_ema(prices, 7)
-        ema25 = self.calculate_ema(prices, 25)
-        
-        # 计算RSI
-        rsi = self.calculate_rsi(prices, 14)
-        
-        # 计算信号分数
-        score = 0
-        
-        # EMA排列
-        if current_price > ema7 > ema25:
-            score += 2
-        elif current_price < ema7 < ema25:
-            score -= 2
-        
-        # RSI信号
-        if rsi > 70:
-            score -= 1.5
-        elif rsi < 30:
-            score += 1.5
-        
-        # 判断信号
-        if score >= 1.5:
-            signal = "强烈看多"
-            color = (0, 1, 0, 1)  # 绿色
-        elif score >= 0.5:
-            signal = "看多"
-            color = (0.5, 1, 0.5, 1)  # 浅绿色
-        elif score <= -1.5:
-            signal = "强烈看空"
-            color = (1, 0, 0, 1)  # 红色
-        elif score <= -0.5:
-            signal = "看空"
-            color = (1, 0.5, 0.5, 1)  # 浅红色
-        else:
-            signal = "中性"
-            color = (0.8, 0.8, 0.8, 1)  # 灰色
-        
-        return {
-            "price": current_price,
-            "signal": signal,
-            "color": color,
-            "score": score,
-            "rsi": rsi
-        }
+        # 获取历史数据（有缓存时只补齐缺失部分）
+        self.engine.fetch_history_data()
+        if cached:
+            self.apply_snapshot(self.engine.snapshot())
     
     def perform_analysis(self):
         """执行分析"""
-        try:
-            # 更新价格
-            price_data = self.get_real_time_price()
-            if price_data:
-                Clock.schedule_once(lambda dt: self.update_price_display(
-                    price_data['price'], price_data['change']), 0)
-            
-            # 分析每个时间框架
-            timeframe_map = {
-                "1m": "1分钟",
-                "5m": "5分钟", 
-                "15m": "15分钟",
-                "1h": "1小时",
-                "4h": "4小时"
-            }
-            
-            total_score = 0
-            timeframe_count = 0
-            signals_summary = {"看多": 0, "看空": 0, "中性": 0}
-            
-            for tf_key, tf_name in timeframe_map.items():
-                if len(self.price_histories[tf_key]) >= 25:
-                    result = self.analyze_timeframe(tf_key, tf_name)
-                    
-                    # 更新显示
-                    Clock.schedule_once(lambda dt, r=result, tn=tf_name: 
-                                       self.update_timeframe_display(tn, r), 0)
-                    
-                    signal_type = result["signal"]
-                    if "看多" in signal_type:
-                        signals_summary["看多"] += 1
-                    elif "看空" in signal_type:
-                        signals_summary["看空"] += 1
-                    else:
-                        signals_summary["中性"] += 1
-                    
-                    total_score += result["score"]
-                    timeframe_count += 1
-            
-            # 计算总体建议
-            if timeframe_count > 0:
-                avg_score = total_score / timeframe_count
-                
-                if avg_score > 1.5:
-                    direction = "强烈建议做多"
-                    strength = "强"
-                    direction_color = (0, 1, 0, 1)
-                    confidence = min(95, 75 + avg_score * 10)
-                elif avg_score > 0.8:
-                    direction = "建议做多"
-                    strength = "中"
-                    direction_color = (0.5, 1, 0.5, 1)
-                    confidence = min(85, 65 + avg_score * 10)
-                elif avg_score < -1.5:
-                    direction = "强烈建议做空"
-                    strength = "强"
-                    direction_color = (1, 0, 0, 1)
-                    confidence = min(95, 75 + abs(avg_score) * 10)
-                elif avg_score < -0.8:
-                    direction = "建议做空"
-                    strength = "中"
-                    direction_color = (1, 0.5, 0.5, 1)
-                    confidence = min(85, 65 + abs(avg_score) * 10)
-                else:
-                    direction = "建议观望"
-                    strength = "弱"
-                    direction_color = (0.8, 0.8, 0.8, 1)
-                    confidence = 40
-                
-                # 更新显示
-                Clock.schedule_once(lambda dt: setattr(self.direction_label, 'text', direction), 0)
-                Clock.schedule_once(lambda dt: setattr(self.direction_label, 'color', direction_color), 0)
-                Clock.schedule_once(lambda dt: setattr(self.confidence_label, 'text', f'置信度: {confidence:.0f}%'), 0)
-                
-                reason_text = f"看多:{signals_summary['看多']} 看空:{signals_summary['看空']} 中性:{signals_summary['中性']}"
-                Clock.schedule_once(lambda dt: setattr(self.reason_label, 'text', reason_text), 0)
-                
-                # 记录日志
-                log_msg = f"[{datetime.now().strftime('%H:%M:%S')}] {direction} | 置信度: {confidence:.0f}%"
-                self.log_message(log_msg)
-                
-                Clock.schedule_once(lambda dt: setattr(self.status_label, 'text', f'✅ 分析完成 - {direction.split("建议")[-1]}'), 0)
-            
-        except Exception as e:
-            self.log_message(f"分析错误: {str(e)}")
+        self.apply_snapshot(self.engine.perform_analysis())
     
-    def update_price_display(self, price, change):
-        """更新价格显示"""
-        self.current_price = price
-        self.price_change = change
-        
-        self.price_label.text = f"${price:.2f}"
-        
-        change_text = f"{change:+.2f}%"
-        self.change_label.text = change_text
-        
-        if change > 0:
-            self.change_label.color = (0, 1, 0, 1)
-        elif change < 0:
-            self.change_label.color = (1, 0, 0, 1)
-        else:
-            self.change_label.color = (0.8, 0.8, 0.8, 1)
+    def apply_snapshot(self, snapshot):
+        """将分析快照显示到界面并检查提醒（可在任意线程调用），早于已显示快照的结果丢弃"""
+        from ethtrader.alerts import snapshot_frame
+        
+        self.publish_view(snapshot_view(snapshot), snapshot["time"])
+        frame = snapshot_frame(CURRENCY_PAIR, snapshot)
+        if frame is not None:
+            self.last_frame = frame
+            self.fire_alerts(self.alerts.evaluate(frame))
+            self.paper_tick([(CURRENCY_PAIR, snapshot["price"]["price"])])
+    
+    def publish_view(self, view, stamp=None):
+        """发布视图模型（可在任意线程调用）"""
+        if self.view_state.publish(view, stamp):
+            Clock.schedule_once(self.render_view, 0)
     
-    def update_timeframe_display(self, tf_name, result):
-        """更新时间框架显示"""
-        self.signal_labels[f"{tf_name}_price"].text = f"${result['price']:.2f}"
-        self.signal_labels[f"{tf_name}_signal"].text = result['signal']
-        self.signal_labels[f"{tf_name}_signal"].color = result['color']
+    def render_view(self, dt):
+        """在一帧内应用自上次渲染以来变化的属性"""
+        with metrics.span("ui", op="render"):
+            for (name, prop), value in self.view_state.take().items():
+                # 尚未创建的控件在创建时应用（见 register_widgets）
+                widget = self.view_widgets.get(name)
+                if widget is not None:
+                    setattr(widget, prop, value)
     
     def start_monitoring(self, instance):
         """开始监控"""
@@ -611,40 +576,133 @@ class ETHTraderApp(App):
             
             self.log_message("✅ 监控已启动")
             
-            # 启动监控循环
-            threading.Thread(target=self.monitor_loop).start()
+            # 分析服务：由服务端统一获取行情和分析，本机只订阅快照，不再请求交易所
+            server_url = self.trade_params['server_url'].strip()
+            if server_url:
+                try:
+                    self.start_remote(server_url)
+                    return
+                except RuntimeError as e:
+                    self.log_message(f"❌ {str(e)}，改用本机分析")
+            
+            # 推送模式：WebSocket实时更新，不可用时退回轮询
+            if self.push_mode:
+                try:
+                    self.engine.start_stream(self.apply_snapshot)
+                    return
+                except RuntimeError as e:
+                    self.log_message(f"❌ {str(e)}，改用轮询")
+            
+            # 启动调度
+            self.scheduler.start()
     
     def stop_monitoring(self, instance):
         """停止监控"""
+        if self.engine is None:
+            return
         self.monitoring = False
         self.start_btn.disabled = False
         self.stop_btn.disabled = True
+        self.scheduler.stop()
+        # 在界面线程中解除推送和服务订阅，只把等待线程退出的stop交给线程池，
+        # 线程池繁忙时随后的“开始监控”不会被排队中的stop影响
+        stream = self.engine.detach_stream()
+        remote, self.remote_feed = self.remote_feed, None
+        for feed in (stream, remote):
+            if feed is not None:
+                self.workers.submit(feed.stop)
         self.log_message("⏸️ 监控已暂停")
     
-    def monitor_loop(self):
-        """监控循环"""
-        while self.monitoring:
-            self.perform_analysis()
-            
-            # 获取频率设置
-            freq_text = self.freq_spinner.text
-            if freq_text == '30秒':
-                sleep_time = 30
-            elif freq_text == '60秒':
-                sleep_time = 60
-            elif freq_text == '2分钟':
-                sleep_time = 120
-            elif freq_text == '5分钟':
-                sleep_time = 300
-            else:
-                sleep_time = 60
-            
-            time.sleep(sleep_time)
+    def start_remote(self, url):
+        """订阅分析服务的快照推送"""
+        from ethtrader.server import SnapshotFeed
+        
+        def on_snapshot(pair, snapshot):
+            # 已解除的订阅在线程退出前仍可能收到推送，丢弃
+            if feed is self.remote_feed and pair == CURRENCY_PAIR:
+                self.apply_snapshot(snapshot)
+        
+        feed = SnapshotFeed(url, [CURRENCY_PAIR], on_snapshot, log=self.log_message)
+        self.remote_feed = feed
+        try:
+            feed.start()
+        except RuntimeError:
+            self.remote_feed = None
+            raise
+        self.log_message(f"🖥️ 使用分析服务: {url}")
+    
+    def stop_remote(self):
+        """停止订阅分析服务"""
+        feed, self.remote_feed = self.remote_feed, None
+        if feed is not None:
+            feed.stop()
+    
+    def run_cycle(self, due):
+        """调度线程中执行一轮：同步到期周期的K线（为空时只更新价格）并分析"""
+        self.apply_snapshot(self.engine.perform_analysis(due))
+        if self.auto_scan:
+            self.run_scan()
+    
+    def on_freq_change(self, instance, value):
+        """刷新频率改变时通知调度器（在界面线程中调用）"""
+        self.price_interval = REFRESH_INTERVALS.get(value, 60)
+        if self.scheduler is not None:
+            self.scheduler.set_price_interval(self.price_interval)
+        self.log_message(f"⏱️ 刷新频率: {value}")
+    
+    def on_push_switch(self, instance, value):
+        """切换推送模式（下次开始监控时生效）"""
+        self.push_mode = value
+    
+    def on_scan_switch(self, instance, value):
+        """切换监控时自动扫描"""
+        self.auto_scan = value
     
     def manual_refresh(self, instance):
         """手动刷新"""
+        if self.remote_feed is not None:
+            self.log_message("🖥️ 正在使用分析服务，数据随推送更新")
+            return
         self.log_message("🔄 手动刷新数据...")
-        threading.Thread(target=self.perform_analysis).start()
+        self.workers.submit(self.perform_analysis)
+    
+    def manual_scan(self, instance):
+        """手动扫描"""
+        if not self.require_core():
+            return
+        self.log_message("🔍 开始扫描市场...")
+        self.workers.submit(self.run_scan)
+    
+    def run_scan(self):
+        """扫描全部USDT交易对并显示排行"""
+        from ethtrader.alerts import scan_frame
+        from ethtrader.scanner import format_ranking
+        
+        # 自动扫描（调度线程）和手动扫描（线程池）可能同时触发，已有扫描进行时跳过
+        try:
+            results = self.scanner.scan(wait=False)
+        except Exception as e:
+            self.log_message(f"❌ 扫描错误: {str(e)}")
+            return
+        if results is None:
+            self.log_message("⏳ 上一轮扫描尚未完成，跳过")
+            return
+        self.publish_view({("scan_text", "text"): format_ranking(results, top=30)})
+        self.fire_alerts(self.alerts.evaluate(scan_frame(results)))
+        self.paper_tick([(result["pair"], result["price"]) for result in results])
+    
+    def on_stop(self):
+        """退出时停止监控并释放线程池和连接"""
+        self.monitoring = False
+        self.workers.shutdown(wait=False, cancel_futures=True)
+        self.stop_remote()
+        if self.engine is not None:
+            self.scheduler.stop()
+            self.engine.close()
+            self.cache.close()
+        if self.scanner is not None:
+            self.scanner.close()
+        self.log_sink.close()
     
     def toggle_auto_refresh(self, instance, value):
         """切换自动刷新"""
@@ -665,62 +723,31 @@ class ETHTraderApp(App):
             confidence = float(confidence_text) if confidence_text.replace('.', '').isdigit() else 0
             
             if "观望" in direction or confidence < 50:
-                self.plan_text.text = "【⚠️ 交易建议】\n当前信号不明确，不建议交易。\n建议等待更强信号出现。"
+                self.show_plan("【⚠️ 交易建议】\n当前信号不明确，不建议交易。\n建议等待更强信号出现。")
+                return
+            
+            if not self.require_core():
                 return
             
             # 生成交易计划
             plan = self.create_trade_plan(direction, confidence, self.current_price)
-            self.plan_text.text = plan
+            self.show_plan(plan)
             self.log_message("📋 交易计划已生成")
+            self.paper_open(direction, confidence, self.current_price, self.atr)
             
         except Exception as e:
             self.show_popup("错误", f"生成计划错误: {str(e)}")
     
-    def create_trade_plan(self, direction, confidence, price):
-        """创建交易计划"""
-        try:
-            # 获取参数
-            stop_distance = float(self.trade_params.get('stop_distance', 2.0))
-            risk_reward = float(self.trade_params.get('risk_reward', 1.5))
-            capital = float(self.trade_params.get('capital', 5000))
-            risk_percent = float(self.trade_params.get('risk_percent', 1))
-            
-            if "做多" in direction:
-                action = "买入做多"
-                stop_loss = price * (1 - stop_distance/100)
-                take_profit = price * (1 + stop_distance/100 * risk_reward)
-            else:
-                action = "卖出做空"
-                stop_loss = price * (1 + stop_distance/100)
-                take_profit = price * (1 - stop_distance/100 * risk_reward)
-            
-            # 计算仓位
-            risk_amount = capital * (risk_percent / 100)
-            price_risk = abs(price - stop_loss)
-            contract_amount = risk_amount / price_risk if price_risk > 0 else 0
-            
-            plan = f"""【📋 交易计划】
-ETH价格: ${price:.2f}
-信号: {direction}
-置信度: {confidence:.0f}%
-
-🎯 交易方向: {action}
-入场价: ${price:.2f}
-止损: ${stop_loss:.2f}
-止盈: ${take_profit:.2f}
-
-💰 资金管理
-本金: ${capital:.2f}
-单笔风险: ${risk_amount:.2f} ({risk_percent}%)
-合约数: {contract_amount:.4f} ETH
-
-⏰ 建议持仓: 2-4小时
-⚠️ 风险提示: 市场有风险"""
-            
-            return plan
-            
-        except Exception as e:
-            return f"生成计划错误: {str(e)}"
+    def create_trade_plan(self, direction, confidence, price, atr=None, pair=CURRENCY_PAIR):
+        """创建交易计划，atr为空时使用最近一次分析的ATR；推送模式下本交易对的计划附带盘口流动性"""
+        from ethtrader.engine import create_trade_plan
+        book = self.engine.order_book if self.engine and pair == CURRENCY_PAIR else None
+        return create_trade_plan(direction, confidence, price, self.trade_params,
+                                 self.atr if atr is None else atr, book)
+    
+    def show_plan(self, text):
+        """显示交易计划文本（可在任意线程调用，计划页未创建时在创建后显示）"""
+        self.publish_view({("plan_text", "text"): text})
     
     def copy_plan(self, instance):
         """复制计划"""
@@ -736,28 +763,212 @@ ETH价格: ${price:.2f}
     
     def clear_log(self, instance):
         """清空日志"""
-        self.log_text.text = "日志已清空\n"
+        self.log_sink.clear()
         self.log_message("✅ 日志已清空")
     
+    def export_dir(self):
+        """导出目录：安卓上为应用的外部文件目录（文件管理器可见，无需存储权限）"""
+        if platform == 'android':
+            try:
+                from jnius import autoclass
+                activity = autoclass('org.kivy.android.PythonActivity').mActivity
+                return activity.getExternalFilesDir(None).getAbsolutePath()
+            except Exception:
+                pass
+        return self.user_data_dir
+    
     def export_log(self, instance):
         """导出日志"""
-        self.show_popup("提示", "在安卓设备上，请使用分享功能导出日志")
+        stem = f"ethtrader_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        path = os.path.join(self.export_dir(), stem + ".txt")
+        try:
+            size = self.log_sink.export(path)
+            # 开启性能统计时一并导出JSON和Prometheus文本
+            if metrics.enabled:
+                with open(os.path.join(self.export_dir(), stem + "_metrics.json"), "w", encoding="utf-8") as f:
+                    f.write(metrics.to_json())
+                with open(os.path.join(self.export_dir(), stem + "_metrics.prom"), "w", encoding="utf-8") as f:
+                    f.write(metrics.to_prometheus())
+        except OSError as e:
+            self.show_popup("错误", f"导出日志失败: {str(e)}")
+            return
+        self.log_message(f"📤 日志已导出: {path}")
+        self.show_popup("成功", f"日志已导出 ({size / 1024:.0f}KB)\n{path}")
+    
+    def on_metrics_switch(self, instance, value):
+        """开启/关闭性能统计，开启时清空旧数据"""
+        if value:
+            metrics.reset()
+        metrics.enable(value)
+        self.log_message("🐞 性能统计已开启" if value else "🐞 性能统计已关闭")
+    
+    def on_paper_switch(self, instance, value):
+        """开启/关闭模拟交易，关闭后已有持仓继续按价格结算"""
+        self.paper_mode = value
+        self.log_message("📝 模拟交易已开启，生成的交易计划将自动模拟开仓" if value else "📝 模拟交易已关闭")
+        if self.paper is not None:
+            self.publish_view(paper_view(self.paper.status()))
+    
+    def paper_open(self, direction, confidence, price, atr=None, pair=None):
+        """模拟交易开启时按交易计划开仓（可在任意线程调用）"""
+        if not self.paper_mode:
+            return
+        pair = pair or CURRENCY_PAIR
+        if self.paper.open(pair, direction, price, self.trade_params, atr, confidence) is not None:
+            self.publish_view(paper_view(self.paper.status()))
+    
+    def paper_tick(self, prices):
+        """用最新价格匹配模拟持仓的止损/止盈并刷新权益（可在任意线程调用）"""
+        if not self.paper.positions:
+            return
+        for pair, price in prices:
+            self.paper.on_tick(pair, price)
+        self.publish_view(paper_view(self.paper.status()))
+    
+    def show_paper(self, instance):
+        """在计划区域显示模拟账户"""
+        from ethtrader.paper import format_account
+        if self.require_core():
+            self.show_plan(format_account(self.paper))
+    
+    def close_paper(self, instance):
+        """按最新价平掉全部模拟持仓"""
+        if not self.require_core():
+            return
+        self.paper.close_all()
+        self.publish_view(paper_view(self.paper.status()))
+        self.show_paper(instance)
+    
+    def reset_paper(self, instance):
+        """按当前本金重置模拟账户"""
+        if not self.require_core():
+            return
+        try:
+            self.paper.reset(self.trade_params['capital'])
+        except ValueError:
+            self.show_popup("错误", "本金参数无效")
+            return
+        self.log_message(f"🔄 模拟账户已重置，本金 ${self.paper.capital:.2f}")
+        self.publish_view(paper_view(self.paper.status()))
+        self.show_paper(instance)
+    
+    def show_metrics(self, instance):
+        """性能统计面板"""
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
+        
+        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(5))
+        text = TextInput(text=metrics.summary(), readonly=True, font_size='11sp',
+                         background_color=(0.1, 0.1, 0.15, 1), foreground_color=(0.9, 0.9, 0.9, 1))
+        content.add_widget(text)
+        
+        btn_box = BoxLayout(size_hint=(1, 0.15))
+        refresh_btn = Button(text='🔄 刷新')
+        refresh_btn.bind(on_press=lambda *_: setattr(text, 'text', metrics.summary()))
+        reset_btn = Button(text='🗑️ 清零')
+        reset_btn.bind(on_press=lambda *_: (metrics.reset(), setattr(text, 'text', metrics.summary())))
+        close_btn = Button(text='关闭')
+        btn_box.add_widget(refresh_btn)
+        btn_box.add_widget(reset_btn)
+        btn_box.add_widget(close_btn)
+        content.add_widget(btn_box)
+        
+        popup = Popup(title='📊 性能统计', content=content, size_hint=(0.95, 0.8))
+        close_btn.bind(on_press=popup.dismiss)
+        popup.open()
+    
+    def alert_rules(self):
+        """由设置参数生成提醒规则：自动计划和价格提醒针对当前交易对，RSI极值对扫描的全部交易对生效"""
+        from ethtrader.alerts import confidence_rule, price_cross_rule, rsi_extreme_rule
+        
+        pair = CURRENCY_PAIR
+        rules = []
+        try:
+            rules.append(confidence_rule(self.trade_params['auto_plan_threshold'], action='plan', pair=pair))
+        except ValueError:
+            self.log_message("❌ 自动计划阈值无效")
+        for level in self.trade_params.get('alert_prices', '').replace('，', ',').split(','):
+            if not level.strip():
+                continue
+            try:
+                rules.append(price_cross_rule(level, pair=pair))
+            except ValueError:
+                self.log_message(f"❌ 价格提醒无效: {level}")
+        try:
+            count = int(self.trade_params.get('alert_rsi_count') or 0)
+        except ValueError:
+            count = 0
+            self.log_message("❌ RSI极值周期数无效")
+        if count > 0:
+            rules.append(rsi_extreme_rule(count))
+        return rules
+    
+    def update_alert_rules(self):
+        """重新编译提醒规则（分析模块加载时按当时的参数编译）"""
+        if self.alerts is not None:
+            self.alerts.compile(self.alert_rules())
+    
+    def fire_alerts(self, alerts):
+        """执行触发的提醒（可在任意线程调用）：自动生成交易计划或发送通知"""
+        from ethtrader.alerts import format_alerts
+        
+        if not alerts:
+            return
+        notices = []
+        for alert in alerts:
+            self.log_message(alert["message"])
+            if alert["action"] == 'plan':
+                snapshot = alert["info"].get("snapshot") or {}
+                self.show_plan(self.create_trade_plan(alert["direction"], alert["confidence"], alert["price"],
+                                                      snapshot.get("atr"), alert["pair"]))
+                self.log_message("📋 已自动生成交易计划")
+                self.paper_open(alert["direction"], alert["confidence"], alert["price"],
+                                snapshot.get("atr", self.atr), alert["pair"])
+            notices.append(alert)
+        text = format_alerts(notices)
+        Clock.schedule_once(lambda dt: self.notify("🔔 交易提醒", text), 0)
+    
+    def notify(self, title, message):
+        """系统通知，不可用时弹窗"""
+        try:
+            from plyer import notification
+            notification.notify(title=title, message=message, app_name='ETH交易助手')
+        except Exception:
+            self.show_popup(title, message)
     
     def test_alarm(self, instance):
-        """测试警报"""
+        """测试警报：用最近一次分析结果试算当前规则，并通过通知通道发送"""
+        from ethtrader.alerts import format_alerts
+        
         self.log_message("🔊 测试警报（请在安卓设置中允许通知权限）")
-        self.show_popup("测试", "警报测试！请检查通知权限")
+        if not self.require_core():
+            return
+        alerts = self.alerts.evaluate(self.last_frame, dry_run=True)
+        if alerts:
+            message = format_alerts(alerts)
+        else:
+            message = f"当前没有满足条件的提醒（共{len(self.alerts.rules)}条规则）"
+        self.notify("🔊 警报测试", message)
     
     def log_message(self, message):
-        """记录日志"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        
-        # 在主线程中更新UI
-        Clock.schedule_once(lambda dt: setattr(self.log_text, 'text', self.log_text.text + log_entry), 0)
+        """记录日志（可在任意线程调用，界面每帧最多刷新一次）"""
+        if self.log_sink.write(message):
+            Clock.schedule_once(self.flush_log, 0)
+    
+    def flush_log(self, dt):
+        """把缓冲中最近的日志一次性显示并滚动到底部（日志页未创建时留待创建后显示）"""
+        if self.log_text is None:
+            return
+        text = self.log_sink.take()
+        if text is not None:
+            with metrics.span("ui", op="log"):
+                self.log_text.text = text
+                self.log_text.cursor = self.log_text.get_cursor_from_index(len(text))
     
     def show_popup(self, title, message):
         """显示弹出窗口"""
+        from kivy.uix.popup import Popup
+        
         content = BoxLayout(orientation='vertical', padding=dp(10))
         content.add_widget(Label(text=message))
         
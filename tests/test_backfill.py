@@ -0,0 +1,42 @@
+"""回补已下载页的记录：交易所缺失K线的页不重复下载"""
+
+import time
+
+from ethtrader.backfill import Backfiller, covered
+from ethtrader.cache import CandleCache
+from ethtrader.fakegate import FakeExchange, FakeGateHTTP
+from ethtrader.gateio import GateClient
+
+
+def test_covered():
+    assert covered([(0, 60), (120, 300)], 0, 300, 60)
+    assert covered([(0, 600)], 120, 300, 60)
+    assert not covered([(0, 60), (180, 300)], 0, 300, 60)
+    assert not covered([(0, 240)], 0, 300, 60)
+    assert not covered([], 0, 0, 60)
+
+
+def test_pages_with_gaps_are_not_refetched(tmp_path):
+    cache = CandleCache(str(tmp_path / "candles.sqlite"))
+    with FakeGateHTTP(FakeExchange(history_minutes=5000)) as http:
+        backfiller = Backfiller(cache, client=GateClient(base_url=http.base_url, cache_ttl={}),
+                                log=lambda message: None)
+        try:
+            # 固定结束时间，避免两次运行之间有新K线收盘
+            end = time.time() // 60 * 60 - 60
+            start = end - 3000 * 60
+            assert backfiller.run("ETH_USDT", "1m", start, end) > 0
+            requests = http.requests
+
+            # 模拟交易所缺失的K线（维护窗口）：页不完整，但已下载过
+            with cache._conn:
+                cache._conn.execute("DELETE FROM candles WHERE ts % 3600 < 600")
+            assert backfiller.run("ETH_USDT", "1m", start, end) == 0
+            assert http.requests == requests
+
+            # 强制模式仍重新下载
+            assert backfiller.run("ETH_USDT", "1m", start, end, force=True) > 0
+            assert http.requests > requests
+        finally:
+            backfiller.close()
+            cache.close()
@@ -0,0 +1,69 @@
+"""AnalysisEngine 合成K线的收盘校验与推送解除"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ethtrader.engine import AnalysisEngine
+from ethtrader.fakegate import FakeExchange, FakeGateHTTP, FakeGateWS
+from ethtrader.gateio import GateClient
+from ethtrader.wsfeed import websockets
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_verify_closed_does_not_deadlock_on_its_own_pool():
+    executor = ThreadPoolExecutor(max_workers=1)
+    with FakeGateHTTP(FakeExchange(history_minutes=3000)) as http:
+        engine = AnalysisEngine(GateClient(base_url=http.base_url), "ETH_USDT", log=lambda message: None,
+                                executor=executor)
+        try:
+            engine.fetch_history_data()
+            closed = [("5m", int(engine.candles["5m"].timestamps[-2])),
+                      ("15m", int(engine.candles["15m"].timestamps[-2]))]
+            requests = http.requests
+            engine._pending_verify.extend(closed)
+            # 推送模式下校验在引擎线程池中运行，线程池已满时不得再向其提交子请求
+            executor.submit(engine._verify_closed).result(timeout=10)
+            assert http.requests == requests + len(closed)
+            assert engine._pending_verify == []
+        finally:
+            engine.close()
+            executor.shutdown(wait=False)
+
+
+@pytest.mark.skipif(websockets is None, reason="未安装websockets")
+def test_detached_feed_no_longer_publishes():
+    exchange = FakeExchange(history_minutes=3000)
+    with FakeGateHTTP(exchange) as http:
+        ws = FakeGateWS(exchange, push_interval=0.02).start()
+        engine = AnalysisEngine(GateClient(base_url=http.base_url), "ETH_USDT", log=lambda message: None)
+        old, new = [], []
+        detached = None
+        try:
+            engine.fetch_history_data()
+            engine.start_stream(old.append, url=ws.url, order_book=False)
+            assert wait_for(lambda: len(old) >= 3)
+            # 暂停后旧推送尚未停止，其回调不得再驱动引擎，重新开始后也不得与新推送同时驱动
+            detached = engine.detach_stream()
+            count = len(old)
+            time.sleep(0.2)
+            assert len(old) == count
+            engine.start_stream(new.append, url=ws.url, order_book=False)
+            assert wait_for(lambda: len(new) >= 10)
+            assert detached.running
+            assert len(old) == count
+        finally:
+            engine.stop_stream()
+            if detached:
+                detached.stop()
+            engine.close()
+            ws.stop()
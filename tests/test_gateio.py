@@ -0,0 +1,66 @@
+"""GateClient 熔断后的试探请求"""
+
+import pytest
+
+from ethtrader.fakegate import FakeExchange, FakeGateHTTP
+from ethtrader.gateio import CircuitBreaker, CircuitOpenError, GateAPIError, GateClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server():
+    with FakeGateHTTP(FakeExchange(history_minutes=100)) as http:
+        yield http
+
+
+def open_client(server, clock):
+    """熔断已打开、冷却刚结束的客户端"""
+    breaker = CircuitBreaker(threshold=1, cooldown=30, clock=clock)
+    client = GateClient(base_url=server.base_url, cache_ttl={}, max_retries=0, breaker=breaker)
+    breaker.record_failure()
+    assert breaker.open
+    with pytest.raises(CircuitOpenError):
+        client.tickers("ETH_USDT")
+    clock.now = 31
+    return client
+
+
+def test_trial_with_client_error_closes_breaker(server):
+    clock = FakeClock()
+    client = open_client(server, clock)
+    try:
+        # 试探请求返回4xx：接口可达，熔断恢复
+        with pytest.raises(GateAPIError) as info:
+            client.candlesticks("ETH_USDT", "7m")
+        assert info.value.status_code == 400
+        assert not client.breaker.open
+        assert client.tickers("ETH_USDT")[0]["currency_pair"] == "ETH_USDT"
+    finally:
+        client.close()
+
+
+def test_trial_with_unexpected_error_is_released(server, monkeypatch):
+    clock = FakeClock()
+    client = open_client(server, clock)
+    try:
+        def broken(*args, **kwargs):
+            raise ValueError("unexpected")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(client.session, "get", broken)
+            with pytest.raises(ValueError):
+                client.tickers("ETH_USDT")
+        # 试探未得出结论，下一个请求再次试探并恢复
+        for now in (32, 1000, 10 ** 6):
+            clock.now = now
+            assert client.tickers("ETH_USDT")
+        assert not client.breaker.open
+    finally:
+        client.close()
@@ -0,0 +1,20 @@
+"""Metrics 标签与导出"""
+
+from ethtrader.metrics import Metrics
+
+
+def test_mixed_label_types_export():
+    metrics = Metrics(enabled=True)
+    metrics.count("http_errors", path="/spot/tickers", status="network")
+    metrics.count("http_errors", path="/spot/tickers", status=503)
+    metrics.count("http_errors", path="/spot/tickers", status="503")
+    with metrics.span("http", path="/spot/tickers", attempt=1):
+        pass
+
+    text = metrics.to_prometheus()
+    assert 'ethtrader_events_total{event="http_errors",path="/spot/tickers",status="network"} 1' in text
+    # 数字与字符串形式的同一状态码计入同一个计数器
+    assert 'ethtrader_events_total{event="http_errors",path="/spot/tickers",status="503"} 2' in text
+    assert 'ethtrader_span_seconds_count{span="http",attempt="1",path="/spot/tickers"} 1' in text
+    assert metrics.snapshot()["counters"]["http_errors[/spot/tickers][503]"] == 2
+    assert "http_errors" in metrics.summary()
@@ -0,0 +1,141 @@
+"""
+用录制的增量流（tests/data/orderbook_stream.jsonl，由 FakeOrderBook 生成）重放订单簿：
+快照、穿价档位的删除、编号中断后的重新同步
+录制内容：初始快照、第1-120条增量、第120条之后的快照、第121-200条增量、最终快照
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from ethtrader.orderbook import OrderBookSync, read_recording, replay
+
+STREAM = os.path.join(os.path.dirname(__file__), "data", "orderbook_stream.jsonl")
+
+
+@pytest.fixture
+def events():
+    return list(read_recording(STREAM))
+
+
+def levels(side):
+    return [(side.price(i), side.amounts[i]) for i in range(len(side))]
+
+
+def snapshot_levels(snapshot, key):
+    return [(float(price), float(amount)) for price, amount in snapshot[key]]
+
+
+def assert_matches(book, snapshot):
+    assert book.last_id == snapshot["id"]
+    assert levels(book.bids) == snapshot_levels(snapshot, "bids")
+    assert levels(book.asks) == snapshot_levels(snapshot, "asks")
+
+
+def test_replay_matches_final_snapshot(events):
+    final = events[-1][1]
+    updates = [data for kind, data in events if kind == "update"]
+    # 流中包含穿价档位的删除（数量为0）
+    assert any(float(amount) == 0 for update in updates for side in ("b", "a") for _, amount in update[side])
+
+    sync, _ = replay(events[:-1])
+    assert sync.synced
+    assert sync.gaps == 0
+    assert_matches(sync.book, final)
+    assert sync.book.best_bid < sync.book.best_ask
+
+
+def test_gap_invalidates_and_next_snapshot_resyncs(events):
+    # 丢弃第100条增量
+    updates = [i for i, (kind, _) in enumerate(events) if kind == "update"]
+    dropped = updates[99]
+    resync_at = next(i for i, (kind, _) in enumerate(events) if kind == "snapshot" and i > dropped)
+
+    sync = OrderBookSync(None, None, log=lambda message: None)
+    for i, (kind, data) in enumerate(events[:-1]):
+        if i == dropped:
+            continue
+        if kind == "snapshot":
+            sync.load_snapshot(data)
+        else:
+            sync.on_update(data)
+        if dropped < i < resync_at:
+            # 中断后订单簿作废，等待下一次快照
+            assert not sync.synced
+            assert sync.summary() is None
+
+    assert sync.gaps == 1
+    assert sync.resyncs == 2
+    assert sync.synced
+    assert_matches(sync.book, events[-1][1])
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+class SnapshotClient:
+    """按顺序返回录制的快照的客户端"""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.calls = 0
+
+    def order_book(self, currency_pair, limit=100):
+        self.calls += 1
+        return self.snapshots.pop(0)
+
+
+def test_gap_fetches_snapshot_from_client(events):
+    snapshots = [data for kind, data in events if kind == "snapshot"]
+    updates = [data for kind, data in events if kind == "update"]
+    mid = snapshots[1]
+    # 丢弃第100条增量：中断后获取的快照（第120条之后）已包含其后的增量，这些增量被跳过
+    client = SnapshotClient([snapshots[0], mid])
+    sync = OrderBookSync(client, "ETH_USDT", log=lambda message: None, resync_interval=0)
+    for update in updates[:99] + updates[100:]:
+        sync.on_update(update)
+        # 快照在后台获取，等待完成后再推送下一条，使结果确定
+        wait_for(lambda: not sync.resyncing)
+
+    assert client.calls == 2
+    assert sync.gaps == 1
+    assert sync.synced
+    assert_matches(sync.book, snapshots[-1])
+
+
+class SlowClient(SnapshotClient):
+    """快照请求阻塞到被放行"""
+
+    def __init__(self, snapshots):
+        super().__init__(snapshots)
+        self.release = threading.Event()
+
+    def order_book(self, currency_pair, limit=100):
+        self.release.wait(5)
+        return super().order_book(currency_pair, limit)
+
+
+def test_snapshot_fetch_does_not_block_updates(events):
+    snapshots = [data for kind, data in events if kind == "snapshot"]
+    updates = [data for kind, data in events if kind == "update"]
+    client = SlowClient([snapshots[0]])
+    sync = OrderBookSync(client, "ETH_USDT", log=lambda message: None, resync_interval=0)
+
+    started = time.perf_counter()
+    for update in updates:
+        sync.on_update(update)
+    # 快照获取进行中时推送照常返回，增量缓存，且不重复请求
+    assert time.perf_counter() - started < 1.0
+    assert sync.resyncing and not sync.synced
+
+    client.release.set()
+    assert wait_for(lambda: not sync.resyncing)
+    assert client.calls == 1
+    assert sync.synced
+    assert_matches(sync.book, snapshots[-1])
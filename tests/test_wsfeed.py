@@ -0,0 +1,54 @@
+"""GateFeed 对模拟推送服务的断线重连、重新订阅和补齐"""
+
+import time
+
+import pytest
+
+from ethtrader.fakegate import FakeExchange, FakeGateWS
+from ethtrader.wsfeed import GateFeed, websockets
+
+pytestmark = pytest.mark.skipif(websockets is None, reason="未安装websockets")
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def server():
+    ws = FakeGateWS(FakeExchange(history_minutes=100), push_interval=0.02).start()
+    yield ws
+    ws.stop()
+
+
+def test_reconnect_resubscribes_and_backfills(server):
+    tickers, candles, connects = [], [], []
+
+    def on_connect():
+        connects.append(time.time())
+
+    feed = GateFeed("ETH_USDT", ["1m"], on_ticker=tickers.append,
+                    on_candle=lambda interval, row: candles.append((interval, row)),
+                    on_connect=on_connect, url=server.url, log=lambda message: None,
+                    reconnect_delay=0.05)
+    feed.start()
+    try:
+        assert wait_for(lambda: len(connects) == 1 and tickers and candles)
+        expected = {("spot.tickers", ("ETH_USDT",)), ("spot.candlesticks", ("1m", "ETH_USDT"))}
+        assert wait_for(lambda: list(server.clients.values()) == [expected])
+
+        server.drop_connections()
+        assert wait_for(lambda: feed.connections == 2 and len(connects) == 2)
+        # 新连接重新订阅全部频道，之后推送继续到达
+        assert wait_for(lambda: list(server.clients.values()) == [expected])
+        received = len(tickers)
+        assert wait_for(lambda: len(tickers) > received)
+        assert all(interval == "1m" for interval, _ in candles)
+    finally:
+        feed.stop()
+    assert not feed.running